@@ -0,0 +1,397 @@
+"""Двоичный формат отчётов: CST, таблица символов, импорты, диагностики и поток токенов.
+
+Файл - заголовок и секции-массивы (little-endian, каждая выровнена на 8 байт):
+    строки      - смещения и UTF-8 данные; каждая строка (ключ, тип узла, текст
+                  лексемы) хранится один раз, остальные ссылаются на её номер
+    формы       - наборы ключей словарей: узлы одного типа делят одну форму
+    узлы        - столбцы tag / a / b: для словаря a - номер формы, для списка
+                  a - длина; b - начало детей в массиве children; для строки
+                  a - номер строки; для числа b - само число
+    children    - номера дочерних узлов подряд
+    корни       - пары (имя, узел): "cst", "symbol_table", "imports", "diagnostics"
+    токены      - таблица видов и столбцы text / kind / line / column / id
+
+CstFile отображает файл в память и ничего не декодирует заранее: словари и
+списки - ленивые представления (Mapping / Sequence), строки декодируются при
+обращении. to_plain() переводит корень в те же данные, что лежат в *.json.
+
+Запуск:
+    python cstBinary.py results/cst.bin [root]   - корень (по умолчанию cst) в JSON
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"MTCSTB01"
+
+# Секции: (имя, код типа array)
+SECTIONS = (
+    ("string_offsets", "Q"), ("string_data", "B"),
+    ("shape_offsets", "I"), ("shape_keys", "I"),
+    ("node_tags", "B"), ("node_a", "I"), ("node_b", "q"), ("children", "I"),
+    ("roots", "I"), ("kinds", "I"),
+    ("token_text", "I"), ("token_kind", "H"), ("token_line", "I"), ("token_column", "I"), ("token_id", "I"),
+)
+HEADER = struct.Struct("<8s" + "QQ" * len(SECTIONS)) # Смещение и длина (в элементах) каждой секции
+
+NULL, FALSE, TRUE, INT, FLOAT, STRING, LIST, DICT = range(8)
+_INT64 = (-1 << 63, (1 << 63) - 1)
+_DOUBLE = struct.Struct("<d")
+_BITS = struct.Struct("<q")
+
+TokenRow = Tuple[str, str, int, int, str] # (text, kind, line, column, id); строки отчётов по токенам - те же поля и first
+
+
+class CstBinaryWriter:
+    """Собирает таблицы в памяти; write() пишет файл одним проходом."""
+
+    def __init__(self):
+        self.columns = {name: array(code) for name, code in SECTIONS}
+        self.columns["string_offsets"].append(0)
+        self.columns["shape_offsets"].append(0)
+        self.strings: Dict[str, int] = {}
+        self.shapes: Dict[Tuple[str, ...], int] = {}
+        self.scalars: Dict[Tuple[int, Any], int] = {}
+        self.kinds: Dict[str, int] = {}
+
+    def string(self, text: str) -> int:
+        number = self.strings.get(text)
+        if number is None:
+            number = self.strings[text] = len(self.strings)
+            data = self.columns["string_data"]
+            data.frombytes(text.encode('utf-8'))
+            self.columns["string_offsets"].append(len(data))
+        return number
+
+    def _shape(self, keys: Tuple[str, ...]) -> int:
+        number = self.shapes.get(keys)
+        if number is None:
+            number = self.shapes[keys] = len(self.shapes)
+            shape_keys = self.columns["shape_keys"]
+            shape_keys.extend(self.string(key) for key in keys)
+            self.columns["shape_offsets"].append(len(shape_keys))
+        return number
+
+    def _node(self, tag: int, a: int = 0, b: int = 0) -> int:
+        tags = self.columns["node_tags"]
+        tags.append(tag)
+        self.columns["node_a"].append(a)
+        self.columns["node_b"].append(b)
+        return len(tags) - 1
+
+    def _scalar(self, value: Any) -> int:
+        if value is None:
+            key = NULL, None
+        elif value is True or value is False:
+            key = TRUE if value else FALSE, None
+        elif isinstance(value, int):
+            if not _INT64[0] <= value <= _INT64[1]:
+                raise ValueError(f"Integer out of 64-bit range: {value}")
+            key = INT, value
+        elif isinstance(value, float):
+            key = FLOAT, _BITS.unpack(_DOUBLE.pack(value))[0]
+        elif isinstance(value, str):
+            key = STRING, value
+        else:
+            raise ValueError(f"Unsupported value type: {type(value).__name__}")
+        node = self.scalars.get(key)
+        if node is None:
+            tag, payload = key
+            if tag == STRING:
+                node = self._node(STRING, self.string(payload))
+            else:
+                node = self._node(tag, 0, payload or 0)
+            self.scalars[key] = node
+        return node
+
+    def add_value(self, value: Any) -> int:
+        """Узел для простых данных (как у to_dict / json); обход по явному стеку."""
+        children = self.columns["children"]
+        root = None
+        stack = [(value, -1)]
+        while stack:
+            value, slot = stack.pop()
+            if isinstance(value, dict):
+                items = list(value.values())
+                node = self._node(DICT, self._shape(tuple(value)), len(children))
+            elif isinstance(value, (list, tuple)):
+                items = value
+                node = self._node(LIST, len(value), len(children))
+            else:
+                items = ()
+                node = self._scalar(value)
+            if slot < 0:
+                root = node
+            else:
+                children[slot] = node
+            if items:
+                base = len(children)
+                children.frombytes(bytes(children.itemsize * len(items)))
+                for offset, item in enumerate(items):
+                    if isinstance(item, (dict, list, tuple)):
+                        stack.append((item, base + offset))
+                    else:
+                        children[base + offset] = self._scalar(item)
+        return root
+
+    def add_root(self, name: str, value: Any):
+        self.columns["roots"].extend((self.string(name), self.add_value(value)))
+
+    def add_tokens(self, rows: Sequence):
+        columns = self.columns
+        for text, kind, line, column, id, _ in rows:
+            number = self.kinds.get(kind)
+            if number is None:
+                number = self.kinds[kind] = len(self.kinds)
+                columns["kinds"].append(self.string(kind))
+            columns["token_text"].append(self.string(text))
+            columns["token_kind"].append(number)
+            columns["token_line"].append(line)
+            columns["token_column"].append(column)
+            columns["token_id"].append(self.string(id))
+
+    def write(self, path: str):
+        sections = []
+        offset = HEADER.size
+        for name, _ in SECTIONS:
+            offset += -offset % 8
+            column = self.columns[name]
+            sections.append((offset, len(column)))
+            offset += len(column) * column.itemsize
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, *(value for section in sections for value in section)))
+            for (name, _), (start, _) in zip(SECTIONS, sections):
+                file.write(bytes(start - file.tell()))
+                column = self.columns[name]
+                if sys.byteorder == "big":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(file)
+
+
+def write_binary(path: str, roots: Dict[str, Any], tokens: Sequence = ()):
+    """roots - именованные корни из простых данных, tokens - строки tokenReports.token_rows."""
+    writer = CstBinaryWriter()
+    for name, value in roots.items():
+        writer.add_root(name, value)
+    writer.add_tokens(tokens)
+    writer.write(path)
+
+
+class BinaryDict(Mapping):
+    """Ленивый словарь из CstFile: значения читаются при обращении."""
+    __slots__ = ("file", "node")
+
+    def __init__(self, file: "CstFile", node: int):
+        self.file = file
+        self.node = node
+
+    def __getitem__(self, key: str) -> Any:
+        file = self.file
+        index = file.shape_index(file.node_a[self.node])[key]
+        return file.value(file.children[file.node_b[self.node] + index])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.file.shape(self.file.node_a[self.node]))
+
+    def __len__(self) -> int:
+        return len(self.file.shape(self.file.node_a[self.node]))
+
+    def __repr__(self) -> str:
+        return f"BinaryDict({self.file.to_plain(self.node)!r})"
+
+
+class BinaryList(Sequence):
+    """Ленивый список из CstFile."""
+    __slots__ = ("file", "node")
+
+    def __init__(self, file: "CstFile", node: int):
+        self.file = file
+        self.node = node
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("list index out of range")
+        return self.file.value(self.file.children[self.file.node_b[self.node] + index])
+
+    def __len__(self) -> int:
+        return self.file.node_a[self.node]
+
+    def __repr__(self) -> str:
+        return f"BinaryList({self.file.to_plain(self.node)!r})"
+
+
+class TokenTable(Sequence):
+    """Токены из CstFile: строка - TokenRow; столбцы line и column - memoryview без копирования."""
+    __slots__ = ("file",)
+
+    def __init__(self, file: "CstFile"):
+        self.file = file
+
+    def __getitem__(self, index: int) -> TokenRow:
+        file = self.file
+        if index < 0:
+            index += len(self)
+        return (file.string(file.token_text[index]), file.string(file.kinds[file.token_kind[index]]),
+                file.token_line[index], file.token_column[index], file.string(file.token_id[index]))
+
+    def __len__(self) -> int:
+        return len(self.file.token_text)
+
+    @property
+    def lines(self) -> memoryview:
+        return self.file.token_line
+
+    @property
+    def columns(self) -> memoryview:
+        return self.file.token_column
+
+    @property
+    def kinds(self) -> List[str]:
+        return [self.file.string(kind) for kind in self.file.kinds]
+
+
+class CstFile:
+    """Файл write_binary, отображённый в память; закрывается close() или выходом из with."""
+
+    def __init__(self, path: str):
+        if sys.byteorder == "big":
+            raise ValueError("CstFile requires a little-endian host")
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        if len(self._buffer) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: truncated header")
+        magic, *layout = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a binary CST file")
+        self._views = []
+        for index, (name, code) in enumerate(SECTIONS):
+            start, count = layout[2 * index], layout[2 * index + 1]
+            view = self._buffer[start:start + count * array(code).itemsize].cast(code)
+            self._views.append(view)
+            setattr(self, name, view)
+        self._strings: Dict[int, str] = {}
+        self._shapes: Dict[int, Tuple[Tuple[str, ...], Dict[str, int]]] = {}
+        roots = self.roots
+        self.roots: Dict[str, int] = {self.string(roots[index]): roots[index + 1] for index in range(0, len(roots), 2)}
+        self.tokens = TokenTable(self)
+
+    def string(self, number: int) -> str:
+        text = self._strings.get(number)
+        if text is None:
+            text = self._strings[number] = str(
+                self.string_data[self.string_offsets[number]:self.string_offsets[number + 1]], 'utf-8')
+        return text
+
+    def shape(self, number: int) -> Tuple[str, ...]:
+        return self._shape(number)[0]
+
+    def shape_index(self, number: int) -> Dict[str, int]:
+        return self._shape(number)[1]
+
+    def _shape(self, number: int) -> Tuple[Tuple[str, ...], Dict[str, int]]:
+        shape = self._shapes.get(number)
+        if shape is None:
+            keys = tuple(self.string(key) for key in
+                         self.shape_keys[self.shape_offsets[number]:self.shape_offsets[number + 1]])
+            shape = self._shapes[number] = keys, {key: index for index, key in enumerate(keys)}
+        return shape
+
+    def value(self, node: int) -> Any:
+        """Значение узла: словари и списки - ленивые представления, прочее - как в JSON."""
+        tag = self.node_tags[node]
+        if tag == DICT:
+            return BinaryDict(self, node)
+        if tag == LIST:
+            return BinaryList(self, node)
+        return self._scalar(tag, node)
+
+    def _scalar(self, tag: int, node: int) -> Any:
+        if tag == STRING:
+            return self.string(self.node_a[node])
+        if tag == INT:
+            return self.node_b[node]
+        if tag == FLOAT:
+            return _DOUBLE.unpack(_BITS.pack(self.node_b[node]))[0]
+        return None if tag == NULL else tag == TRUE
+
+    def root(self, name: str = "cst") -> Any:
+        return self.value(self.roots[name])
+
+    def to_plain(self, node: Optional[int] = None, name: str = "cst") -> Any:
+        """Полностью декодированное значение узла (по умолчанию - корня name); без рекурсии."""
+        if node is None:
+            node = self.roots[name]
+        tags, node_a, node_b, children = self.node_tags, self.node_a, self.node_b, self.children
+        if tags[node] < LIST:
+            return self._scalar(tags[node], node)
+        scalars: Dict[int, Any] = {} # Скаляры общие для всего файла, поэтому декодируются по разу
+        root = [None]
+        stack = [(node, root, 0)]
+        while stack:
+            node, target, key = stack.pop()
+            first = node_b[node]
+            if tags[node] == DICT:
+                keys = self.shape(node_a[node])
+                result = dict.fromkeys(keys)
+                slots = zip(keys, children[first:first + len(keys)])
+            else:
+                result = [None] * node_a[node]
+                slots = enumerate(children[first:first + node_a[node]])
+            target[key] = result
+            for slot, child in slots:
+                tag = tags[child]
+                if tag >= LIST:
+                    stack.append((child, result, slot))
+                    continue
+                try:
+                    result[slot] = scalars[child]
+                except KeyError:
+                    result[slot] = scalars[child] = self._scalar(tag, child)
+        return root[0]
+
+    def close(self):
+        """Освобождает представления секций и отображение файла.
+
+        Срез столбца, который ещё держит вызывающий (например, tokens.lines[0:5]),
+        ссылается на то же отображение: тогда оно не закрывается здесь, а живёт,
+        пока жив срез, и закрывается сборщиком мусора.
+        """
+        for view in getattr(self, "_views", ()):
+            try:
+                view.release()
+            except BufferError:
+                pass
+        self._views = []
+        try:
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self) -> "CstFile":
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(2)
+    with CstFile(sys.argv[1]) as cst_file:
+        print(json.dumps(cst_file.to_plain(name=sys.argv[2] if len(sys.argv) > 2 else "cst"),
+                         indent=2, ensure_ascii=False))
@@ -0,0 +1,576 @@
+"""Узлы конкретного синтаксического дерева.
+
+Узлы хранят поля в __slots__, а токены-листья ссылаются на сам токен (для
+TokenBuffer это TokenView - буфер и индекс), поэтому дерево не держит словарь
+на каждый лист. Словари схемы results/cst.json строятся только по запросу:
+to_dict() или обход fields().
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from tokenModel import TokenView
+
+
+class Node:
+    """Базовый узел. FIELDS - пары (атрибут, ключ JSON) в порядке вывода."""
+    __slots__ = ()
+    type: Optional[str] = None # Значение ключа "type"; None - у записи нет ключа "type"
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+
+    def fields(self) -> Iterator[Tuple[str, Any]]:
+        """Пары (ключ, значение) в том порядке, в каком они идут в JSON."""
+        if self.type is not None:
+            yield "type", self.type
+        for attribute, key in self.FIELDS:
+            yield key, getattr(self, attribute)
+
+    def to_dict(self) -> dict:
+        return to_plain(self)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+_CONTAINERS = (Node, list, dict)
+
+
+def to_plain(value: Any) -> Any:
+    """Узлы - в словари, списки и словари - поэлементно, прочие значения как есть.
+
+    Обход идёт по явному стеку, поэтому глубина дерева не упирается в предел
+    рекурсии. Ключ сначала заполняется заглушкой, чтобы сохранить порядок полей.
+    """
+    if not isinstance(value, _CONTAINERS):
+        return value
+    root = [None]
+    stack = [(value, root, 0)]
+    while stack:
+        value, target, key = stack.pop()
+        if isinstance(value, Node):
+            items = value.fields()
+            result = {}
+        elif isinstance(value, list):
+            items = enumerate(value)
+            result = [None] * len(value)
+        else:
+            items = value.items()
+            result = {}
+        for item_key, item in items:
+            result[item_key] = item
+            if isinstance(item, _CONTAINERS):
+                stack.append((item, result, item_key))
+        target[key] = result
+    return root[0]
+
+
+def shifted(value: Any, pos_delta: int, index_delta: int) -> Any:
+    """value с номерами Pos, сдвинутыми на pos_delta, и индексами токенов - на index_delta.
+
+    Узлы не меняются, а оборачиваются в Shifted; списки и словари копируются
+    поэлементно. Без сдвига value возвращается как есть.
+    """
+    if not pos_delta and not index_delta:
+        return value
+    if isinstance(value, Node):
+        return Shifted(value, pos_delta, index_delta)
+    if isinstance(value, list):
+        return [shifted(item, pos_delta, index_delta) for item in value]
+    if isinstance(value, dict):
+        return {key: shifted(item, pos_delta, index_delta) for key, item in value.items()}
+    return value
+
+
+# Листья: {"Name": ..., "Text": ..., "Pos": ...}
+
+class TokenLeaf(Node):
+    """Лист из токена входа: имя и текст берутся из самого токена."""
+    __slots__ = ("token", "pos")
+    FIELDS = (("name", "Name"), ("text", "Text"), ("pos", "Pos"))
+
+    def __init__(self, token, pos: int):
+        self.token = token
+        self.pos = pos
+
+    @property
+    def name(self) -> str:
+        return self.token.kind
+
+    @property
+    def text(self) -> str:
+        return self.token.text
+
+
+class Leaf(Node):
+    """Лист, собранный парсером (тип, элемент массива) или с фиксированным текстом."""
+    __slots__ = ("name", "text", "pos")
+    FIELDS = (("name", "Name"), ("text", "Text"), ("pos", "Pos"))
+
+    def __init__(self, name: str, text: str, pos: int):
+        self.name = name
+        self.text = text
+        self.pos = pos
+
+
+class Wrapper(Node):
+    """Обёртка {"type": ..., "value": ...}: Expression, Condition, Init, Post и т.п."""
+    __slots__ = ("type", "value")
+    FIELDS = (("value", "value"),)
+
+    def __init__(self, type: str, value: Any):
+        self.type = type
+        self.value = value
+
+
+# Выражения. Оператор-выражение получает ключ "semicolon" в конце, если за ним стоит ';'
+
+class Expression(Node):
+    __slots__ = ("semicolon",)
+
+    def fields(self) -> Iterator[Tuple[str, Any]]:
+        yield from Node.fields(self)
+        semicolon = getattr(self, "semicolon", None)
+        if semicolon is not None:
+            yield "semicolon", semicolon
+
+
+class ValueNode(Expression):
+    """{"type": ..., "value": ..., "Pos": ...}"""
+    __slots__ = ("value", "pos")
+    FIELDS = (("value", "value"), ("pos", "Pos"))
+
+    def __init__(self, value: str, pos: int):
+        self.value = value
+        self.pos = pos
+
+
+class Identifier(ValueNode):
+    __slots__ = ()
+    type = "Identifier"
+
+
+class Operator(ValueNode):
+    __slots__ = ()
+    type = "Operator"
+
+
+class Punctuation(ValueNode):
+    __slots__ = ()
+    type = "Punctuation"
+
+
+class NumberLiteral(ValueNode):
+    __slots__ = ()
+    type = "NumberLiteral"
+
+
+class StringLiteral(ValueNode):
+    __slots__ = ()
+    type = "StringLiteral"
+
+
+class BinaryOperation(Expression):
+    __slots__ = ("left", "operator", "right")
+    type = "BinaryOperation"
+    FIELDS = (("left", "left"), ("operator", "operator"), ("right", "right"))
+
+    def __init__(self, left: Node, operator: Operator, right: Node):
+        self.left = left
+        self.operator = operator
+        self.right = right
+
+
+class AssignmentExpression(Expression):
+    __slots__ = ("left", "operator", "right")
+    type = "AssignmentExpression"
+    FIELDS = (("left", "left"), ("operator", "operator"), ("right", "right"), ("semicolon", "semicolon"))
+
+    def __init__(self, left: Node, operator: Operator, right: Node, semicolon: Optional[Punctuation]):
+        self.left = left
+        self.operator = operator
+        self.right = right
+        self.semicolon = semicolon
+
+    def fields(self) -> Iterator[Tuple[str, Any]]:
+        # "semicolon" входит в схему узла всегда, даже если равен None
+        return Node.fields(self)
+
+
+class UnaryOperation(Expression):
+    __slots__ = ("operator", "operand", "is_prefix")
+    type = "UnaryOperation"
+    FIELDS = (("operator", "operator"), ("operand", "operand"), ("is_prefix", "is_prefix"))
+
+    def __init__(self, operator: Operator, operand: Node, is_prefix: bool):
+        self.operator = operator
+        self.operand = operand
+        self.is_prefix = is_prefix
+
+
+class FieldAccess(Expression):
+    __slots__ = ("object", "field")
+    type = "FieldAccess"
+    FIELDS = (("object", "object"), ("field", "field"))
+
+    def __init__(self, object: Node, field: Identifier):
+        self.object = object
+        self.field = field
+
+
+class PackageCall(Expression):
+    """Промежуточный узел pkg.Func перед разбором аргументов: в дерево не попадает."""
+    __slots__ = ("package", "function")
+    type = "PackageCall"
+    FIELDS = (("package", "package"), ("function", "function"))
+
+    def __init__(self, package: Node, function: Identifier):
+        self.package = package
+        self.function = function
+
+
+class SliceExpression(Expression):
+    __slots__ = ("array", "start", "end", "nodes")
+    type = "SliceExpression"
+    FIELDS = (("array", "array"), ("start", "start"), ("end", "end"), ("nodes", "nodes"))
+
+    def __init__(self, array: Node, start: Optional[Node], end: Optional[Node], nodes: List[Node]):
+        self.array = array
+        self.start = start
+        self.end = end
+        self.nodes = nodes
+
+
+class IndexExpression(Expression):
+    __slots__ = ("array", "index", "nodes")
+    type = "IndexExpression"
+    FIELDS = (("array", "array"), ("index", "index"), ("nodes", "nodes"))
+
+    def __init__(self, array: Node, index: Optional[Node], nodes: List[Node]):
+        self.array = array
+        self.index = index
+        self.nodes = nodes
+
+
+class FunctionCall(Expression):
+    __slots__ = ("package", "name", "args", "nodes")
+    type = "FunctionCall"
+    FIELDS = (("package", "package"), ("name", "name"), ("args", "args"), ("nodes", "nodes"))
+
+    def __init__(self, package: Optional[Union[str, Node]], name: str, args: List[Node], nodes: List[Node]):
+        # package - имя пакета или переменной либо узел выражения-получателя: x.y().z()
+        self.package = package
+        self.name = name
+        self.args = args
+        self.nodes = nodes
+
+
+class ArrayLiteral(Expression):
+    __slots__ = ("array_type", "size", "elements", "nodes")
+    type = "ArrayLiteral"
+    FIELDS = (("array_type", "array_type"), ("size", "size"), ("elements", "elements"), ("nodes", "nodes"))
+
+    def __init__(self, array_type: str, size: Optional[str], elements: List[Node], nodes: List[Node]):
+        self.array_type = array_type
+        self.size = size
+        self.elements = elements
+        self.nodes = nodes
+
+
+class ArrayType(ArrayLiteral):
+    """Тип массива без списка инициализации."""
+    __slots__ = ()
+    type = "ArrayType"
+
+
+class FieldValue(Node):
+    """Поле в инициализации структуры: {"name": ..., "value": ...}."""
+    __slots__ = ("name", "value")
+    FIELDS = (("name", "name"), ("value", "value"))
+
+    def __init__(self, name: str, value: Node):
+        self.name = name
+        self.value = value
+
+
+class StructInitialization(Expression):
+    __slots__ = ("struct_name", "fields_", "nodes")
+    type = "StructInitialization"
+    FIELDS = (("struct_name", "struct_name"), ("fields_", "fields"), ("nodes", "nodes"))
+
+    def __init__(self, struct_name: str, fields: List[FieldValue], nodes: List[Node]):
+        self.struct_name = struct_name
+        self.fields_ = fields
+        self.nodes = nodes
+
+
+# Объявления
+
+class PackageDeclaration(Node):
+    __slots__ = ("nodes",)
+    type = "PackageDeclaration"
+    FIELDS = (("nodes", "nodes"),)
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+
+
+class ImportSpec(Node):
+    """Путь импорта с точкой с запятой: {"package": ..., "semicolon": ...}."""
+    __slots__ = ("package", "semicolon")
+    FIELDS = (("package", "package"), ("semicolon", "semicolon"))
+
+    def __init__(self, package: Leaf, semicolon: TokenLeaf):
+        self.package = package
+        self.semicolon = semicolon
+
+
+class ImportDeclaration(Node):
+    __slots__ = ("nodes", "imports")
+    type = "ImportDeclaration"
+    FIELDS = (("nodes", "nodes"), ("imports", "imports"))
+
+    def __init__(self, nodes: List[Node], imports: List[ImportSpec]):
+        self.nodes = nodes
+        self.imports = imports
+
+
+class FieldSpec(Node):
+    """Поле структуры в объявлении типа."""
+    __slots__ = ("field_name", "field_type", "semicolon")
+    FIELDS = (("field_name", "field_name"), ("field_type", "field_type"), ("semicolon", "semicolon"))
+
+    def __init__(self, field_name: TokenLeaf, field_type: Leaf, semicolon: TokenLeaf):
+        self.field_name = field_name
+        self.field_type = field_type
+        self.semicolon = semicolon
+
+
+class TypeDeclaration(Node):
+    __slots__ = ("name", "fields_", "nodes")
+    type = "TypeDeclaration"
+    FIELDS = (("name", "name"), ("fields_", "fields"), ("nodes", "nodes"))
+
+    def __init__(self, name: str, fields: List[FieldSpec], nodes: List[Node]):
+        self.name = name
+        self.fields_ = fields
+        self.nodes = nodes
+
+
+class VariableDeclaration(Node):
+    __slots__ = ("nodes",)
+    type = "VariableDeclaration"
+    FIELDS = (("nodes", "nodes"),)
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+
+
+class Receiver(Node):
+    """Получатель метода: {"name": ..., "type": ...}, где "type" - тип получателя."""
+    __slots__ = ("name", "receiver_type")
+    FIELDS = (("name", "name"), ("receiver_type", "type"))
+
+    def __init__(self, name: str, receiver_type: str):
+        self.name = name
+        self.receiver_type = receiver_type
+
+
+class Param(Node):
+    __slots__ = ("param_name", "param_type")
+    FIELDS = (("param_name", "param_name"), ("param_type", "param_type"))
+
+    def __init__(self, param_name: TokenLeaf, param_type: str):
+        self.param_name = param_name
+        self.param_type = param_type
+
+
+class FunctionDeclaration(Node):
+    """Объявление функции. Тело может быть отложенным (Parser(lazy_bodies=True)):
+    тогда оно разбирается при первом обращении к body через parser.parse_body."""
+    __slots__ = ("name", "receiver", "params", "return_types", "_body", "nodes", "parser", "body_span", "body_pos")
+    type = "FunctionDeclaration"
+    FIELDS = (("name", "name"), ("receiver", "receiver"), ("params", "params"), ("return_types", "return_types"),
+              ("body", "body"), ("nodes", "nodes"))
+
+    def __init__(self, name: str, receiver: Optional[Receiver], params: List[Param], return_types: List[str],
+                 body: Optional[List[Node]], nodes: List[Node]):
+        self.name = name
+        self.receiver = receiver
+        self.params = params
+        self.return_types = return_types
+        self._body = body
+        self.nodes = nodes
+        self.parser = None
+        self.body_span: Optional[Tuple[int, int]] = None # Токены тела [начало, парная '}')
+        self.body_pos = 0 # Номер Pos, с которого продолжается нумерация в теле
+
+    @property
+    def body_parsed(self) -> bool:
+        return self._body is not None
+
+    @property
+    def body(self) -> List[Node]:
+        if self._body is None:
+            self._body = self.parser.parse_body(self)
+        return self._body
+
+    @body.setter
+    def body(self, value: List[Node]):
+        self._body = value
+
+
+# Операторы
+
+class IfStatement(Node):
+    __slots__ = ("condition", "then", "else_", "nodes")
+    type = "IfStatement"
+    FIELDS = (("condition", "condition"), ("then", "then"), ("else_", "else"), ("nodes", "nodes"))
+
+    def __init__(self, condition: Node, then: List[Node], else_: Optional[List[Node]], nodes: List[Node]):
+        self.condition = condition
+        self.then = then
+        self.else_ = else_
+        self.nodes = nodes
+
+
+class RangeStatement(Node):
+    __slots__ = ("variables", "expression")
+    type = "RangeStatement"
+    FIELDS = (("variables", "variables"), ("expression", "expression"))
+
+    def __init__(self, variables: List[Identifier], expression: Node):
+        self.variables = variables
+        self.expression = expression
+
+
+class ForStatement(Node):
+    __slots__ = ("init", "condition", "post", "range", "body", "nodes")
+    type = "ForStatement"
+    FIELDS = (("init", "init"), ("condition", "condition"), ("post", "post"), ("range", "range"),
+              ("body", "body"), ("nodes", "nodes"))
+
+    def __init__(self, init: Optional[Node], condition: Optional[Node], post: Optional[Node],
+                 range: Optional[RangeStatement], body: List[Node], nodes: List[Node]):
+        self.init = init
+        self.condition = condition
+        self.post = post
+        self.range = range
+        self.body = body
+        self.nodes = nodes
+
+
+class CaseClause(Node):
+    __slots__ = ("conditions", "body")
+    type = "CaseClause"
+    FIELDS = (("conditions", "conditions"), ("body", "body"))
+
+    def __init__(self, conditions: List[Node], body: List[Node]):
+        self.conditions = conditions
+        self.body = body
+
+
+class DefaultClause(Node):
+    __slots__ = ("body",)
+    type = "DefaultClause"
+    FIELDS = (("body", "body"),)
+
+    def __init__(self, body: List[Node]):
+        self.body = body
+
+
+class SwitchStatement(Node):
+    __slots__ = ("expression", "cases", "default", "nodes")
+    type = "SwitchStatement"
+    FIELDS = (("expression", "expression"), ("cases", "cases"), ("default", "default"), ("nodes", "nodes"))
+
+    def __init__(self, expression: Optional[Node], cases: List[CaseClause], default: Optional[DefaultClause],
+                 nodes: List[Node]):
+        self.expression = expression
+        self.cases = cases
+        self.default = default
+        self.nodes = nodes
+
+
+class ContinueStatement(Node):
+    __slots__ = ("nodes",)
+    type = "ContinueStatement"
+    FIELDS = (("nodes", "nodes"),)
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+
+
+class BreakStatement(Node):
+    __slots__ = ("nodes",)
+    type = "BreakStatement"
+    FIELDS = (("nodes", "nodes"),)
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+
+
+class ReturnStatement(Node):
+    __slots__ = ("expressions", "nodes")
+    type = "ReturnStatement"
+    FIELDS = (("expressions", "expressions"), ("nodes", "nodes"))
+
+    def __init__(self, expressions: List[Node], nodes: List[Node]):
+        self.expressions = expressions
+        self.nodes = nodes
+
+
+class Program(Node):
+    """Корень дерева. Объявления, перенесённые Parser.reparse из прошлого разбора, не
+    меняются: их сдвиг (номеров Pos, индексов токенов) лежит в shifts по номеру в
+    children и применяется при выводе (fields(), to_dict())."""
+    __slots__ = ("children", "shifts")
+    type = "Program"
+    FIELDS = (("children", "children"),)
+
+    def __init__(self, children: List[Node], shifts: Optional[Dict[int, Tuple[int, int]]] = None):
+        self.children = children
+        self.shifts = shifts or {}
+
+    def fields(self) -> Iterator[Tuple[str, Any]]:
+        yield "type", self.type
+        shifts = self.shifts
+        if not shifts:
+            yield "children", self.children
+        else:
+            yield "children", [shifted(child, *shifts[n]) if n in shifts else child
+                               for n, child in enumerate(self.children)]
+
+
+class Shifted(Node):
+    """Поддерево со сдвигом номеров Pos и индексов токенов, который применяется при
+    обходе fields(): сам узел и его потомки не меняются (см. shifted)."""
+    __slots__ = ("node", "pos_delta", "index_delta")
+
+    def __init__(self, node: Node, pos_delta: int, index_delta: int):
+        self.node = node
+        self.pos_delta = pos_delta
+        self.index_delta = index_delta
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.node.type
+
+    def fields(self) -> Iterator[Tuple[str, Any]]:
+        node = self.node
+        if isinstance(node, TokenLeaf) and isinstance(node.token, TokenView):
+            node = TokenLeaf(TokenView(node.token.buffer, node.token.index + self.index_delta), node.pos)
+        for key, value in node.fields():
+            if key == "Pos":
+                yield key, value + self.pos_delta
+            else:
+                yield key, shifted(value, self.pos_delta, self.index_delta)
+
+
+# Ошибки разбора (Parser(recover=True))
+
+class ErrorNode(Node):
+    """Участок, пропущенный при восстановлении после ошибки: сообщение и его токены."""
+    __slots__ = ("message", "nodes")
+    type = "Error"
+    FIELDS = (("message", "message"), ("nodes", "nodes"))
+
+    def __init__(self, message: str, nodes: List[Node]):
+        self.message = message
+        self.nodes = nodes
@@ -0,0 +1,175 @@
+"""Потоковая запись CST в JSON: объявление за объявлением, без дерева Program в памяти.
+
+Форматы:
+    indent  - тот же текст, что json.dump(program.to_dict(), indent=2, ensure_ascii=False)
+    compact - то же без отступов и пробелов, одной строкой
+    jsonl   - по строке JSON на объявление верхнего уровня, без обёртки Program
+
+Текст строит dumps() - обход по явному стеку, поэтому глубина вложенности
+конструкций Go не упирается в предел рекурсии (стандартный json рекурсивен).
+
+Пример:
+    with CstWriter("cst.json", "compact") as writer:
+        for declaration in parser.iter_declarations():
+            writer.write(declaration)
+"""
+import os
+from json.encoder import encode_basestring
+from typing import Any, Optional, Tuple
+
+from cstModel import Node, Program
+
+FORMATS = ("indent", "compact", "jsonl")
+DEFAULT_BUFFER_SIZE = 1 << 20
+COMPACT_SEPARATORS = (",", ":")
+# Глубже этого уровня dumps(indent=...) пишет значения в одну строку: иначе объём
+# текста растёт квадратично с глубиной (у цепочки из 10 000 '+' - больше гигабайта)
+MAX_INDENT_DEPTH = 1000
+
+_END = object()
+
+
+def _float_text(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "Infinity" if value > 0 else "-Infinity"
+    return float.__repr__(value)
+
+
+def _scalar_text(value: Any) -> str:
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _float_text(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _key_text(key: Any) -> str:
+    if isinstance(key, str):
+        return encode_basestring(key)
+    if isinstance(key, float):
+        return encode_basestring(_float_text(key))
+    if key is None or isinstance(key, (bool, int)):
+        return encode_basestring(_scalar_text(key))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def dumps(value: Any, indent: Optional[int] = None, separators: Optional[Tuple[str, str]] = None) -> str:
+    """То же, что json.dumps(value, indent=indent, separators=separators, ensure_ascii=False).
+
+    Узлы CST пишутся так же, как их to_dict(), но без промежуточных словарей.
+    Вложенные значения обходятся по явному стеку, как в cstModel.to_plain; уровни
+    глубже MAX_INDENT_DEPTH пишутся без отступов (json.dumps до них не доходит:
+    он упирается в предел рекурсии).
+    """
+    if separators is None:
+        separators = (",", ": ") if indent is not None else (", ", ": ")
+    item_separator, key_separator = separators
+    parts = []
+    append = parts.append
+    # Кадр: [элементы, словарь ли, префикс следующего элемента, префикс после первого, закрытие]
+    stack = []
+    while True:
+        if isinstance(value, (Node, dict)):
+            items = value.fields() if isinstance(value, Node) else iter(value.items())
+            mapping, bracket = True, "}"
+            append("{")
+        elif isinstance(value, (list, tuple)):
+            items = iter(value)
+            mapping, bracket = False, "]"
+            append("[")
+        else:
+            items = None
+            append(_scalar_text(value))
+        if items is not None:
+            if indent is None or len(stack) >= MAX_INDENT_DEPTH:
+                stack.append([items, mapping, "", item_separator, bracket])
+            else:
+                newline = "\n" + " " * (indent * (len(stack) + 1))
+                stack.append([items, mapping, newline, item_separator + newline,
+                              "\n" + " " * (indent * len(stack)) + bracket])
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], _END)
+            if item is _END:
+                stack.pop()
+                # Пустой контейнер закрывается без перевода строки: [] и {}
+                append(frame[4] if frame[2] is frame[3] else frame[4][-1])
+                continue
+            append(frame[2])
+            frame[2] = frame[3]
+            if frame[1]:
+                key, value = item
+                append(_key_text(key) + key_separator)
+            else:
+                value = item
+            break
+        else:
+            return "".join(parts)
+
+
+def file_name(format: str) -> str:
+    return "cst.jsonl" if format == "jsonl" else "cst.json"
+
+
+class CstWriter:
+    """Пишет объявления в path по мере поступления; close() дописывает конец Program.
+
+    Если разбор прервался, abort() закрывает и удаляет недописанный файл.
+    """
+
+    def __init__(self, path: str, format: str = "indent", buffer_size: int = DEFAULT_BUFFER_SIZE):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown CST format: {format!r}")
+        self.path = path
+        self.format = format
+        self.count = 0
+        self.file = open(path, "w", encoding='utf-8', buffering=buffer_size)
+
+    def write(self, declaration: Any):
+        """declaration - узел или его словарь из to_dict()."""
+        if self.format == "indent":
+            # Строки JSON не содержат переводов строк, поэтому отступ дописывается заменой
+            text = dumps(declaration, indent=2).replace("\n", "\n    ")
+            self.file.write(("{\n  \"type\": \"" + Program.type + "\",\n  \"children\": [\n    " if not self.count
+                             else ",\n    ") + text)
+        elif self.format == "compact":
+            self.file.write(("{\"type\":\"" + Program.type + "\",\"children\":[" if not self.count
+                             else ",") + dumps(declaration, separators=COMPACT_SEPARATORS))
+        else:
+            self.file.write(dumps(declaration, separators=COMPACT_SEPARATORS) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.format == "indent":
+            self.file.write("\n  ]\n}" if self.count else "{\n  \"type\": \"" + Program.type + "\",\n  \"children\": []\n}")
+        elif self.format == "compact":
+            self.file.write("]}" if self.count else "{\"type\":\"" + Program.type + "\",\"children\":[]}")
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "CstWriter":
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,131 @@
+"""Стоимость выбора правила парсером в пересчёте на токен: до и после таблиц разбора.
+
+"До" воспроизводит прежний выбор правила: цепочку сравнений token.kind со
+строками в parse_statement и parse_primary_expression и проверку имени типа по
+списку встроенных типов, который строился заново при каждом вызове. "После" -
+тот же выбор через целые виды токенов (kind_id), таблицы Parser._STATEMENT_RULES
+и Parser._OPERAND_RULES и проверку имени типа парсера. Для сравнения замеряется
+и полный Parser.parse.
+
+Запуск:
+    python dispatchBench.py                    - go/*.go, повторённые до 10 000 токенов
+    python dispatchBench.py --json a.go b.go   - то же для своих файлов, в JSON
+    python dispatchBench.py --tokens 50000     - размер входа в токенах
+"""
+import contextlib
+import glob
+import json
+import os
+import sys
+import timeit
+from typing import Any, Dict, List
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "go", "*.go")
+DEFAULT_TOKENS = 10_000
+REPEAT = 5
+
+
+def _builtin_types() -> List[str]:
+    # Прежний Parser._get_keywords(): новый список на каждый вызов
+    return ["bool", "string", "int", "int8", "int16", "int32", "int64",
+            "uint", "uint8", "uint16", "uint32", "uint64", "float32", "float64"]
+
+
+def string_dispatch(tokens) -> None:
+    """Прежний выбор правила: сравнения строк вида по порядку веток."""
+    for token in tokens:
+        kind = token.kind
+        if kind == "for":
+            pass
+        elif kind == "if":
+            pass
+        elif kind == "switch":
+            pass
+        elif kind == "continue":
+            pass
+        elif kind == "break":
+            pass
+        elif kind == "return":
+            pass
+        elif kind == "var":
+            pass
+        elif kind == "ident":
+            pass
+        elif kind == "lbracket":
+            pass
+        elif kind in {"arithmetic", "unary", "bitwise", "increment_decrement"}:
+            pass
+        elif kind == "integer":
+            pass
+        elif kind == "float":
+            pass
+        elif kind in {"string", "raw_string"}:
+            pass
+        elif kind == "lpar":
+            pass
+        if kind in {"ident"} or kind in _builtin_types():
+            pass
+
+
+def table_dispatch(tokens) -> None:
+    """Текущий выбор правила: целый вид токена и таблицы разбора."""
+    from parser import Parser, _is_type_name
+
+    statements, operands = Parser._STATEMENT_RULES, Parser._OPERAND_RULES
+    for token in tokens:
+        kind = token.kind_id
+        statements.get(kind) or operands.get(kind)
+        _is_type_name(token)
+
+
+def load_tokens(files: List[str], count: int):
+    """Токены файлов, повторённых до count токенов (буфер лексера)."""
+    from lexer import Lexer
+
+    sources = []
+    for path in files:
+        with open(path, encoding='utf-8') as file:
+            sources.append(file.read())
+    text = "\n".join(sources)
+    per_copy = max(len(Lexer(text).lex_analyze()), 1)
+    return Lexer("\n".join([text] * -(-count // per_copy))).lex_analyze()
+
+
+def benchmark(tokens, repeat: int = REPEAT) -> Dict[str, Any]:
+    from parser import Parser
+
+    def best(function) -> float:
+        return min(timeit.repeat(function, number=1, repeat=repeat))
+
+    count = len(tokens)
+    # Представления токенов создаются заранее, чтобы замер не включал обращение к буферу
+    views = list(tokens)
+    before = best(lambda: string_dispatch(views)) / count * 1e9
+    after = best(lambda: table_dispatch(views)) / count * 1e9
+    # Парсер печатает отладочные строки: в замер они входят, но не в терминал
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        parse = best(lambda: Parser(tokens, recover=True).parse()) / count * 1e6
+    return {"tokens": count, "dispatch_before_ns": before, "dispatch_after_ns": after, "parse_us": parse}
+
+
+def report(result: Dict[str, Any]) -> str:
+    return "\n".join([
+        f"Tokens: {result['tokens']}",
+        f"{'Rule dispatch, string chain':<32} {result['dispatch_before_ns']:>8.0f} ns/token",
+        f"{'Rule dispatch, kind tables':<32} {result['dispatch_after_ns']:>8.0f} ns/token"
+        f" (x{result['dispatch_before_ns'] / result['dispatch_after_ns']:.1f})",
+        f"{'Parser.parse':<32} {result['parse_us']:>8.2f} us/token",
+    ])
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    as_json = "--json" in arguments
+    count = DEFAULT_TOKENS
+    if "--tokens" in arguments:
+        index = arguments.index("--tokens")
+        count = int(arguments[index + 1])
+        del arguments[index:index + 2]
+    files = [argument for argument in arguments if not argument.startswith("--")] or sorted(glob.glob(SAMPLES))
+    result = benchmark(load_tokens(files, count))
+    print(json.dumps(result, indent=2) if as_json else report(result))
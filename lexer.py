@@ -1,17 +1,91 @@
+import hashlib
+import mmap
 import re
-from typing import List, Tuple, Optional
-from tokenModel import Token, TokenType
-from difflib import get_close_matches
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import Iterator, List, NamedTuple, Tuple, Optional, Union
+from tokenModel import Token, TokenType, TokenBuffer, TokenView, CATEGORIES, CATEGORY_IDS, KIND_NAMES, intern_kind
+from lineIndex import LineIndex
+from sourceText import SourceText
+from suggestionIndex import NGramIndex, SuggestionIndex, levenshtein_distance
+
+# Через сколько токенов next_token снимает стек скобок для apply_edit
+CHECKPOINT_INTERVAL = 512
+# Начальный размер окна текста, которое пересканирует apply_edit
+WINDOW_SIZE = 1 << 12
+
+
+class TokenRecord(NamedTuple):
+    """Результат сканирования одного токена до того, как он попадёт в хранилище."""
+    kind: int
+    start: int
+    length: int
+    line: int
+    column: int
+    category: int
+    number: int
+    is_first: bool # Первое вхождение лексемы в своей таблице
+    depth: int # Глубина стека скобок перед токеном
+
+
+class TokenDiff(NamedTuple):
+    """Изменение потока токенов после правки текста (см. Lexer.apply_edit).
+
+    Токены token_list[start:start + len(inserted)] заменили прежние removed;
+    токены после них сдвинуты на offset_delta символов.
+    """
+    start: int
+    removed: List[Token]
+    inserted: List[TokenView]
+    offset_delta: int
+    errors: List[str]
+
+
+class LexerSyntax(NamedTuple):
+    """Сканер и служебные лексемы для одного вида входа (str или байты UTF-8)."""
+    scanner: "re.Pattern"
+    block_comment: Union[str, bytes]
+    block_comment_end: Union[str, bytes]
+    line_comment: Union[str, bytes]
+    newline: Union[str, bytes]
+    dot: Union[str, bytes]
+    quotes: Tuple[Union[str, bytes], ...]
+
 
 class Lexer:
-    def __init__(self, code: str):
+    def __init__(self, code: Union[str, bytes, mmap.mmap], engine: str = "auto"):
+        # Текст программы: строка, либо байты UTF-8 (в том числе отображённый в память файл)
         self.code = code
+        self.is_bytes = not isinstance(code, str)
+        self.syntax = _BYTES_SYNTAX if self.is_bytes else _STR_SYNTAX
+        # Сканер: "regex" - общее регулярное выражение, "dfa" - автомат из dfaScanner.py,
+        # "auto" - автомат, если вход строковый и модуль собран по текущей таблице
+        self.dfa = None
+        if engine == "dfa":
+            if self.is_bytes:
+                raise ValueError("Движок dfa работает только со строковым входом")
+            self.dfa = load_dfa_scanner()
+        elif engine == "auto":
+            if not self.is_bytes:
+                try:
+                    self.dfa = load_dfa_scanner()
+                except RuntimeError:
+                    pass
+        elif engine != "regex":
+            raise ValueError(f"Неизвестный движок сканера: {engine}")
+        self.source_file = None
         self.pos = 0
-        self.token_list: List[Token] = [] # Список всех найденных токенов
+        # Смещение code в полном тексте: apply_edit сканирует не весь текст, а окно вокруг правки
+        self.base = 0
+        self.line_index = LineIndex(code) # Индекс начал строк для перевода смещений в позиции
+        self.token_list = TokenBuffer(code) # Все найденные токены в компактном виде
         self.names_token_list: List[Token] = [] # Список токенов, которые являются переменными или константами
         self.keywords_token_list: List[Token] = [] # Список токенов, которые являются ключевыми словами
         self.operators_token_list: List[Token] = [] # Список токенов, которые являются операторами
         self.punctuations_token_list: List[Token] = [] # Список токенов, которые являются знаками пунктуации
+        # Списки первых вхождений по номеру категории (см. tokenModel.CATEGORIES)
+        self.category_lists = (self.keywords_token_list, self.names_token_list,
+                               self.operators_token_list, self.punctuations_token_list)
 
         self.names_index = 0
         self.table_names = {}
@@ -21,202 +95,523 @@ class Lexer:
         self.table_punctuations = {}
         self.keywords_index = 0
         self.table_keywords = {}
+        self.suggestions = SuggestionIndex(_SUGGESTION_WORDS) # Подсказки для нераспознанных слов
 
         self.bracket_stack = []
-
-    def lex_analyze(self) -> List[Token]:
-        errors = []
+        self.open_brackets: List[int] = [] # Индексы открывающих скобок token_list, ждущих пары
+        # Снимки open_brackets перед каждым CHECKPOINT_INTERVAL-м токеном: по ним apply_edit
+        # восстанавливает стек скобок в точке пересканирования
+        self.checkpoints: List[int] = []
+        self.checkpoint_stacks: List[Tuple[int, ...]] = []
+        self.errors: List[str] = []
+        # Участки, не ставшие токенами: (начало, граница просмотра вперёд или -1 до конца текста).
+        # По ним apply_edit находит, откуда пересканировать.
+        self.error_spans: List[Tuple[int, int]] = []
+
+    @classmethod
+    def from_file(cls, path: str) -> "Lexer":
+        """Лексер поверх mmap файла в UTF-8: файл не декодируется целиком и не копируется.
+
+        Смещения токенов считаются в байтах, столбцы при выводе - в символах; токены
+        и ошибки те же, что у Lexer(text) (см. scan_token).
+        """
+        source_file = open(path, "rb")
+        try:
+            code = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл нельзя отобразить в память
+            code = b""
+        lexer = cls(code)
+        lexer.source_file = source_file
+        return lexer
+
+    def close(self):
+        if isinstance(self.code, mmap.mmap):
+            self.code.close()
+        if self.source_file is not None:
+            self.source_file.close()
+            self.source_file = None
+
+    def __enter__(self) -> "Lexer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def decode(self, text: Union[str, bytes]) -> str:
+        return text.decode('utf-8', errors='replace') if self.is_bytes else text
+
+    def lex_analyze(self) -> TokenBuffer:
         while True:
             res, err = self.next_token()
             if not res:
                 break
             if err:
-                errors.append(err)
+                self.errors.append(err)
 
-        # Проверка незакрытых скобок
-        while self.bracket_stack:
-            bracket, line, col = self.bracket_stack.pop()
-            errors.append(f"Ошибка: незакрытая скобка '{bracket}' на позиции {line}:{col}")
+        self.check_unclosed_brackets()
         
-        for error in errors:
+        for error in self.errors:
             print(error)
 
         return self.token_list
-    
 
- 
+    def iter_tokens(self) -> Iterator[Token]:
+        """Потоковый режим: выдаёт токены по мере сканирования, не накапливая token_list.
 
-    def next_token(self) -> Tuple[bool, Optional[str]]:
-        if self.pos >= len(self.code):
-            return False, None
-        
-        text = self.code[self.pos:]
+        Ошибки попадают в self.errors сразу, как только обнаружены.
+        """
+        while True:
+            res, record, err = self.scan_token()
+            if not res:
+                break
+            if err:
+                self.errors.append(err)
+            if record is not None:
+                token = Token(KIND_NAMES[record.kind], self.decode(self.code[record.start:record.start + record.length]),
+                              record.line, record.column, f"{CATEGORIES[record.category]}:{record.number}")
+                if record.is_first:
+                    self.category_lists[record.category].append(token)
+                yield token
 
-        if text.startswith('/*'):
-            end_comment_pos = text.find('*/')
+        self.check_unclosed_brackets()
+
+    def check_unclosed_brackets(self, errors: Optional[List[str]] = None):
+        # Проверка незакрытых скобок
+        errors = self.errors if errors is None else errors
+        while self.bracket_stack:
+            bracket, line, col = self.bracket_stack.pop()
+            errors.append(f"Ошибка: незакрытая скобка '{bracket}' на позиции {line}:{col}")
+
+    def next_token(self) -> Tuple[bool, Optional[str]]:
+        res, record, err = self.scan_token()
+        if record is not None:
+            token = self.token_list.add(record.kind, record.start, record.length, record.line, record.column,
+                                        record.category, record.number, record.depth)
+            if token.index % CHECKPOINT_INTERVAL == 0:
+                self.checkpoints.append(token.index)
+                self.checkpoint_stacks.append(tuple(self.open_brackets))
+            if record.kind in _OPENING_BRACKETS:
+                self.open_brackets.append(token.index)
+            elif record.kind in _CLOSING_BRACKETS:
+                # Закрывающая скобка попадает в поток, только если парна вершине стека скобок
+                opener = self.open_brackets.pop()
+                self.token_list.matches[opener] = token.index - opener
+                self.token_list.matches[token.index] = opener - token.index
+            if record.is_first:
+                self.category_lists[record.category].append(token)
+        # open_brackets идёт в ногу с bracket_stack: открывающая, снятая со стека
+        # несоответствием скобок, остаётся без пары
+        del self.open_brackets[len(self.bracket_stack):]
+        return res, err
+
+    def scan_token(self) -> Tuple[bool, Optional[TokenRecord], Optional[str]]:
+        code = self.code
+        base = self.base
+        # pos - позиция в code, self.pos и позиции в записях и ошибках - в полном тексте
+        pos = self.pos - base
+        if pos >= len(code):
+            return False, None, None
+        syntax = self.syntax
+
+        if code[pos:pos + 2] == syntax.block_comment:
+            end_comment_pos = code.find(syntax.block_comment_end, pos)
             if end_comment_pos == -1:
                 line, col = self.char_to_line_col(self.pos)
-                self.pos = len(self.code)
-                return True, f"Ошибка: незакрытый многострочный комментарий на позиции {line}:{col}"
+                self.error_spans.append((self.pos, -1))
+                self.pos = base + len(code)
+                return True, None, f"Ошибка: незакрытый многострочный комментарий на позиции {line}:{col}"
             else:
                 # Пропускаем весь комментарий
-                self.pos += end_comment_pos + 2
-                return True, None
+                self.pos = base + end_comment_pos + 2
+                return True, None, None
 
         # Пропуск однострочных комментариев
-        if text.startswith('//'):
+        if code[pos:pos + 2] == syntax.line_comment:
             # Пропускаем всю строку
-            next_line_pos = text.find('\n')
+            next_line_pos = code.find(syntax.newline, pos)
             if next_line_pos == -1:
-                self.pos = len(self.code)  # Конец файла
+                self.pos = base + len(code)  # Конец файла
             else:
-                self.pos += next_line_pos + 1
-            return True, None
-
-        valid_tokens = [t.name for t in get_token_types_list() if t.class_ in {"keyword", "operator"}]
-
-        for token_type in get_token_types_list():
-            regex = re.compile('^' + token_type.regex)
-            first_match = regex.match(text)
+                self.pos = base + next_line_pos + 1
+            return True, None, None
 
+        if self.dfa is not None:
+            first_match = self.dfa.match(code, pos)
+        else:
+            first_match = syntax.scanner.match(code, pos)
             if first_match:
-                regex_lookahead = re.compile('^' + token_type.regex + r'([^\w\.]|$)')
-                lookahead = regex_lookahead.match(text)
-                if not lookahead and (token_type.class_ == "keyword" or token_type.class_ == "constant"):
-                    continue
-
-                s = ""
-                typ = ""
-                flag_names = False
-                flag_punctuations = False
-                flag_operators = False
-                flag_keywords = False
-
-                if token_type.class_ == "variable" or token_type.class_ == "constant":
-                    temp_s = first_match.group().replace("`", "")
-                    if temp_s in self.table_names:
-                        s = str(self.table_names[temp_s])
-                    else:
-                        flag_names = True
-                        s = str(self.names_index)
-                        self.table_names[temp_s] = self.names_index
-                        self.names_index += 1
-                    typ = "N"
-                
-                elif token_type.class_ == "punctuation":
-                    if first_match.group() in self.table_punctuations:
-                        s = str(self.table_punctuations[first_match.group()])
-                    else:
-                        flag_punctuations = True
-                        s = str(self.punctuations_index)
-                        self.table_punctuations[first_match.group()] = self.punctuations_index
-                        self.punctuations_index += 1
-                    typ = "P"
-                
-                elif token_type.class_ == "operator":
-                    if first_match.group() in self.table_operators:
-                        s = str(self.table_operators[first_match.group()])
-                    else:
-                        flag_operators = True
-                        s = str(self.operators_index)
-                        self.table_operators[first_match.group()] = self.operators_index
-                        self.operators_index += 1
-                    typ = "O"
-                
-                elif token_type.class_ == "keyword":
-                    if first_match.group() in self.table_keywords:
-                        s = str(self.table_keywords[first_match.group()])
-                    else:
-                        flag_keywords = True
-                        s = str(self.keywords_index)
-                        self.table_keywords[first_match.group()] = self.keywords_index
-                        self.keywords_index += 1
-                    typ = "K"
-
-                line, col = self.char_to_line_col(self.pos)
-                new_token = Token(token_type.name, first_match.group(), line, col, f"{typ}:{s}")
-                self.pos += len(first_match.group())
-
-                # Обработка скобок
-                if token_type.class_ == "punctuation":
-                    if first_match.group() in {"(", "{", "["}:
-                        self.bracket_stack.append((first_match.group(), line, col))
-                    elif first_match.group() in {")", "}", "]"}:
-                        if not self.bracket_stack:
-                            return True, f"Ошибка: лишняя закрывающая скобка '{first_match.group()}' на позиции {line}:{col}"
-                        last_bracket, last_line, last_col = self.bracket_stack.pop()
-                        if (last_bracket == "(" and first_match.group() != ")") or (last_bracket == "{" and first_match.group() != "}") or (last_bracket == "[" and first_match.group() != "]"):
-                            return True, f"Ошибка: несоответствие скобок '{last_bracket}' и '{first_match.group()}' на позиции {line}:{col}"
-                
-                if token_type.class_ != "skip":
-                    self.token_list.append(new_token)
-                
-                if token_type.class_ == "keyword" and flag_keywords:
-                    self.keywords_token_list.append(new_token)
-                elif token_type.class_ == "operator" and flag_operators:
-                    self.operators_token_list.append(new_token)
-                elif token_type.class_ == "variable" and flag_names:
-                    self.names_token_list.append(new_token)
-                elif token_type.class_ == "constant" and flag_names:
-                    self.names_token_list.append(new_token)
-                elif token_type.class_ == "punctuation" and flag_punctuations:
-                    self.punctuations_token_list.append(new_token)
-                
-        
-                return True, None
+                first_match = first_match.lastgroup, first_match.end()
+        window = None
+        if self.is_bytes:
+            end = first_match[1] if first_match else pos
+            if not first_match or code[pos] > 0x7f or (end < len(code) and code[end] > 0x7f):
+                # Байтовые \w, \s и \d знают только ASCII: исход строкового шаблона мог бы
+                # быть другим, если совпадения нет или токен начинается либо кончается
+                # перед символом вне ASCII. Тогда строковыми шаблонами сканируется
+                # декодированный участок до конца строки, а не весь текст
+                window = self._decode_window(pos, end)
+                first_match = _STR_SYNTAX.scanner.match(window)
+                if first_match:
+                    first_match = first_match.lastgroup, pos + _encoded_length(window, first_match.end())
+        if first_match:
+            name, end = first_match
+            token_type = _TOKEN_TYPES_BY_NAME[name]
+            if token_type.class_ == "skip":
+                self.pos = base + end
+                return True, None, None
+
+            lexeme = self.decode(code[pos:end])
+            if token_type.class_ == "variable":
+                # Ключевые слова распознаются поиском в таблице после совпадения с идентификатором
+                keyword = _KEYWORD_TYPES.get(lexeme)
+                if keyword is not None and code[end:end + 1] != syntax.dot:
+                    token_type = keyword
+            number = 0
+            typ = ""
+            is_first = False
+
+            if token_type.class_ == "variable" or token_type.class_ == "constant":
+                temp_s = lexeme.replace("`", "")
+                if temp_s in self.table_names:
+                    number = self.table_names[temp_s]
+                else:
+                    is_first = True
+                    number = self.names_index
+                    self.table_names[temp_s] = self.names_index
+                    self.names_index += 1
+                    if token_type.class_ == "variable":
+                        self.suggestions.add_name(lexeme)
+                typ = "N"
             
-         # Если ни один токен не подошёл, ищем возможное исправление через расстояние Левенштейна
-        word_candidate = re.match(r'\w+', text)  # Извлекаем возможное слово
+            elif token_type.class_ == "punctuation":
+                if lexeme in self.table_punctuations:
+                    number = self.table_punctuations[lexeme]
+                else:
+                    is_first = True
+                    number = self.punctuations_index
+                    self.table_punctuations[lexeme] = self.punctuations_index
+                    self.punctuations_index += 1
+                typ = "P"
+            
+            elif token_type.class_ == "operator":
+                if lexeme in self.table_operators:
+                    number = self.table_operators[lexeme]
+                else:
+                    is_first = True
+                    number = self.operators_index
+                    self.table_operators[lexeme] = self.operators_index
+                    self.operators_index += 1
+                typ = "O"
+            
+            elif token_type.class_ == "keyword":
+                if lexeme in self.table_keywords:
+                    number = self.table_keywords[lexeme]
+                else:
+                    is_first = True
+                    number = self.keywords_index
+                    self.table_keywords[lexeme] = self.keywords_index
+                    self.keywords_index += 1
+                typ = "K"
+
+            start = self.pos
+            line, col = self.char_to_line_col(start)
+            self.pos = base + end
+            depth = len(self.bracket_stack)
+
+            # Обработка скобок
+            if token_type.class_ == "punctuation":
+                if lexeme in {"(", "{", "["}:
+                    self.bracket_stack.append((lexeme, line, col))
+                elif lexeme in {")", "}", "]"}:
+                    if not self.bracket_stack:
+                        return True, None, f"Ошибка: лишняя закрывающая скобка '{lexeme}' на позиции {line}:{col}"
+                    last_bracket, last_line, last_col = self.bracket_stack.pop()
+                    if (last_bracket == "(" and lexeme != ")") or (last_bracket == "{" and lexeme != "}") or (last_bracket == "[" and lexeme != "]"):
+                        return True, None, f"Ошибка: несоответствие скобок '{last_bracket}' и '{lexeme}' на позиции {line}:{col}"
+
+            record = TokenRecord(_KIND_IDS_BY_NAME[token_type.name], start, end - pos, line, col,
+                                 CATEGORY_IDS[typ], number, is_first, depth)
+            return True, record, None
+        
+         # Если ни один токен не подошёл, ищем возможное исправление через расстояние Левенштейна.
+        # Байтовый вход сюда приходит только с декодированным участком window
+        text, at = (code, pos) if window is None else (window, 0)
+        word_candidate = _WORD.match(text, at)  # Извлекаем возможное слово
         if word_candidate:
             word = word_candidate.group()
-            from difflib import get_close_matches
-            suggestions = get_close_matches(word, valid_tokens, n=1, cutoff=0.6)  # Ищем похожие токены
-            suggestion_msg = f" Возможно, вы имели в виду '{suggestions[0]}'?" if suggestions else ""
-            line, col = self.char_to_line_col(self.pos)
-            self.pos += len(word) 
-            return True, f"Ошибка в позиции {line}:{col}: '{word}' не распознано.{suggestion_msg}"
+            suggestion = self.suggestions.suggest(word)  # Ищем похожие токены и идентификаторы
+            suggestion_msg = f" Возможно, вы имели в виду '{suggestion}'?" if suggestion else ""
+            start = self.pos
+            line, col = self.char_to_line_col(start)
+            self.pos = base + (word_candidate.end() if window is None else pos + _encoded_length(window, word_candidate.end()))
+            # Неудачная попытка разобрать число могла заглянуть за слово на точку и цифру
+            self.error_spans.append((start, self.pos + 2))
+            return True, None, f"Ошибка в позиции {line}:{col}: '{word}' не распознано.{suggestion_msg}"
         
-        err_regex = re.compile(r'.*\w|.*$')
-        err = err_regex.match(text)
+        err = _ERROR.match(text, at)
         if err:
-            err = err.group().strip()
+            err = (err.group() if window is None else self.decode(code[pos:pos + _encoded_length(window, err.end())])).strip()
         line, col = self.char_to_line_col(self.pos)
-        self.pos += 1
-        return True, f"Position error {line} {col}: {err}"
-    
+        if code[pos:pos + 1] in syntax.quotes:
+            # Незакрытая строка: её смысл может изменить кавычка в любом месте ниже
+            self.error_spans.append((self.pos, -1))
+        else:
+            self.error_spans.append((self.pos, self.pos + 1))
+        self.pos += 1 if window is None else _encoded_length(window, 1)
+        return True, None, f"Position error {line} {col}: {err}"
+
+    def _decode_window(self, pos: int, end: int) -> str:
+        """Байтовый текст от pos до конца строки, на которой стоит end, вместе с переводом строки.
+
+        Если текст продолжается, в конец добавляется '\\0': иначе '$' строкового шаблона
+        совпал бы перед переводом строки, который в полном тексте не последний.
+        Неверные байты UTF-8 становятся суррогатами по одному на байт, чтобы длина
+        в символах переводилась обратно в байты без потерь.
+        """
+        code = self.code
+        line_end = code.find(b'\n', end)
+        if line_end == -1 or line_end + 1 == len(code):
+            return str(code[pos:], 'utf-8', 'surrogateescape')
+        return str(code[pos:line_end + 1], 'utf-8', 'surrogateescape') + "\0"
+
+    def apply_edit(self, offset: int, removed_len: int, inserted_text: str) -> TokenDiff:
+        """Применяет правку к тексту и пересканирует только затронутый участок token_list.
+
+        Сканирование начинается за два токена до правки (составной оператор вроде
+        "<<=" заглядывает на три символа вперёд) или раньше, если правка попадает
+        в просмотр вперёд нераспознанного участка. Стек скобок перед первым
+        пересканируемым токеном восстанавливается от ближайшего снимка checkpoints.
+        Сканирование останавливается, как только новый токен совпадёт со старым
+        (тот же вид и длина, смещение сдвинуто на разницу длин) и перед ним в обоих
+        потоках остался один и тот же начальный отрезок исходного стека: глубина
+        перед токеном равна наименьшей глубине на участке и в старом, и в новом
+        потоке. Кроме стека скобок, у лексера нет состояния между токенами, поэтому
+        после совпадения остаток потока тот же, что дало бы полное сканирование, - в
+        том числе лишние закрывающие скобки отбрасываются так же, и когда правка
+        открывает или закрывает многострочный комментарий или сырую строку.
+
+        Текст после первой правки хранится в SourceText и сканируется окном вокруг
+        участка; массивы token_list, индекс строк и снимки стека правятся по месту,
+        а сдвиг хвоста откладывается (см. TokenBuffer), так что правка стоит порядка
+        размера участка, а не текста. Таблицы идентификаторов только пополняются,
+        поэтому номера уже известных лексем не меняются.
+        """
+        if self.is_bytes:
+            raise ValueError("apply_edit requires a str source")
+        if offset < 0 or removed_len < 0 or offset + removed_len > len(self.code):
+            raise ValueError(f"Edit {offset}+{removed_len} is outside the source")
+
+        tokens = self.token_list
+        if not isinstance(self.code, SourceText):
+            self.code = tokens.source = SourceText(self.code)
+        source = self.code
+        old_end = offset + removed_len
+        new_end = offset + len(inserted_text)
+        offset_delta = len(inserted_text) - removed_len
+        old_line_count = self.line_index.line_count()
+        end_line = self.line_index.line_of(old_end)
+
+        first = tokens.find_start(offset) - 2
+        restart = tokens.start(first) if first >= 0 else 0
+        for span_start, span_end in self.error_spans:
+            if span_start >= restart:
+                break
+            if span_end == -1 or span_end >= offset:
+                restart = span_start
+                break
+        # Пересканирование начинается с начала токена: перед ним известен стек скобок
+        first = tokens.find_start(restart + 1) - 1
+        if first < 0:
+            first = restart = 0
+        else:
+            restart = tokens.start(first)
+        start_stack = self._bracket_stack_at(first)
+
+        source.splice(offset, removed_len, inserted_text)
+        self.line_index.apply_edit(offset, removed_len, inserted_text)
+        line_delta = self.line_index.line_count() - old_line_count
+
+        records = []
+        pairs = []
+        checkpoints = []
+        last_checkpoint = bisect_left(self.checkpoints, first)
+        last_checkpoint = self.checkpoints[last_checkpoint - 1] if last_checkpoint else -CHECKPOINT_INTERVAL
+        open_brackets = list(start_stack) # Как open_brackets в next_token, индексы - в новом потоке
+        errors = []
+        depths = tokens.depths
+        sync = len(tokens)
+        old_index = first
+        # Наименьшая глубина стека на пересканированном участке в старом и новом потоке
+        old_depth = new_depth = len(start_stack)
+        old_spans = self.error_spans
+        self.error_spans = old_spans[:bisect_left(old_spans, (restart,))]
+        self.bracket_stack = [(tokens.text(opener), tokens.line(opener), tokens.columns[opener])
+                              for opener in start_stack]
+        self.code = ""
+        self.base = self.pos = restart
+        synced = False
+        try:
+            while True:
+                self._extend_window(source)
+                res, record, err = self.scan_token()
+                if not res:
+                    break
+                if err:
+                    errors.append(err)
+                if record is None:
+                    del open_brackets[len(self.bracket_stack):]
+                    continue
+                new_depth = min(new_depth, record.depth)
+                if record.start >= new_end:
+                    old_start = record.start - offset_delta
+                    while old_index < len(tokens) and tokens.start(old_index) < old_start:
+                        old_depth = min(old_depth, depths[old_index])
+                        old_index += 1
+                    if (old_index < len(tokens) and tokens.start(old_index) == old_start
+                            and tokens.kinds[old_index] == record.kind and tokens.lengths[old_index] == record.length
+                            and record.depth == new_depth == depths[old_index] <= old_depth):
+                        sync = old_index
+                        synced = True
+                        break
+                index = first + len(records)
+                if index - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    checkpoints.append((index, tuple(open_brackets)))
+                    last_checkpoint = index
+                if record.kind in _OPENING_BRACKETS:
+                    open_brackets.append(index)
+                elif record.kind in _CLOSING_BRACKETS:
+                    pairs.append((open_brackets.pop(), index))
+                del open_brackets[len(self.bracket_stack):]
+                records.append(record)
+            if not synced:
+                self.check_unclosed_brackets(errors)
+        finally:
+            self.bracket_stack = []
+            self.code = source
+            self.base = 0
+            self.pos = len(source)
+
+        # Нераспознанные участки после точки совпадения не пересканировались: переносим со сдвигом
+        sync_start = tokens.start(sync) if synced else len(source) - offset_delta
+        self.error_spans.extend((span_start + offset_delta, span_end + offset_delta if span_end != -1 else -1)
+                                for span_start, span_end in old_spans[bisect_left(old_spans, (sync_start,)):])
+
+        removed = [tokens.snapshot(i) for i in range(first, sync)]
+        count_delta = len(records) - (sync - first)
+        # Первые вхождения из удалённого участка отвязываются от буфера, остальные сдвигаются
+        for category_list in self.category_lists:
+            for n, token in enumerate(category_list):
+                if isinstance(token, TokenView):
+                    if first <= token.index < sync:
+                        category_list[n] = tokens.snapshot(token.index)
+                    elif token.index >= sync:
+                        token.index += count_delta
+
+        # Снимки стека с участка заменяются снятыми при пересканировании; в снимках хвоста
+        # индексы из хвоста сдвигаются, а начальный отрезок стека лежит до участка
+        low = bisect_left(self.checkpoints, first)
+        high = bisect_left(self.checkpoints, sync)
+        tail_checkpoints = self.checkpoints[high:]
+        tail_stacks = self.checkpoint_stacks[high:]
+        if count_delta:
+            tail_checkpoints = [index + count_delta for index in tail_checkpoints]
+            tail_stacks = [tuple(opener + count_delta if opener >= sync else opener for opener in stack)
+                           for stack in tail_stacks]
+        self.checkpoints[low:] = [index for index, _ in checkpoints] + tail_checkpoints
+        self.checkpoint_stacks[low:] = [stack for _, stack in checkpoints] + tail_stacks
+
+        tokens.replace(first, sync, records)
+        tail = first + len(records)
+        tokens.shift(tail, offset_delta, line_delta)
+        # У токенов на строке, где закончилась правка, меняется и столбец
+        end_line += line_delta
+        index = tail
+        while index < len(tokens) and tokens.line(index) == end_line:
+            tokens.columns[index] = self.char_to_line_col(tokens.start(index))[1]
+            index += 1
+
+        inserted = tokens[first:tail]
+        for record, token in zip(records, inserted):
+            if record.is_first:
+                self.category_lists[record.category].append(token)
+        # Пары внутри участка связаны при сканировании. Открывающие исходного стека ниже
+        # точки совпадения закрываются в хвосте, и расстояние до пары меняется на
+        # разницу числа токенов; остальные получили пару на участке или остались без неё
+        matches = tokens.matches
+        kept = new_depth if synced else 0
+        for opener in start_stack[:kept]:
+            if matches[opener]:
+                closer = opener + matches[opener] + count_delta
+                matches[opener] = closer - opener
+                matches[closer] = opener - closer
+        for opener in start_stack[kept:]:
+            matches[opener] = 0
+        for opener, closer in pairs:
+            matches[opener] = closer - opener
+            matches[closer] = opener - closer
+
+        return TokenDiff(first, removed, inserted, offset_delta, errors)
+
+    def _bracket_stack_at(self, index: int) -> List[int]:
+        """open_brackets перед токеном index: от ближайшего снимка вперёд по глубинам токенов.
+
+        Глубина перед токеном учитывает и открывающие, снятые отброшенной закрывающей.
+        """
+        tokens = self.token_list
+        k = bisect_right(self.checkpoints, index) - 1
+        start, stack = (self.checkpoints[k], list(self.checkpoint_stacks[k])) if k >= 0 else (0, [])
+        depths, kinds = tokens.depths, tokens.kinds
+        for i in range(start, index):
+            del stack[depths[i]:]
+            if kinds[i] in _OPENING_BRACKETS:
+                stack.append(i)
+            elif kinds[i] in _CLOSING_BRACKETS:
+                stack.pop()
+        if index < len(tokens):
+            del stack[depths[index]:]
+        return stack
+
+    def _extend_window(self, source: SourceText):
+        """Дочитывает в окно code текст, который нужен scan_token с позиции self.pos.
+
+        Совпадения и просмотр вперёд не выходят за строку, кроме строк в кавычках и
+        многострочных комментариев. Окно должно содержать их конец и ещё одну строку за
+        ним: иначе '$' шаблона совпал бы перед переводом строки в конце окна, а не текста.
+        """
+        code, base = self.code, self.base
+        end = base + len(code)
+        if end == len(source):
+            return
+        pos = self.pos - base
+        head = code[pos:pos + 2] if pos + 2 <= len(code) else source[self.pos:self.pos + 2]
+        if head[:1] in self.syntax.quotes:
+            closing_text = head[0]
+        elif head == self.syntax.block_comment:
+            closing_text = self.syntax.block_comment_end
+        else:
+            closing_text = None
+        closing = pos if closing_text is None else code.find(closing_text, pos + 1)
+        if closing != -1:
+            newline = code.find('\n', closing)
+            if newline != -1 and code.find('\n', newline + 1) != -1:
+                return
+        far = base + pos if closing_text is None else source.find(closing_text, base + pos + 1)
+        newline = source.find('\n', far) if far != -1 else -1
+        newline = source.find('\n', newline + 1) if newline != -1 else -1
+        need = len(source) if newline == -1 else newline + 1
+        need = min(max(need, base + 2 * len(code), base + WINDOW_SIZE), len(source))
+        self.code = code + source[end:need]
 
     def char_to_line_col(self, char_index: int) -> Tuple[int, int]:
-        if char_index < 0 or char_index >= len(self.code):
-            return -1, -1
-    
-        line = 1
-        col = 1
+        return self.line_index.line_col(char_index)
 
-        for i in range(char_index):
-            if self.code[i] == '\n':
-                line += 1
-                col = 1
-            else:
-                col += 1
-        
-        return line, col
+    def line_col_to_char(self, line: int, col: int) -> int:
+        return self.line_index.offset(line, col)
     
     def levenshtein_distance(self, s1: str, s2: str) -> int:
         """Вычисляет расстояние Левенштейна между двумя строками"""
-        if len(s1) < len(s2):
-            s1, s2 = s2, s1
-
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-
-        return previous_row[-1]
+        return levenshtein_distance(s1, s2)
 
 
 
@@ -305,4 +700,99 @@ def get_token_types_list() -> List[TokenType]:
 
 
 
-    
\ No newline at end of file
+    
+
+# Граница слова, которую должны соблюдать ключевые слова и константы
+KEYWORD_BOUNDARY = r'(?=[^\w\.]|$)'
+
+
+def build_scanner(token_types: List[TokenType]) -> "re.Pattern[str]":
+    """Собирает таблицу токенов в одно регулярное выражение.
+
+    Каждый тип токена становится именованной группой, альтернативы идут в порядке
+    таблицы, поэтому приоритет совпадает с последовательным перебором типов.
+    Ключевые слова в выражение не входят: они отделяются от идентификаторов
+    поиском в _KEYWORD_TYPES после совпадения с правилом ident.
+    """
+    parts = []
+    for token_type in token_types:
+        if token_type.class_ == "keyword":
+            continue
+        part = f'(?P<{token_type.name}>{token_type.regex})'
+        if token_type.class_ == "keyword" or token_type.class_ == "constant":
+            part += KEYWORD_BOUNDARY
+        parts.append(part)
+    return re.compile('|'.join(parts))
+
+
+def table_signature(token_types: Optional[List[TokenType]] = None) -> str:
+    """Подпись таблицы токенов: по ней dfaScanner.py проверяется на устаревание."""
+    if token_types is None:
+        token_types = get_token_types_list()
+    digest = hashlib.sha256(KEYWORD_BOUNDARY.encode('utf-8'))
+    for token_type in token_types:
+        digest.update(f"\0{token_type.name}\0{token_type.regex}\0{token_type.class_}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_dfa_scanner():
+    """Модуль dfaScanner, собранный scannerGen.py из текущей таблицы токенов."""
+    try:
+        import dfaScanner
+    except ImportError:
+        raise RuntimeError("Нет dfaScanner.py: выполните `python scannerGen.py`") from None
+    if dfaScanner.TABLE_SIGNATURE != table_signature(_TOKEN_TYPES):
+        raise RuntimeError("dfaScanner.py собран по другой таблице токенов: выполните `python scannerGen.py`")
+    return dfaScanner
+
+
+def _encoded_length(text: str, end: int) -> int:
+    """Длина text[:end] в байтах исходного текста (см. Lexer._decode_window)."""
+    return len(text[:end].encode('utf-8', 'surrogateescape'))
+
+
+def to_bytes_pattern(pattern: str) -> bytes:
+    """Переводит шаблон в байтовый, совпадающий со строковым на тексте из ASCII.
+
+    \\w и \\d байтового шаблона знают только ASCII, а строковый \\s ловит ещё
+    разделители \\x1c-\\x1f. Токены рядом с другими символами Lexer.scan_token
+    досканирует строковым шаблоном.
+    """
+    result = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            escape = pattern[i:i + 2]
+            if escape == r'\s':
+                result.append(r'\s\x1c-\x1f' if in_class else r'[\s\x1c-\x1f]')
+            else:
+                result.append(escape)
+            i += 2
+            continue
+        if ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        result.append(ch)
+        i += 1
+    return ''.join(result).encode('ascii')
+
+
+_TOKEN_TYPES = get_token_types_list()
+_TOKEN_TYPES_BY_NAME = {t.name: t for t in _TOKEN_TYPES}
+_KIND_IDS_BY_NAME = {t.name: intern_kind(t.name) for t in _TOKEN_TYPES}
+# Конец ввода: лексер такого токена не выдаёт, но парсер принимает его в готовом потоке токенов
+KIND_EOF = intern_kind("EOF")
+_KEYWORD_TYPES = MappingProxyType({t.regex: t for t in _TOKEN_TYPES if t.class_ == "keyword"})
+_SCANNER = build_scanner(_TOKEN_TYPES)
+_WORD = re.compile(r'\w+')
+_ERROR = re.compile(r'.*\w|.*$')
+_STR_SYNTAX = LexerSyntax(_SCANNER, '/*', '*/', '//', '\n', '.', ('"', '`'))
+_BYTES_SYNTAX = LexerSyntax(re.compile(to_bytes_pattern(_SCANNER.pattern)), b'/*', b'*/', b'//', b'\n', b'.', (b'"', b'`'))
+# Виды скобок: закрывающая -> парная открывающая
+_CLOSING_BRACKETS = {_KIND_IDS_BY_NAME[closing]: _KIND_IDS_BY_NAME[opening]
+                     for opening, closing in (("lpar", "rpar"), ("lbrace", "rbrace"), ("lbracket", "rbracket"))}
+_OPENING_BRACKETS = frozenset(_CLOSING_BRACKETS.values())
+_SUGGESTION_WORDS = NGramIndex(t.name for t in _TOKEN_TYPES if t.class_ in {"keyword", "operator"})
@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from typing import List, Tuple, Union
+
+# Байты продолжения UTF-8 (10xxxxxx) не начинают нового символа
+_CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+
+
+class LineIndex:
+    """Индекс начал строк исходного текста.
+
+    Строится один раз за проход по тексту и переводит смещение в (строка, столбец)
+    бинарным поиском, а также выполняет обратное преобразование.
+    Строки и столбцы нумеруются с единицы.
+
+    Для байтового текста (UTF-8) смещения считаются в байтах, а столбцы - в символах.
+
+    Правка (apply_edit) не переписывает начала строк после себя: начала с номером
+    от _gap хранятся без отложенного сдвига _shift, который переносится в список
+    только на участке между прежней и новой правкой.
+    """
+
+    def __init__(self, code: Union[str, bytes]):
+        self.length = len(code)
+        # Байтовый текст нужен для подсчёта символов в столбцах; для str столбец равен разности смещений
+        self.code = None if isinstance(code, str) else code
+        newline_char = '\n' if self.code is None else b'\n'
+        self.line_starts: List[int] = [0]
+        newline = code.find(newline_char)
+        while newline != -1:
+            self.line_starts.append(newline + 1)
+            newline = code.find(newline_char, newline + 1)
+        self._gap = 0
+        self._shift = 0
+        # Последняя вычисленная позиция: при последовательных запросах по строке
+        # считаются только символы между соседними смещениями
+        self._last_line = 0
+        self._last_offset = 0
+        self._last_col = 0
+
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def line_of(self, offset: int) -> int:
+        """Номер строки, в которой находится смещение (допускается смещение конца текста)."""
+        gap = self._gap
+        if gap < len(self.line_starts) and offset >= self.line_starts[gap] + self._shift:
+            return bisect_right(self.line_starts, offset - self._shift, gap)
+        return bisect_right(self.line_starts, offset, 0, gap)
+
+    def line_start(self, line: int) -> int:
+        """Смещение начала строки line (с единицы)."""
+        index = line - 1
+        return self.line_starts[index] + self._shift if index >= self._gap else self.line_starts[index]
+
+    def apply_edit(self, offset: int, removed_len: int, inserted_text: str):
+        """Обновляет индекс после замены removed_len символов с offset на inserted_text (только для str)."""
+        old_end = offset + removed_len
+        low = self.line_of(offset)
+        high = self.line_of(old_end)
+        inserted = []
+        newline = inserted_text.find('\n')
+        while newline != -1:
+            inserted.append(offset + newline + 1)
+            newline = inserted_text.find('\n', newline + 1)
+        self._move_gap(high)
+        self.line_starts[low:high] = inserted
+        self._gap = low + len(inserted)
+        self._shift += len(inserted_text) - removed_len
+        self.length += len(inserted_text) - removed_len
+        self._last_line = 0
+
+    def _move_gap(self, gap: int):
+        if self._shift:
+            starts = self.line_starts
+            if self._gap < gap:
+                starts[self._gap:gap] = [start + self._shift for start in starts[self._gap:gap]]
+            else:
+                starts[gap:self._gap] = [start - self._shift for start in starts[gap:self._gap]]
+        self._gap = gap
+
+    def line_col(self, offset: int) -> Tuple[int, int]:
+        if offset < 0 or offset >= self.length:
+            return -1, -1
+        if self._shift:
+            line = self.line_of(offset)
+            line_start = self.line_start(line)
+        else:
+            line = bisect_right(self.line_starts, offset)
+            line_start = self.line_starts[line - 1]
+        if self.code is None:
+            return line, offset - line_start + 1
+
+        if line == self._last_line and offset >= self._last_offset:
+            col = self._last_col + self._count_chars(self._last_offset, offset)
+        else:
+            col = 1 + self._count_chars(line_start, offset)
+        self._last_line, self._last_offset, self._last_col = line, offset, col
+        return line, col
+
+    def offset(self, line: int, col: int) -> int:
+        if line < 1 or line > len(self.line_starts) or col < 1:
+            return -1
+        line_start = self.line_start(line)
+        line_end = self.line_start(line + 1) if line < len(self.line_starts) else self.length
+        if self.code is not None:
+            text = self.code[line_start:line_end].decode('utf-8', errors='replace')
+            if col > len(text):
+                return -1
+            return line_start + len(text[:col - 1].encode('utf-8'))
+
+        offset = line_start + col - 1
+        if offset >= line_end:
+            return -1
+        return offset
+
+    def _count_chars(self, start: int, end: int) -> int:
+        chunk = self.code[start:end]
+        return len(chunk.translate(None, _CONTINUATION_BYTES))
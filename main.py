@@ -1,77 +1,297 @@
+"""Лексический и синтаксический анализ файлов Go с записью отчётов.
+
+Запуск:
+    python main.py                         - go/product.go, отчёты в results/
+    python main.py go/ other/*.go a.go     - пакетный режим: файлы, каталоги и шаблоны
+        -o DIR          корень отчётов (по умолчанию results/); для каждого файла
+                        создаётся каталог с тем же относительным путём без .go
+        -j N            число процессов (по умолчанию - число ядер; 1 - без пула)
+        --chunksize N   файлов на одну передачу в процесс (по умолчанию подбирается)
+        --cache DIR     кэш результатов разбора на диске: неизменённые файлы не
+                        анализируются повторно (работает и для одного файла)
+        --cache-size M  предел размера кэша в МБ (по умолчанию 256)
+        --cst-format F  indent (по умолчанию), compact или jsonl (cst.jsonl, по строке
+                        на объявление верхнего уровня)
+        --binary        дополнительно cst.bin: CST, таблицы и токены в двоичном виде (см. cstBinary)
+        --token-format F  отчёты по токенам: txt (по умолчанию), csv, tsv, jsonl, npz;
+                        флаг можно повторять (см. tokenReports)
+        --report-encoding E  кодировка result.txt (по умолчанию cp1251)
+
+В пакетном режиме в корень отчётов пишется summary.json: ошибки и время по файлам.
+"""
+import argparse
+import glob
 import os
-from lexer import Lexer, get_token_types_list
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from cstBinary import write_binary
+from cstModel import Program
+from cstWriter import FORMATS as CST_FORMATS, CstWriter, dumps, file_name as cst_file_name
+from lexer import Lexer
+from parseCache import DEFAULT_MAX_BYTES, ParseCache
 from parser import Parser
-import json
+from tokenReports import FORMATS as TOKEN_FORMATS, token_rows, write_token_reports
+
+DEFAULT_FILE = "go/product.go"
+DEFAULT_OUTPUT = "results"
+
+# Версия состава результата analyze_file: входит в ключ кэша вместе с версией анализатора
+RESULT_VERSION = 3
 
 
-def main():
-    with open("go/product.go", "r") as file:
-        code = file.read()
+def write_json(path: str, value: Any):
+    with open(path, "w", encoding='utf-8') as file:
+        file.write(dumps(value, indent=2))
 
-    # Лексический анализ
-    lex = Lexer(code)
-    tokens = lex.lex_analyze()
-    # lex.lex_analyze()
 
-    # Синтаксический анализ
-    parser = Parser(tokens=tokens)
+def analyze_file(path: str, writer: Optional[CstWriter] = None, keep_cst: bool = True,
+                 source: Optional[bytes] = None) -> Dict[str, Any]:
+    """Лексический и синтаксический анализ файла; результат - простые данные для отчётов.
+
+    source - уже прочитанное содержимое файла (например, то, по которому считан
+    ключ кэша): тогда файл не открывается заново. Объявления верхнего уровня
+    передаются в writer по мере разбора; в result["cst"] они попадают, только если
+    keep_cst (например, для кэша). Исключение при разборе не прерывает анализ:
+    токены сохраняются, а сообщение попадает в поле "error" (деревья и таблицы
+    тогда отсутствуют).
+    """
+    result = {"error": None, "lex_time": 0.0, "parse_time": 0.0}
+
+    # Лексический анализ (файл отображается в память либо берутся прочитанные байты;
+    # текст сканируется как UTF-8)
+    started = time.perf_counter()
+    lex = Lexer.from_file(path) if source is None else Lexer(source)
     try:
-        ast = parser.parse()
+        tokens = lex.lex_analyze()
+        result["lex_errors"] = len(lex.errors)
+        result["lex_time"] = time.perf_counter() - started
+
+        # Синтаксический анализ: ошибки не прерывают разбор, а собираются в диагностики
+        started = time.perf_counter()
+        parser = Parser(tokens=tokens, recover=True)
+        declarations = []
+        try:
+            for node in parser.iter_declarations():
+                declaration = node.to_dict()
+                if writer is not None:
+                    writer.write(declaration)
+                if keep_cst:
+                    declarations.append(declaration)
+            result["cst"] = declarations if keep_cst else None
+            result["symbol_table"] = parser.get_symbol_table()
+            result["imports"] = parser.get_imports()
+            result["diagnostics"] = parser.get_diagnostics()
+        except Exception as e:
+            current = parser.current_token()
+            result["error"] = f"{e} (token {current.text if current else 'EOF'} at pos {parser.pos})"
+        result["parse_time"] = time.perf_counter() - started
+
+        result["token_rows"] = token_rows(lex.token_list, lex.category_lists)
+    finally:
+        lex.close()
+    return result
+
 
-        # Запись CST в файл
-        with open("results/cst.json", "w", encoding='utf-8') as ast_file:
-            json.dump(ast, ast_file, indent=2, ensure_ascii=False)
+def write_reports(result: Dict[str, Any], output_dir: str, cst_format: Optional[str] = "indent",
+                  binary: bool = False, token_formats: Sequence[str] = ("txt",), encoding: str = 'cp1251'):
+    """Отчёты из результата analyze_file; cst_format=None - CST уже записан при разборе."""
+    if binary:
+        roots = {} if result["error"] else {
+            "cst": {"type": Program.type, "children": result["cst"]},
+            "symbol_table": result["symbol_table"], "imports": result["imports"],
+            "diagnostics": result["diagnostics"]}
+        write_binary(os.path.join(output_dir, "cst.bin"), roots, result["token_rows"])
+    if not result["error"]:
+        if cst_format is not None:
+            with CstWriter(os.path.join(output_dir, cst_file_name(cst_format)), cst_format) as writer:
+                for declaration in result["cst"]:
+                    writer.write(declaration)
+        for name in ("symbol_table", "imports", "diagnostics"):
+            write_json(os.path.join(output_dir, name + ".json"), result[name])
+    write_token_reports(result["token_rows"], output_dir, token_formats, encoding)
 
-        # Запись таблицы символов в файл
-        with open("results/symbol_table.json", "w", encoding='utf-8') as sym_file:
-            json.dump(parser.get_symbol_table(), sym_file, indent=2, ensure_ascii=False)
 
-        # Запись импортов в файл
-        with open("results/imports.json", "w", encoding='utf-8') as imp_file:
-            json.dump(parser.get_imports(), imp_file, indent=2, ensure_ascii=False)
-    
+def process_file(path: str, output_dir: str, cache: Optional[ParseCache] = None,
+                 cst_format: str = "indent", binary: bool = False, token_formats: Sequence[str] = ("txt",),
+                 encoding: str = 'cp1251') -> Dict[str, Any]:
+    """Разбирает один файл и пишет его отчёты в output_dir; возвращает строку сводки.
+
+    CST пишется в файл по мере разбора (см. cstWriter). С кэшем файл, уже
+    разобранный той же версией лексера и парсера, не анализируется заново:
+    отчёты пишутся из сохранённого результата.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    result = key = source = None
+    if cache is not None:
+        # Ключ и разбор - по одному и тому же чтению файла: правка файла между ними
+        # не сохранит в кэше результат другого содержимого
+        with open(path, "rb") as file:
+            source = file.read()
+        key = cache.key(source)
+        result = cache.get(key)
+    cached = result is not None
+    written_format = cst_format
+    if not cached:
+        writer = CstWriter(os.path.join(output_dir, cst_file_name(cst_format)), cst_format)
+        try:
+            result = analyze_file(path, writer, keep_cst=cache is not None or binary, source=source)
+        except BaseException:
+            writer.abort()
+            raise
+        if result["error"]:
+            writer.abort()
+        else:
+            writer.close()
+        written_format = None
+        if cache is not None:
+            cache.put(key, result)
+
+    started = time.perf_counter()
+    write_reports(result, output_dir, written_format, binary, token_formats, encoding)
+    diagnostics = result.get("diagnostics", [])
+    return {"file": path, "output": output_dir, "tokens": len(result["token_rows"]),
+            "lex_errors": result["lex_errors"], "parse_errors": len(diagnostics), "error": result["error"],
+            "diagnostics": diagnostics, "cached": cached,
+            "lex_time": 0.0 if cached else result["lex_time"],
+            "parse_time": 0.0 if cached else result["parse_time"],
+            "write_time": time.perf_counter() - started}
+
+
+@lru_cache(maxsize=None)
+def open_cache(directory: Optional[str], max_bytes: int = DEFAULT_MAX_BYTES) -> Optional[ParseCache]:
+    # Один объект кэша на процесс: подпись версии анализатора считается один раз
+    return ParseCache(directory, max_bytes, RESULT_VERSION) if directory else None
+
+
+def _process_job(job) -> Dict[str, Any]:
+    path, output_dir, cache_dir, cache_bytes, report_options = job
+    try:
+        return process_file(path, output_dir, open_cache(cache_dir, cache_bytes), **report_options)
     except Exception as e:
-        print(f"Parsing error: {str(e)}")
-        print(f"Current token: {parser.current_token().text if parser.current_token() else 'EOF'} at pos {parser.pos}")
+        # Файл не прочитался или отчёт не записался: остальные файлы пакета обрабатываются дальше
+        return {"file": path, "output": output_dir, "error": f"{type(e).__name__}: {e}"}
+
+
+def collect_files(arguments: List[str]) -> List[str]:
+    """Файлы .go по путям, каталогам (рекурсивно) и шаблонам glob, без повторов."""
+    files = []
+    for argument in arguments:
+        if os.path.isdir(argument):
+            matches = glob.glob(os.path.join(argument, "**", "*.go"), recursive=True)
+        elif glob.has_magic(argument):
+            matches = glob.glob(argument, recursive=True)
+        else:
+            matches = [argument]
+        files.extend(sorted(matches))
+    return list(dict.fromkeys(os.path.normpath(path) for path in files))
 
 
-    # Запись результатов лексического анализа
-    with open("results/result.txt", "w", encoding='cp1251') as main_file, \
-         open("results/keywords.txt", "w") as keywords_file, \
-         open("results/operators.txt", "w") as operators_file, \
-         open("results/names.txt", "w") as names_file, \
-         open("results/punctuations.txt", "w") as punctuations_file:
+def output_dirs(files: List[str], output_root: str) -> List[str]:
+    # Каталоги отчётов повторяют пути файлов относительно их общего каталога
+    if not files:
+        return []
+    paths = [os.path.abspath(path) for path in files]
+    base = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return [os.path.join(output_root, os.path.splitext(os.path.relpath(path, base))[0]) for path in paths]
 
-        main_file.write(f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n")
-        main_file.write("=========================================================\n")
 
-        keywords_file.write(f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n")
-        keywords_file.write("=========================================================\n")
+def run_batch(files: List[str], output_root: str, workers: Optional[int] = None,
+              chunksize: Optional[int] = None, cache_dir: Optional[str] = None,
+              cache_bytes: int = DEFAULT_MAX_BYTES, **report_options) -> List[Dict[str, Any]]:
+    """Обрабатывает файлы в пуле процессов; сводки возвращаются в порядке files.
 
-        operators_file.write(f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n")
-        operators_file.write("=========================================================\n")
+    report_options - необязательные параметры process_file (cst_format, binary, ...).
+    """
+    jobs = [(path, output_dir, cache_dir, cache_bytes, report_options)
+            for path, output_dir in zip(files, output_dirs(files, output_root))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return [_process_job(job) for job in jobs]
+    if chunksize is None:
+        # Несколько передач на процесс: крупные файлы не задерживают весь пакет
+        chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = list(pool.map(_process_job, jobs, chunksize=chunksize))
+    cache = open_cache(cache_dir, cache_bytes)
+    if cache is not None:
+        # Счётчик размера общий, но процессы обновляют его без блокировок: в конце пакета
+        # размер сверяется с каталогом
+        cache.evict()
+    return summaries
 
-        names_file.write(f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n")
-        names_file.write("=========================================================\n")
 
-        punctuations_file.write(f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n")
-        punctuations_file.write("=========================================================\n")
+def write_summary(summaries: List[Dict[str, Any]], output_root: str, workers: int, elapsed: float) -> Dict[str, Any]:
+    failed = [summary for summary in summaries if summary.get("error")]
+    report = {
+        "files": len(summaries),
+        "failed": len(failed),
+        "tokens": sum(summary.get("tokens", 0) for summary in summaries),
+        "lex_errors": sum(summary.get("lex_errors", 0) for summary in summaries),
+        "parse_errors": sum(summary.get("parse_errors", 0) for summary in summaries),
+        "cached": sum(1 for summary in summaries if summary.get("cached")),
+        "workers": workers,
+        "elapsed": elapsed,
+        "cpu_time": sum(summary.get("lex_time", 0) + summary.get("parse_time", 0) + summary.get("write_time", 0)
+                        for summary in summaries),
+        "results": summaries,
+    }
+    os.makedirs(output_root, exist_ok=True)
+    write_json(os.path.join(output_root, "summary.json"), report)
+    return report
 
-        for token in lex.token_list:
-            main_file.write(f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n")
 
-        for token in lex.keywords_token_list:
-            keywords_file.write(f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n")
+def main(argv: Optional[List[str]] = None):
+    arguments = argparse.ArgumentParser(description="Лексический и синтаксический анализ файлов Go")
+    arguments.add_argument("paths", nargs="*", help="файлы .go, каталоги или шаблоны glob")
+    arguments.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="корень отчётов")
+    arguments.add_argument("-j", "--workers", type=int, default=None, help="число процессов")
+    arguments.add_argument("--chunksize", type=int, default=None, help="файлов на одну передачу в процесс")
+    arguments.add_argument("--cache", default=None, help="каталог кэша результатов разбора")
+    arguments.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                           help="предел размера кэша, МБ")
+    arguments.add_argument("--cst-format", choices=CST_FORMATS, default="indent", help="формат записи CST")
+    arguments.add_argument("--binary", action="store_true", help="писать также cst.bin")
+    arguments.add_argument("--token-format", action="append", choices=TOKEN_FORMATS, default=None,
+                           help="формат отчётов по токенам (можно повторять)")
+    arguments.add_argument("--report-encoding", default='cp1251', help="кодировка result.txt")
+    options = arguments.parse_args(argv)
+    report_options = {"cst_format": options.cst_format, "binary": options.binary,
+                      "token_formats": options.token_format or ["txt"], "encoding": options.report_encoding}
+    cache_bytes = options.cache_size * 1024 * 1024
 
-        for token in lex.operators_token_list:
-            operators_file.write(f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n")
+    if not options.paths:
+        # Один файл: отчёты прямо в корень, как раньше
+        summary = process_file(DEFAULT_FILE, options.output, open_cache(options.cache, cache_bytes),
+                               **report_options)
+        if summary["error"]:
+            print(f"Parsing error: {summary['error']}")
+        for diagnostic in summary["diagnostics"]:
+            print(f"Parsing error at {diagnostic['line']}:{diagnostic['column']} "
+                  f"('{diagnostic['text']}'): {diagnostic['message']}")
+        return
 
-        for token in lex.names_token_list:
-            names_file.write(f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n")
+    files = collect_files(options.paths)
+    workers = options.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    summaries = run_batch(files, options.output, workers, options.chunksize, options.cache, cache_bytes,
+                          **report_options)
+    report = write_summary(summaries, options.output, workers, time.perf_counter() - started)
 
-        for token in lex.punctuations_token_list:
-            punctuations_file.write(f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n")
+    for summary in summaries:
+        if summary.get("error"):
+            print(f"{summary['file']}: {summary['error']}")
+        elif summary["lex_errors"] or summary["parse_errors"]:
+            print(f"{summary['file']}: {summary['lex_errors']} lexical, {summary['parse_errors']} syntax errors")
+    print(f"{report['files']} files ({report['cached']} from cache), {report['tokens']} tokens, "
+          f"{report['failed']} failed, "
+          f"{report['lex_errors']} lexical and {report['parse_errors']} syntax errors "
+          f"in {report['elapsed']:.2f} s ({workers} workers)")
+    sys.exit(1 if report["failed"] else 0)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
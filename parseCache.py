@@ -0,0 +1,200 @@
+"""Кэш результатов лексического и синтаксического анализа на диске.
+
+Ключ - SHA-256 исходного файла, подписи таблицы токенов (lexer.table_signature)
+и подписи кода анализатора (parser_signature), поэтому любая правка таблицы или
+модулей из SIGNATURE_MODULES делает старые записи недостижимыми. Запись - сжатый pickle готовых к
+выводу данных (см. main.analyze_file): токены, CST, таблица символов, импорты и
+диагностики. Каждая запись пишется во временный файл и переносится на место
+через os.replace, так что параллельные процессы видят либо целую запись, либо
+никакой. Размер кэша ограничен: при превышении удаляются записи, к которым
+дольше всего не обращались (время обращения - mtime файла). Размер ведётся
+общим для всех процессов счётчиком в каталоге кэша (SIZE_FILE и PENDING_DIR), а
+каталог обходится только при превышении предела.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+from typing import Any, List, Optional, Tuple
+
+import lexer
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = ".bin"
+# После превышения предела кэш сокращается до этой доли max_bytes, чтобы следующий
+# обход каталога понадобился не на следующей же записи
+EVICT_TO = 0.9
+# Общий счётчик размера: итог последнего обхода каталога и по файлу на каждый объект
+# кэша (процесс) с размером его записей после этого обхода
+SIZE_FILE = "size"
+PENDING_DIR = "pending"
+
+# Модули, от которых зависит сохраняемый результат: токены и их строки и столбцы,
+# CST, таблица символов, импорты, диагностики и их тексты, состав результата
+# (main.analyze_file, tokenReports.token_rows). dfaScanner может быть не собран.
+SIGNATURE_MODULES = ("tokenModel", "lineIndex", "sourceText", "suggestionIndex", "dfaScanner", "lexer", "tokenCursor",
+                     "cstModel", "parser", "tokenReports", "main")
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parser_signature(directory: str = _ROOT) -> str:
+    """Подпись кода, от которого зависит результат анализа: файлы SIGNATURE_MODULES в directory.
+
+    Файлы читаются без импорта (main импортирует этот модуль).
+    """
+    digest = hashlib.sha256(lexer.table_signature().encode('utf-8'))
+    for name in SIGNATURE_MODULES:
+        try:
+            with open(os.path.join(directory, name + ".py"), "rb") as source:
+                digest.update(b"\0" + source.read())
+        except FileNotFoundError:
+            digest.update(b"\0-")
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, version: int = 0):
+        """version - версия формата сохраняемых значений: её смена тоже делает записи недостижимыми."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.signature = f"{parser_signature()}:{version}"
+        os.makedirs(os.path.join(directory, PENDING_DIR), exist_ok=True)
+        self.pending = 0 # Размер записей этого объекта после последнего обхода каталога
+        self.evict()
+
+    @property
+    def size(self) -> int:
+        """Размер кэша по общему счётчику: записи всех процессов, а не только этого."""
+        total = _read_number(os.path.join(self.directory, SIZE_FILE))
+        pending_dir = os.path.join(self.directory, PENDING_DIR)
+        try:
+            names = os.listdir(pending_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            total += _read_number(os.path.join(pending_dir, name))
+        return total
+
+    def _add_pending(self, delta: int):
+        # Файл объекта удаляется обходом каталога (evict любого процесса): его записи
+        # уже учтены в итоге обхода. Имя содержит pid: процесс, созданный fork, ведёт свой файл
+        path = os.path.join(self.directory, PENDING_DIR, f"{os.getpid()}.{id(self):x}")
+        if not os.path.exists(path):
+            self.pending = 0
+        self.pending += delta
+        _write_number(path, self.pending)
+
+    def key(self, source: bytes) -> str:
+        digest = hashlib.sha256(self.signature.encode('utf-8'))
+        digest.update(b"\0" + source)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+        except FileNotFoundError:
+            return None
+        try:
+            value = pickle.loads(zlib.decompress(data))
+        except Exception:
+            # Повреждённая запись (например, диск переполнился при записи) - как промах
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any):
+        """Сохраняет value; слишком глубоко вложенное значение (pickle рекурсивен) не кэшируется."""
+        try:
+            data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except RecursionError:
+            return
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as entry:
+                entry.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            self._remove(temporary)
+            raise
+        self._add_pending(len(data) - replaced)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Записи кэша: (mtime, размер, путь)."""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Если кэш больше max_bytes, удаляет самые давние по обращению записи, пока
+        он не сократится до EVICT_TO от предела. Итог обхода (с записями всех
+        процессов) становится новым общим счётчиком."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+        _write_number(os.path.join(self.directory, SIZE_FILE), total)
+        pending_dir = os.path.join(self.directory, PENDING_DIR)
+        for name in os.listdir(pending_dir):
+            self._remove(os.path.join(pending_dir, name))
+        self.pending = 0
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _read_number(path: str) -> int:
+    # Отсутствующий или недописанный файл счётчика - ноль
+    try:
+        with open(path, encoding='ascii') as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_number(path: str, value: int):
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding='ascii') as file:
+            file.write(str(value))
+        os.replace(temporary, path)
+    except OSError:
+        # Счётчик - оценка: несохранённое значение поправит следующий обход каталога
+        ParseCache._remove(temporary)
@@ -0,0 +1,133 @@
+"""Профиль правил парсера: число вызовов, суммарное время и глубина вложенности.
+
+Профилировщик подключается при создании парсера: Parser(tokens, profiler=RuleProfiler()).
+Без него правила вызываются напрямую и ничего не стоят.
+
+Запуск:
+    python parseProfiler.py                   - таблица по правилам для go/*.go
+    python parseProfiler.py --json a.go b.go  - то же в JSON
+    python parseProfiler.py --trace a.go      - вход в каждое правило с позицией и токеном
+"""
+import glob
+import inspect
+import json
+import os
+import sys
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "go", "*.go")
+
+
+class RuleStats:
+    __slots__ = ("calls", "time", "max_depth", "active")
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0 # Секунды; для рекурсивного правила - только внешние вызовы
+        self.max_depth = 0 # Наибольшая глубина вложенности правил при входе в это правило
+        self.active = 0
+
+
+class RuleProfiler:
+    """Статистика по правилам; trace - поток для строки на каждый вход в правило.
+
+    Один профилировщик можно передавать нескольким парсерам подряд: статистика
+    копится по всем разобранным файлам.
+    """
+
+    def __init__(self, trace: Optional[TextIO] = None):
+        self.trace = trace
+        self.stats: Dict[str, RuleStats] = {}
+        self.depth = 0
+        self.max_depth = 0
+        self.parser = None
+        self._starts: List[float] = []
+
+    def enter(self, rule: str):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+        stats = self.stats.get(rule)
+        if stats is None:
+            stats = self.stats[rule] = RuleStats()
+        stats.calls += 1
+        stats.active += 1
+        if self.depth > stats.max_depth:
+            stats.max_depth = self.depth
+        if self.trace is not None:
+            token = self.parser.current_token()
+            where = f"{token.text} ({token.kind})" if token else "EOF"
+            print(f"{'  ' * (self.depth - 1)}{rule} at pos {self.parser.pos}: {where}", file=self.trace)
+        self._starts.append(perf_counter())
+
+    def exit(self, rule: str):
+        elapsed = perf_counter() - self._starts.pop()
+        stats = self.stats[rule]
+        stats.active -= 1
+        if not stats.active:
+            stats.time += elapsed
+        self.depth -= 1
+
+    def wrap(self, function: Callable) -> Callable:
+        """Обёртка правила, которое сразу возвращает результат.
+
+        Правила-генераторы возвращаются как есть: их отмечает Parser._run_profiled,
+        когда они выполняются.
+        """
+        if inspect.isgeneratorfunction(function):
+            return function
+        rule = function.__name__.lstrip("_")
+
+        @wraps(function)
+        def profiled(*args, **kwargs):
+            self.enter(rule)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit(rule)
+        return profiled
+
+    def to_dict(self) -> Dict[str, Any]:
+        rules = sorted(self.stats.items(), key=lambda item: item[1].time, reverse=True)
+        return {
+            "max_depth": self.max_depth,
+            "rules": {
+                rule: {"calls": stats.calls, "time": stats.time, "max_depth": stats.max_depth}
+                for rule, stats in rules
+            }
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def report(self) -> str:
+        lines = [f"{'Rule':<32} {'Calls':>9} {'Time, ms':>10} {'Max depth':>10}",
+                 "=" * 64]
+        for rule, stats in self.to_dict()["rules"].items():
+            lines.append(f"{rule:<32} {stats['calls']:>9} {stats['time'] * 1000:>10.2f} {stats['max_depth']:>10}")
+        lines.append(f"Max depth: {self.max_depth}")
+        return "\n".join(lines)
+
+
+def profile_files(files: List[str], profiler: RuleProfiler) -> RuleProfiler:
+    from lexer import Lexer
+    from parser import Parser
+
+    for path in files:
+        lex = Lexer.from_file(path)
+        try:
+            Parser(lex.lex_analyze(), recover=True, profiler=profiler).parse()
+        finally:
+            lex.close()
+    return profiler
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    as_json = "--json" in arguments
+    trace = sys.stdout if "--trace" in arguments else None
+    files = [argument for argument in arguments if not argument.startswith("--")] or sorted(glob.glob(SAMPLES))
+    profiler = profile_files(files, RuleProfiler(trace))
+    print(profiler.to_json() if as_json else profiler.report())
@@ -1,15 +1,138 @@
-from typing import List, Dict, Any, Optional
-from tokenModel import Token
+from collections.abc import Sequence
+from types import GeneratorType
+from typing import Iterable, List, Dict, Any, FrozenSet, NamedTuple, Optional, Generator, Iterator, Tuple
+from lexer import KIND_EOF
+from tokenModel import KIND_IDS, KIND_NAMES, Token
+from tokenCursor import make_cursor
+from cstModel import (Node, TokenLeaf, Leaf, Wrapper, Identifier, Operator, Punctuation, NumberLiteral, StringLiteral,
+                      BinaryOperation, AssignmentExpression, UnaryOperation, FieldAccess, PackageCall, SliceExpression,
+                      IndexExpression, FunctionCall, ArrayLiteral, ArrayType, FieldValue, StructInitialization,
+                      PackageDeclaration, ImportSpec, ImportDeclaration, FieldSpec, TypeDeclaration, VariableDeclaration,
+                      Receiver, Param, FunctionDeclaration, IfStatement, RangeStatement, ForStatement, CaseClause,
+                      DefaultClause, SwitchStatement, ContinueStatement, BreakStatement, ReturnStatement, Program,
+                      ErrorNode, to_plain, shifted)
+
+# Правило разбора - генератор: отдаёт генераторы вложенных правил и получает их
+# результаты от Parser._run, а своё значение возвращает через return.
+# Правила из таблиц разбора без вложенных правил возвращают узел сразу.
+Rule = Generator[Any, Any, Any]
+
+# Виды токенов, с которыми сравнивает парсер, - как целые из tokenModel.KIND_IDS
+# (таблицу заполняет лексер при импорте)
+_IDENT = KIND_IDS["ident"]
+_EOF = KIND_EOF
+_DECLARATION_FOLLOWERS = frozenset({KIND_IDS["short_declaration"], KIND_IDS["comma"]})
+# Разбор объявления верхнего уровня смотрит не дальше одного токена за его конец
+# (необязательная ';' после '}'): от этого токена объявление тоже зависит
+_LOOKAHEAD = 1
+
+# Встроенные типы Go; вид токена из этого набора тоже читается как имя типа
+_BUILTIN_TYPES = frozenset({
+    "bool", "string", "int", "int8", "int16", "int32", "int64",
+    "uint", "uint8", "uint16", "uint32", "uint64", "float32", "float64"
+})
+# Вид токена -> читается ли он как имя типа. Заполняется видами, которые встретились
+# во входе: имена встроенных типов - не виды токенов лексера и в KIND_IDS не заносятся
+_TYPE_NAME_KINDS: Dict[int, bool] = {_IDENT: True}
+
+
+def _is_type_name(token: Token) -> bool:
+    kind_id = token.kind_id
+    type_name = _TYPE_NAME_KINDS.get(kind_id)
+    if type_name is None:
+        if kind_id < 0:
+            # Вида нет в таблице лексера (поток токенов собран не лексером)
+            return token.kind in _BUILTIN_TYPES
+        type_name = _TYPE_NAME_KINDS[kind_id] = KIND_NAMES[kind_id] in _BUILTIN_TYPES
+    return type_name
+
+# Старшинство бинарных операторов Go (чем больше, тем сильнее связывает).
+# '<<', '>>' и '&^' лексер сейчас выдаёт по частям, но таблица их уже знает.
+_BINARY_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3, "<": 3, "<=": 3, ">": 3, ">=": 3,
+    "+": 4, "-": 4, "|": 4, "^": 4,
+    "*": 5, "/": 5, "%": 5, "<<": 5, ">>": 5, "&": 5, "&^": 5,
+}
+_BINARY_KINDS = frozenset(KIND_IDS[name] for name in ("comparison", "logical", "arithmetic", "bitwise"))
+
+# Префиксные унарные операторы; операнд — первичное выражение.
+_PREFIX_OPERATORS = frozenset({"+", "-", "!", "^", "*", "&", "++", "--"})
+_PREFIX_KINDS = ("arithmetic", "unary", "bitwise", "increment_decrement")
+
+# Точки синхронизации при восстановлении после ошибки
+_BRACKET_PAIRS = {"lpar": "rpar", "lbrace": "rbrace", "lbracket": "rbracket"}
+_DECLARATION_KINDS = frozenset({"package", "import", "type", "func", "var"})
+_BLOCK_STATEMENT_KINDS = frozenset({"if", "for", "switch"})
+
+# Правила, которые возвращают результат сразу и вызываются по имени, а не из таблиц
+_PROFILED_METHODS = ("parse_package", "parse_import", "parse_type_declaration", "parse_type", "parse_function",
+                     "parse_body")
 
 class ParseError(Exception):
     pass
 
+
+class Diagnostic(NamedTuple):
+    """Ошибка разбора, после которой парсер восстановился (Parser(recover=True))."""
+    message: str
+    line: int
+    column: int
+    text: str # Токен, на котором обнаружена ошибка
+
+
+class DeclarationRecord(NamedTuple):
+    """Объявление верхнего уровня из последнего разбора - то, что Parser.reparse
+    может перенести в новый разбор без повторного разбора."""
+    node: Node
+    start: int # Токены объявления [start, end)
+    end: int
+    key: int # Хеш видов и текстов токенов участка и _LOOKAHEAD токенов за ним
+    pos_start: int # Номера Pos объявления [pos_start, pos_end)
+    pos_end: int
+    types: FrozenSet[str] # Типы, известные к началу объявления (от них зависит разбор 'T {')
+    symbols: List[Tuple[str, str, str, Any]] # Записи в таблицу символов: (таблица, владелец, имя, значение)
+    imports: List[Any]
+    diagnostics: List[Diagnostic]
+    # Сдвиг (номеров Pos, индексов токенов) от значений в node, symbols и imports к текущим
+    shift: Tuple[int, int] = (0, 0)
+
 class Parser:
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: Iterable[Token], lazy_bodies: bool = False, recover: bool = False, profiler=None):
+        # Список токенов или поток (например, Lexer.iter_tokens())
         self.tokens = tokens
-        self.pos = 0
+        self.cursor = make_cursor(tokens)
+        # Тела функций пропускаются по парной скобке и разбираются по требованию.
+        # Пропущенное тело не расходует номера Pos, поэтому Pos совпадают с полным
+        # разбором только до первого пропущенного тела; тело при разборе продолжает
+        # нумерацию с номера своей '{'.
+        self.lazy_bodies = lazy_bodies
+        if lazy_bodies and not isinstance(tokens, Sequence):
+            raise ValueError("lazy_bodies requires a token sequence, not a stream")
+        # Ошибка в операторе или объявлении не прерывает разбор: участок до точки
+        # синхронизации становится ErrorNode, а сама ошибка - записью в diagnostics
+        self.recover = recover
+        if recover and not isinstance(tokens, Sequence):
+            raise ValueError("recover requires a token sequence, not a stream")
+        self.diagnostics: List[Diagnostic] = []
         self.token_counter = 0
-        self.symbol_table = {
+        self.symbol_table = self._new_symbol_table()
+        # Все записи в таблицу символов по порядку; объявления ссылаются на свои участки
+        self.symbols: List[Tuple[str, str, str, Any]] = []
+        self.imports = []
+        # Объявления последнего разбора для reparse (только для последовательности токенов)
+        self.declarations: List[DeclarationRecord] = []
+        self.current_scope = "-Global-"
+        # Профилировщик правил (parseProfiler.RuleProfiler) встраивается только здесь:
+        # без него парсер не делает ни одной лишней проверки или вызова
+        self.profiler = profiler
+        if profiler is not None:
+            self._instrument(profiler)
+
+    @staticmethod
+    def _new_symbol_table() -> Dict[str, Any]:
+        return {
             "scopes": {
                 "-Global-": {
                     "constants": {},
@@ -18,62 +141,226 @@ class Parser:
             },
             "types": {}
         }
-        self.imports = []
-        self.current_scope = "-Global-"
+
+    def _declare(self, table: str, owner: str, name: str, value: Any):
+        # Переменная области owner или поле типа owner; запись попадает и в журнал self.symbols
+        if table == "types":
+            self.symbol_table["types"].setdefault(owner, {"fields": {}})["fields"][name] = value
+        else:
+            self.symbol_table["scopes"].setdefault(owner, {"variables": {}, "constants": {}})["variables"][name] = value
+        self.symbols.append((table, owner, name, value))
+
+    @property
+    def pos(self) -> int:
+        return self.cursor.pos
+
+    @pos.setter
+    def pos(self, value: int):
+        self.cursor.seek(value)
 
     def current_token(self) -> Optional[Token]:
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        return self.cursor.peek(0)
     
     def next_token(self) -> Optional[Token]:
-        return self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
+        return self.cursor.peek(1)
     
     def consume_token(self):
-        if self.pos < len(self.tokens):
-            self.pos += 1
+        self.cursor.advance()
     
     def get_next_token_pos(self) -> int:
         pos = self.token_counter
         self.token_counter += 1
         return pos
+
+    def _mark(self) -> tuple:
+        return self.pos, self.token_counter
+
+    def _reset(self, mark: tuple):
+        self.pos, self.token_counter = mark
+
+    def _run(self, rule) -> Any:
+        """Выполняет правило-генератор на явном стеке.
+
+        Правило не вызывает другие правила напрямую, а отдаёт их генераторы через
+        yield и получает обратно результат (или исключение через throw). Глубина
+        вложенности конструкций Go поэтому ограничена только памятью, а не
+        пределом рекурсии интерпретатора.
+        """
+        stack = [rule]
+        value = None
+        error = None
+        while True:
+            try:
+                if error is None:
+                    call = stack[-1].send(value)
+                else:
+                    call = stack[-1].throw(error)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value, error = stop.value, None
+                continue
+            except Exception as exc:
+                stack.pop()
+                if not stack:
+                    raise
+                value, error = None, exc
+                continue
+            stack.append(call)
+            value, error = None, None
+
+    def _instrument(self, profiler):
+        # Правила-генераторы отмечает _run_profiled, остальные правила и таблицы
+        # разбора подменяются на уровне экземпляра обёртками профилировщика
+        profiler.parser = self
+        self._run = self._run_profiled
+        for name in _PROFILED_METHODS:
+            setattr(self, name, profiler.wrap(getattr(self, name)))
+        for table in ("_DECLARATION_RULES", "_STATEMENT_RULES", "_OPERAND_RULES"):
+            setattr(self, table, {kind: profiler.wrap(rule) for kind, rule in getattr(Parser, table).items()})
+
+    def _run_profiled(self, rule) -> Any:
+        """_run с отметками профилировщика при входе в каждое правило и выходе из него."""
+        profiler = self.profiler
+        stack = [rule]
+        profiler.enter(rule.__name__.lstrip("_"))
+        value = None
+        error = None
+        while True:
+            try:
+                if error is None:
+                    call = stack[-1].send(value)
+                else:
+                    call = stack[-1].throw(error)
+            except StopIteration as stop:
+                profiler.exit(stack.pop().__name__.lstrip("_"))
+                if not stack:
+                    return stop.value
+                value, error = stop.value, None
+                continue
+            except Exception as exc:
+                profiler.exit(stack.pop().__name__.lstrip("_"))
+                if not stack:
+                    raise
+                value, error = None, exc
+                continue
+            stack.append(call)
+            profiler.enter(call.__name__.lstrip("_"))
+            value, error = None, None
+
+    def _parse_block_statement(self) -> Rule:
+        # Оператор внутри блока; в режиме восстановления ошибка в нём не выходит
+        # за пределы блока
+        if not self.recover:
+            return (yield self._parse_statement())
+        # Лексер не выдаёт лишние закрывающие скобки, поэтому незакрытый блок
+        # может дойти до следующей функции или до конца файла: закрываем его там
+        token = self.current_token()
+        if token.kind in {"func", "EOF"}:
+            raise ParseError(f"Expected '}}' before '{token.text}'")
+        start = self._mark()
+        try:
+            return (yield self._parse_statement())
+        except ParseError as error:
+            return self._recover(start, error, in_block=True)
+
+    def _recover(self, start: tuple, error: ParseError, in_block: bool) -> ErrorNode:
+        """Записывает ошибку в diagnostics и пропускает конструкцию, начатую в start.
+
+        Пропущенные токены нумеруются заново с номера Pos начала конструкции и
+        попадают в ErrorNode, так что Pos остаются сквозными. Восстанавливаются
+        только ошибки синтаксиса (ParseError): любое другое исключение - ошибка в
+        самом парсере и выходит из разбора как есть.
+        """
+        token = self.current_token() or (self.tokens[-1] if self.tokens else None)
+        if token is not None:
+            self.diagnostics.append(Diagnostic(str(error), token.line, token.column, token.text))
+        else:
+            self.diagnostics.append(Diagnostic(str(error), 0, 0, ""))
+        end = self._synchronize(start[0], self.pos, in_block)
+        self._reset(start)
+        nodes = []
+        while self.pos < end:
+            nodes.append(TokenLeaf(self.current_token(), self.get_next_token_pos()))
+            self.consume_token()
+        return ErrorNode(str(error), nodes)
+
+    def _synchronize(self, start: int, error_index: int, in_block: bool) -> int:
+        """Индекс, с которого разбор продолжается после ошибки.
+
+        Скобки от start перескакиваются парами, поэтому ';' и '}' внутри них не
+        считаются. Остановка - после ';' не раньше места ошибки, перед '}',
+        закрывающей текущий блок, или перед ключевым словом объявления. Ошибка в
+        заголовке if/for/switch пропускает оператор вместе с его блоком: ';'
+        заголовка for точкой синхронизации не считаются.
+        """
+        tokens = self.tokens
+        block_statement = in_block and tokens[start].kind in _BLOCK_STATEMENT_KINDS
+        i = start
+        while i < len(tokens):
+            kind = tokens[i].kind
+            if kind in _BRACKET_PAIRS:
+                closing = self._matching(i)
+                if closing < 0:
+                    i += 1
+                    continue
+                i = closing + 1
+                if (block_statement and kind == "lbrace" and closing >= error_index
+                        and (i >= len(tokens) or tokens[i].kind != "else")):
+                    if i < len(tokens) and tokens[i].kind == "semicolon":
+                        i += 1
+                    return i
+                continue
+            if kind == "EOF":
+                return i if i > start else i + 1
+            if kind == "rbrace" and in_block:
+                return i
+            if kind == "semicolon" and i >= error_index and not block_statement:
+                return i + 1
+            if kind in _DECLARATION_KINDS and i > start and i >= error_index:
+                return i
+            i += 1
+        return i
     
-    def parse_package(self) -> Dict[str, Any]:
+    def parse_package(self) -> Node:
         nodes = []
         token = self.current_token()
         if token and token.kind == "package":
-            nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(token, self.get_next_token_pos()))
             self.consume_token()
 
             ident = self.current_token()
             if ident and ident.kind == "ident":
-                nodes.append({"Name": ident.kind, "Text": ident.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(ident, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected identifier after 'package'")
             
             semicolon = self.current_token()
             if semicolon and semicolon.kind == "semicolon":
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected ';' after package declaration")
             
-        return {"type": "PackageDeclaration", "nodes": nodes}
+        return PackageDeclaration(nodes)
     
-    def parse_import(self) -> Dict[str, Any]:
+    def parse_import(self) -> Node:
         nodes = []
         imports = []
         imports_names = []
         token = self.current_token()
 
         if token and token.kind == "import":
-            nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(token, self.get_next_token_pos()))
             self.consume_token()
 
             has_paren = False
             next_token = self.current_token()
             if next_token and next_token.kind == "lpar":
                 has_paren = True
-                nodes.append({"Name": next_token.kind, "Text": next_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(next_token, self.get_next_token_pos()))
                 self.consume_token()
             
             while self.current_token() and self.current_token().kind == "string":
@@ -82,10 +369,10 @@ class Parser:
 
                 semicolon = self.current_token()
                 if semicolon and semicolon.kind == "semicolon":
-                    imports.append({
-                        "package": {"Name": import_token.kind, "Text": import_token.text, "Pos": self.get_next_token_pos()},
-                        "semicolon": {"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()}
-                    })
+                    imports.append(ImportSpec(
+                        TokenLeaf(import_token, self.get_next_token_pos()),
+                        TokenLeaf(semicolon, self.get_next_token_pos())
+                    ))
                     package_name = import_token.text.strip('"')
                     imports_names.append({"Package": {"Name": package_name, "Pos": self.token_counter - 2}})
                     self.consume_token()
@@ -100,45 +387,45 @@ class Parser:
             if has_paren:
                 r_paren = self.current_token()
                 if r_paren and r_paren.kind == "rpar":
-                    nodes.append({"Name": r_paren.kind, "Text": r_paren.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(r_paren, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected ')' after import list")
             
             semicolon = self.current_token()
             if semicolon and semicolon.kind == "semicolon":
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
                 self.consume_token()
             
             self.imports.extend(imports_names)
 
-        return {"type": "ImportDeclaration", "nodes": nodes, "imports": imports}
+        return ImportDeclaration(nodes, imports)
     
-    def parse_type_declaration(self) -> Optional[Dict[str, Any]]:
+    def parse_type_declaration(self) -> Optional[Node]:
         nodes = []
         token = self.current_token()
 
         if token and token.kind == "type":
-            nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(token, self.get_next_token_pos()))
             self.consume_token()
 
             type_name = self.current_token()
             if type_name and type_name.kind == "ident":
-                nodes.append({"Name": type_name.kind, "Text": type_name.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(type_name, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected type name after 'type'")
 
             struct_token = self.current_token()
             if struct_token and struct_token.kind == "struct":
-                nodes.append({"Name": struct_token.kind, "Text": struct_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(struct_token, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected 'struct' keyword")
 
             l_brace = self.current_token()
             if l_brace and l_brace.kind == "lbrace":
-                nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '{' after 'struct'")
@@ -147,24 +434,22 @@ class Parser:
             while self.current_token() and self.current_token().kind != "rbrace":
                 field_name = self.current_token()
                 if field_name and field_name.kind == "ident":
-                    nodes.append({"Name": field_name.kind, "Text": field_name.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(field_name, self.get_next_token_pos()))
                     self.consume_token()
                     
                     field_type = self.parse_type()
                     if field_type:
-                        field_type_node = {"Name": "Type", "Text": field_type, "Pos": self.get_next_token_pos()}
+                        field_type_node = Leaf("Type", field_type, self.get_next_token_pos())
                         nodes.append(field_type_node)
                         
                         semicolon = self.current_token()
                         if semicolon and semicolon.kind == "semicolon":
-                            fields.append({
-                                "field_name": {"Name": field_name.kind, "Text": field_name.text, "Pos": self.get_next_token_pos()},
-                                "field_type": field_type_node,
-                                "semicolon": {"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()}
-                            })
-                            self.symbol_table["types"].setdefault(type_name.text, {"fields": {}})[
-                                "fields"
-                            ][field_name.text] = field_type
+                            fields.append(FieldSpec(
+                                TokenLeaf(field_name, self.get_next_token_pos()),
+                                field_type_node,
+                                TokenLeaf(semicolon, self.get_next_token_pos())
+                            ))
+                            self._declare("types", type_name.text, field_name.text, field_type)
                             self.consume_token()
                         else:
                             raise ParseError("Expected ';' after field declaration")
@@ -175,25 +460,27 @@ class Parser:
 
             r_brace = self.current_token()
             if r_brace and r_brace.kind == "rbrace":
-                nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '}' after struct fields")
 
             semicolon = self.current_token()
             if semicolon and semicolon.kind == "semicolon":
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected ';' after '}'")
 
-            return {"type": "TypeDeclaration", "name": type_name.text, "fields": fields, "nodes": nodes}
+            return TypeDeclaration(type_name.text, fields, nodes)
         return None
     
-    def parse_variable_declaration(self, consume_semicolon=True) -> Optional[Dict[str, Any]]:
+    def parse_variable_declaration(self, consume_semicolon=True) -> Optional[Node]:
+        return self._run(self._parse_variable_declaration(consume_semicolon))
+
+    def _parse_variable_declaration(self, consume_semicolon=True) -> Rule:
         nodes = []
         token = self.current_token()
-        print(f"Parsing variable declaration at pos {self.pos}: {token.text if token else 'None'} ({token.kind if token else 'None'})")
         
         is_var_declaration = token and token.kind == "var"
         next_tok = self.next_token()
@@ -203,7 +490,7 @@ class Parser:
             return None
 
         if is_var_declaration:
-            nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(token, self.get_next_token_pos()))
             self.consume_token()
 
         var_names = []
@@ -211,14 +498,14 @@ class Parser:
             var_name = self.current_token()
             if var_name and var_name.kind == "ident":
                 var_names.append(var_name)
-                nodes.append({"Name": var_name.kind, "Text": var_name.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(var_name, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected variable name")
 
             comma = self.current_token()
             if comma and comma.kind == "comma":
-                nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 break
@@ -230,56 +517,54 @@ class Parser:
             if type_start and type_start.kind == "lbracket":
                 var_type = self.parse_type()
                 if var_type:
-                    nodes.append({"Name": "Type", "Text": var_type, "Pos": self.get_next_token_pos()})
-            elif type_start and (type_start.kind == "ident" or type_start.kind in self._get_keywords()):
+                    nodes.append(Leaf("Type", var_type, self.get_next_token_pos()))
+            elif type_start and _is_type_name(type_start):
                 var_type = self.parse_type()
                 if var_type:
-                    nodes.append({"Name": "Type", "Text": var_type, "Pos": self.get_next_token_pos()})
+                    nodes.append(Leaf("Type", var_type, self.get_next_token_pos()))
             else:
                 var_type = "auto"
 
         assign_token = self.current_token()
         if assign_token and (assign_token.kind == "assignment" or assign_token.kind == "short_declaration"):
-            nodes.append({"Name": assign_token.kind, "Text": assign_token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(assign_token, self.get_next_token_pos()))
             self.consume_token()
 
-            expr = self.parse_expression()
-            nodes.append({"type": "Expression", "value": expr})
+            expr = yield self._parse_expression()
+            nodes.append(Wrapper("Expression", expr))
             
             # Infer type from expression if not explicitly provided
-            if var_type == "auto" and expr["type"] == "ArrayLiteral" and "array_type" in expr:
-                var_type = f"[{expr.get('size', '')}]{expr['array_type']}"
+            if var_type == "auto" and expr.type == "ArrayLiteral":
+                var_type = f"[{expr.size}]{expr.array_type}"
             
             scope = self.current_scope or "-Global-"
             for var_name in var_names:
-                self.symbol_table["scopes"].setdefault(scope, {"variables": {}, "constants": {}})
-                self.symbol_table["scopes"][scope]["variables"][var_name.text] = {
+                self._declare("scopes", scope, var_name.text, {
                     "type": var_type or "auto",
                     "pos": self.token_counter,
                     "value": expr
-                }
+                })
         elif is_var_declaration:
             scope = self.current_scope or "-Global-"
             for var_name in var_names:
-                self.symbol_table["scopes"].setdefault(scope, {"variables": {}, "constants": {}})
-                self.symbol_table["scopes"][scope]["variables"][var_name.text] = {
+                self._declare("scopes", scope, var_name.text, {
                     "type": var_type,
                     "pos": self.token_counter
-                }
+                })
         else:
             raise ParseError("Expected assignment for short declaration")
 
         if consume_semicolon:
             semicolon = self.current_token()
             if semicolon and semicolon.kind == "semicolon":
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
                 self.consume_token()
             elif semicolon and semicolon.kind != "EOF":
                 raise ParseError("Expected ';' after variable declaration")
 
-        return {"type": "VariableDeclaration", "nodes": nodes}
+        return VariableDeclaration(nodes)
     
-    def parse_struct_initialization(self) -> Dict[str, Any]:
+    def _parse_struct_initialization(self) -> Rule:
         nodes = []
         struct_name = None
         struct_name_str = ""
@@ -288,25 +573,25 @@ class Parser:
         current = self.current_token()
         if current and current.kind == "ident":
             struct_name_str = current.text
-            nodes.append({"Name": current.kind, "Text": current.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(current, self.get_next_token_pos()))
             self.consume_token()
 
             # Проверяем, есть ли точка (например, product.Product)
             dot = self.current_token()
             if dot and dot.kind == "dot":
-                nodes.append({"Name": dot.kind, "Text": dot.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(dot, self.get_next_token_pos()))
                 self.consume_token()
                 next_ident = self.current_token()
                 if next_ident and next_ident.kind == "ident":
                     struct_name_str += f".{next_ident.text}"
-                    nodes.append({"Name": next_ident.kind, "Text": next_ident.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(next_ident, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected identifier after '.'")
 
         l_brace = self.current_token()
         if l_brace and l_brace.kind == "lbrace":
-            nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '{' for struct initialization")
@@ -315,34 +600,34 @@ class Parser:
         while self.current_token() and self.current_token().kind != "rbrace":
             field_name = self.current_token()
             if field_name and field_name.kind == "ident":
-                nodes.append({"Name": field_name.kind, "Text": field_name.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(field_name, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected struct field name")
 
             colon = self.current_token()
             if colon and colon.kind == "colon":
-                nodes.append({"Name": colon.kind, "Text": colon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(colon, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected ':' after field name")
 
-            field_value = self.parse_expression()
-            fields.append({"name": field_name.text, "value": field_value})
+            field_value = yield self._parse_expression()
+            fields.append(FieldValue(field_name.text, field_value))
 
             comma = self.current_token()
             if comma and comma.kind == "comma":
-                nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                 self.consume_token()
 
         r_brace = self.current_token()
         if r_brace and r_brace.kind == "rbrace":
-            nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '}' to end struct initialization")
 
-        return {"type": "StructInitialization", "struct_name": struct_name_str, "fields": fields, "nodes": nodes}
+        return StructInitialization(struct_name_str, fields, nodes)
     
     def parse_type(self) -> Optional[str]:
         type_token = self.current_token()
@@ -390,7 +675,7 @@ class Parser:
             
             return f"map[{key_type}]{value_type}"
         
-        if type_token.kind in {"ident"} or type_token.kind in self._get_keywords():
+        if _is_type_name(type_token):
             type_name = type_token.text
             self.consume_token()
             
@@ -409,17 +694,18 @@ class Parser:
         
         return None
     
-    def parse_expression(self) -> Dict[str, Any]:
-        current = self.current_token()
-        print(f"Parsing expression at pos {self.pos}: {current.text if current else 'None'} ({current.kind if current else 'None'})")
-        
-        return self.parse_assignment_expression()
+    def parse_expression(self) -> Node:
+        return self._run(self._parse_expression())
+
+    def _parse_expression(self) -> Rule:
+        return (yield self._parse_assignment_expression())
+
         
-    def parse_array(self) -> Dict[str, Any]:
+    def _parse_array(self) -> Rule:
         nodes = []
         l_bracket = self.current_token()
         if l_bracket and l_bracket.kind == "lbracket":
-            nodes.append({"Name": l_bracket.kind, "Text": l_bracket.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_bracket, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '[' for array")
@@ -429,12 +715,12 @@ class Parser:
         size_token = self.current_token()
         if size_token and size_token.kind == "integer":
             size = size_token.text
-            nodes.append({"Name": size_token.kind, "Text": size_token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(size_token, self.get_next_token_pos()))
             self.consume_token()
 
         r_bracket = self.current_token()
         if r_bracket and r_bracket.kind == "rbracket":
-            nodes.append({"Name": r_bracket.kind, "Text": r_bracket.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_bracket, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected ']' for array type")
@@ -443,22 +729,16 @@ class Parser:
         array_type = self.parse_type()
         if not array_type:
             raise ParseError("Expected array element type")
-        nodes.append({"Name": "ArrayType", "Text": array_type, "Pos": self.get_next_token_pos()})
+        nodes.append(Leaf("ArrayType", array_type, self.get_next_token_pos()))
 
         # Parse initialization list (e.g., {1, -2, ...})
         l_brace = self.current_token()
         if l_brace and l_brace.kind == "lbrace":
-            nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             # If no initialization list, return type-only array (e.g., for type declarations)
-            return {
-                "type": "ArrayType",
-                "array_type": array_type,
-                "size": size,
-                "elements": [],
-                "nodes": nodes
-            }
+            return ArrayType(array_type, size, [], nodes)
 
         elements = []
         while self.current_token() and self.current_token().kind != "rbrace":
@@ -468,45 +748,35 @@ class Parser:
                 number_token = self.current_token()
                 if number_token and number_token.kind in {"integer", "float"}:
                     self.consume_token()
-                    elements.append({
-                        "type": "NumberLiteral",
-                        "value": f"-{number_token.text}",
-                        "Pos": self.get_next_token_pos()
-                    })
+                    elements.append(NumberLiteral(f"-{number_token.text}", self.get_next_token_pos()))
                 else:
                     raise ParseError("Expected number after '-'")
             elif self.current_token().kind == "lbrace":
-                struct = self.parse_struct_initialization()
+                struct = yield self._parse_struct_initialization()
                 elements.append(struct)
             else:
-                element = self.parse_expression()
+                element = yield self._parse_expression()
                 elements.append(element)
 
             comma = self.current_token()
             if comma and comma.kind == "comma":
-                nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                 self.consume_token()
 
         r_brace = self.current_token()
         if r_brace and r_brace.kind == "rbrace":
-            nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '}' for array initialization")
 
-        return {
-            "type": "ArrayLiteral",
-            "array_type": array_type,
-            "size": size,
-            "elements": elements,
-            "nodes": nodes
-        }
+        return ArrayLiteral(array_type, size, elements, nodes)
     
-    def parse_struct(self) -> Dict[str, Any]:
-        return self.parse_struct_initialization()
+    def parse_struct(self) -> Node:
+        return self._run(self._parse_struct_initialization())
     
-    def parse_assignment_expression(self) -> Dict[str, Any]:
-        left = self.parse_comparison_expression()
+    def _parse_assignment_expression(self) -> Rule:
+        left = yield self._parse_binary_expression()
         operator = self.current_token()
         
         # Поддержка всех операторов присваивания Go
@@ -514,15 +784,18 @@ class Parser:
                         operator.text in {"=", ":=", "+=", "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<=", ">>=", "&&=", "||="}):
             operator_pos = self.get_next_token_pos()
             self.consume_token()
-            right = self.parse_comparison_expression()
-            
-            # Проверка, является ли правая часть потенциальной инициализацией структуры
-            if right["type"] in {"Identifier", "FieldAccess"}:
-                next_token = self.current_token()
-                if next_token and next_token.kind == "lbrace":
-                    self.pos -= 1  # Перемотка для повторного разбора идентификатора или доступа к полю
-                    self.token_counter -= 1
-                    right = self.parse_struct_initialization()
+            # Правая часть 'T {' или 'pkg.T {' - инициализация структуры. Известный тип
+            # 'T {' разбирает сам _parse_operand_name (и операторы после литерала тоже)
+            prefix = self._struct_literal_prefix()
+            if prefix > 0 or (prefix == 0 and self.current_token().text not in self.symbol_table["types"]):
+                # В узел попадает только имя типа; имена перед ним получают номера Pos и пропускаются
+                for _ in range(prefix):
+                    self.get_next_token_pos()
+                    self.consume_token()
+                    self.consume_token()
+                right = yield self._parse_struct_initialization()
+            else:
+                right = yield self._parse_binary_expression()
             
             has_semicolon = False
             semicolon = self.current_token()
@@ -530,245 +803,179 @@ class Parser:
                 self.consume_token()
                 has_semicolon = True
                 
-            return {
-                "type": "AssignmentExpression",
-                "left": left,
-                "operator": {"type": "Operator", "value": operator.text, "Pos": operator_pos},
-                "right": right,
-                "semicolon": {"type": "Punctuation", "value": semicolon.text, "Pos": self.get_next_token_pos()} if has_semicolon else None
-            }
+            return AssignmentExpression(
+                left,
+                Operator(operator.text, operator_pos),
+                right,
+                Punctuation(semicolon.text, self.get_next_token_pos()) if has_semicolon else None
+            )
         return left
     
-    def parse_comparison_expression(self) -> Dict[str, Any]:
-        left = self.parse_additive_expression()
-        
+    def _struct_literal_prefix(self) -> int:
+        # Число имён перед именем типа в 'T {', 'pkg.T {', 'a.b.T {' без продвижения
+        # курсора; -1 - с текущего токена литерал не начинается
+        peek = self.cursor.peek
+        offset = 0
         while True:
-            operator = self.current_token()
-            if operator and (operator.kind == "comparison" and operator.text in {"==", "!=", "<", ">", "<=", ">="} or
-                            operator.kind == "logical" and operator.text in {"&&", "||"}):
-                self.consume_token()
-                operator_pos = self.get_next_token_pos()
-                right = self.parse_additive_expression()
-                left = {
-                    "type": "BinaryOperation",
-                    "left": left,
-                    "operator": {"type": "Operator", "value": operator.text, "Pos": operator_pos},
-                    "right": right
-                }
-            else:
-                break
-        return left
-    
-    def parse_additive_expression(self) -> Dict[str, Any]:
-        left = self.parse_multiplicative_expression()
-        
+            name = peek(offset)
+            if not name or name.kind != "ident":
+                return -1
+            following = peek(offset + 1)
+            if following and following.kind == "lbrace":
+                return offset // 2
+            if not following or following.kind != "dot":
+                return -1
+            offset += 2
+
+    def _parse_binary_expression(self, min_precedence: int = 1) -> Rule:
+        # Разбор по старшинству операторов: один цикл вместо цепочки уровней.
+        # Правый операнд разбирается с порогом на единицу выше, поэтому все
+        # бинарные операторы Go левоассоциативны.
+        left = yield self._parse_primary_expression()
+
         while True:
             operator = self.current_token()
-            if operator and operator.kind == "arithmetic" and operator.text in {"+", "-"}:
-                self.consume_token()
-                operator_pos = self.get_next_token_pos()
-                right = self.parse_multiplicative_expression()
-                left = {
-                    "type": "BinaryOperation",
-                    "left": left,
-                    "operator": {"type": "Operator", "value": operator.text, "Pos": operator_pos},
-                    "right": right
-                }
-            else:
+            if not operator or operator.kind_id not in _BINARY_KINDS:
                 break
-        return left
-    
-    def parse_multiplicative_expression(self) -> Dict[str, Any]:
-        left = self.parse_primary_expression()
-        
-        while True:
-            operator = self.current_token()
-            if operator and operator.kind == "arithmetic" and operator.text in {"*", "/"}:
-                self.consume_token()
-                operator_pos = self.get_next_token_pos()
-                right = self.parse_primary_expression()
-                left = {
-                    "type": "BinaryOperation",
-                    "left": left,
-                    "operator": {"type": "Operator", "value": operator.text, "Pos": operator_pos},
-                    "right": right
-                }
-            else:
+            precedence = _BINARY_PRECEDENCE.get(operator.text)
+            if precedence is None or precedence < min_precedence:
                 break
+            self.consume_token()
+            operator_pos = self.get_next_token_pos()
+            right = yield self._parse_binary_expression(precedence + 1)
+            left = BinaryOperation(left, Operator(operator.text, operator_pos), right)
         return left
     
-    def parse_primary_expression(self) -> Dict[str, Any]:
+    def _parse_primary_expression(self) -> Rule:
         token = self.current_token()
         if not token:
             raise ParseError("Unexpected end of input")
         
-        print(f"Parsing primary expression at pos {self.pos}: {token.text} ({token.kind})")
+        rule = self._OPERAND_RULES.get(token.kind_id)
+        if rule is None:
+            raise ParseError(f"Unexpected token: {token.text}")
+        node = rule(self)
+        if isinstance(node, GeneratorType):
+            node = yield node
+        return node
+
+    def _parse_operand_name(self) -> Rule:
+        token = self.current_token()
+        # Проверяем, является ли это началом инициализации структуры (например, Store{...})
+        next_token = self.next_token()
+        if next_token and next_token.kind == "lbrace" and token.text in self.symbol_table["types"]:
+            return (yield self._parse_struct_initialization())
+
+        identifier = Identifier(token.text, self.get_next_token_pos())
+        self.consume_token()
         
-        if token.kind == "ident":
-            identifier = {"type": "Identifier", "value": token.text, "Pos": self.get_next_token_pos()}
-            self.consume_token()
-            
-            # Проверяем, является ли это началом инициализации структуры (например, Store{...})
+        while True:
             next_token = self.current_token()
-            if next_token and next_token.kind == "lbrace" and identifier["value"] in self.symbol_table["types"]:
-                # Перематываем назад, чтобы parse_struct_initialization обработал идентификатор
-                self.pos -= 1
-                self.token_counter -= 1
-                return self.parse_struct_initialization()
-            
-            while True:
+            if next_token and next_token.kind == "dot":
+                identifier = yield self._parse_package_or_field_access(identifier)
                 next_token = self.current_token()
-                if next_token and next_token.kind == "dot":
-                    identifier = self.parse_package_or_field_access(identifier)
-                    next_token = self.current_token()
+            
+            elif next_token and next_token.kind == "lbracket":  # Handle index or slice
+                self.consume_token()  # Consume '['
+                nodes = [Leaf("lbracket", "[", self.get_next_token_pos())]
                 
-                elif next_token and next_token.kind == "lbracket":  # Handle index or slice
-                    self.consume_token()  # Consume '['
-                    nodes = [{"Name": "lbracket", "Text": "[", "Pos": self.get_next_token_pos()}]
-                    
-                    start_expr = None
-                    end_expr = None
-                    colon = self.current_token()
-                    
-                    if colon and colon.kind != "colon" and colon.kind != "rbracket":
-                        start_expr = self.parse_expression()
-                        nodes.append({"type": "StartExpression", "value": start_expr})
-                    
-                    colon = self.current_token()
-                    if colon and colon.kind == "colon":
-                        self.consume_token()
-                        nodes.append({"Name": "colon", "Text": ":", "Pos": self.get_next_token_pos()})
-                        
-                        r_bracket = self.current_token()
-                        if r_bracket and r_bracket.kind != "rbracket":
-                            end_expr = self.parse_expression()
-                            nodes.append({"type": "EndExpression", "value": end_expr})
+                start_expr = None
+                end_expr = None
+                colon = self.current_token()
+                
+                if colon and colon.kind != "colon" and colon.kind != "rbracket":
+                    start_expr = yield self._parse_expression()
+                    nodes.append(Wrapper("StartExpression", start_expr))
+                
+                colon = self.current_token()
+                if colon and colon.kind == "colon":
+                    self.consume_token()
+                    nodes.append(Leaf("colon", ":", self.get_next_token_pos()))
                     
                     r_bracket = self.current_token()
-                    if r_bracket and r_bracket.kind == "rbracket":
-                        self.consume_token()
-                        nodes.append({"Name": "rbracket", "Text": "]", "Pos": self.get_next_token_pos()})
-                    else:
-                        raise ParseError("Expected ']' after index or slice")
-                    
-                    if colon and colon.kind == "colon":
-                        identifier = {
-                            "type": "SliceExpression",
-                            "array": identifier,
-                            "start": start_expr,
-                            "end": end_expr,
-                            "nodes": nodes
-                        }
-                    else:
-                        identifier = {
-                            "type": "IndexExpression",
-                            "array": identifier,
-                            "index": start_expr,
-                            "nodes": nodes
-                        }
-                    next_token = self.current_token()
+                    if r_bracket and r_bracket.kind != "rbracket":
+                        end_expr = yield self._parse_expression()
+                        nodes.append(Wrapper("EndExpression", end_expr))
                 
-                elif next_token and (next_token.kind == "arithmetic" or next_token.kind == "increment_decrement") and next_token.text in {"++", "--"}:
+                r_bracket = self.current_token()
+                if r_bracket and r_bracket.kind == "rbracket":
                     self.consume_token()
-                    return {
-                        "type": "UnaryOperation",
-                        "operator": {"type": "Operator", "value": next_token.text, "Pos": self.get_next_token_pos()},
-                        "operand": identifier,
-                        "is_prefix": False
-                    }
-                
-                elif next_token and next_token.kind == "lpar":
-                    return self.parse_function_call(identifier)
+                    nodes.append(Leaf("rbracket", "]", self.get_next_token_pos()))
+                else:
+                    raise ParseError("Expected ']' after index or slice")
                 
+                if colon and colon.kind == "colon":
+                    identifier = SliceExpression(identifier, start_expr, end_expr, nodes)
                 else:
-                    break
+                    identifier = IndexExpression(identifier, start_expr, nodes)
+                next_token = self.current_token()
             
-            return identifier
-        
-        if token.kind == "lbracket":  # Handle array literals
-            return self.parse_array()
-        
-        if token.kind == "arithmetic" and token.text == "-":
-            self.consume_token()
-            operand = self.parse_primary_expression()
-            return {
-                "type": "UnaryOperation",
-                "operator": {"type": "Operator", "value": "-", "Pos": self.get_next_token_pos()},
-                "operand": operand,
-                "is_prefix": True
-            }
-        
-        if token.kind == "unary" and token.text == "!":
-            self.consume_token()
-            operand = self.parse_primary_expression()
-            return {
-                "type": "UnaryOperation",
-                "operator": {"type": "Operator", "value": "!", "Pos": self.get_next_token_pos()},
-                "operand": operand,
-                "is_prefix": True
-            }
-        
-        if token.kind in {"arithmetic", "increment_decrement"} and token.text in {"++", "--"}:
-            operator = token.text
-            self.consume_token()
-            operand = self.parse_primary_expression()
-            return {
-                "type": "UnaryOperation",
-                "operator": {"type": "Operator", "value": operator, "Pos": self.get_next_token_pos()},
-                "operand": operand,
-                "is_prefix": True
-            }
-        
-        if token.kind == "integer":
-            self.consume_token()
-            return {"type": "NumberLiteral", "value": token.text, "Pos": self.get_next_token_pos()}
-        if token.kind == "float":
-            self.consume_token()
-            return {"type": "NumberLiteral", "value": token.text, "Pos": self.get_next_token_pos()}
-        if token.kind in {"string", "raw_string"}:  # Поддержка raw_string
-            self.consume_token()
-            return {"type": "StringLiteral", "value": token.text, "Pos": self.get_next_token_pos()}
-        if token.kind == "lpar":
-            self.consume_token()
-            expr = self.parse_expression()
-            r_paren = self.current_token()
-            if r_paren and r_paren.kind == "rpar":
+            elif next_token and (next_token.kind == "arithmetic" or next_token.kind == "increment_decrement") and next_token.text in {"++", "--"}:
                 self.consume_token()
-                return expr
-            raise ParseError("Expected ')' after expression")
+                return UnaryOperation(Operator(next_token.text, self.get_next_token_pos()), identifier, False)
+            
+            elif next_token and next_token.kind == "lpar":
+                return (yield self._parse_function_call(identifier))
+            
+            else:
+                break
         
-        raise ParseError(f"Unexpected token: {token.text}")
+        return identifier
+
+    def _parse_prefix_operation(self) -> Rule:
+        token = self.current_token()
+        if token.text not in _PREFIX_OPERATORS:
+            raise ParseError(f"Unexpected token: {token.text}")
+        self.consume_token()
+        operand = yield self._parse_primary_expression()
+        return UnaryOperation(Operator(token.text, self.get_next_token_pos()), operand, True)
+
+    def _parse_number_literal(self) -> Node:
+        token = self.current_token()
+        self.consume_token()
+        return NumberLiteral(token.text, self.get_next_token_pos())
+
+    def _parse_string_literal(self) -> Node:
+        token = self.current_token()
+        self.consume_token()
+        return StringLiteral(token.text, self.get_next_token_pos())
+
+    def _parse_parenthesized(self) -> Rule:
+        self.consume_token()
+        expr = yield self._parse_expression()
+        r_paren = self.current_token()
+        if r_paren and r_paren.kind == "rpar":
+            self.consume_token()
+            return expr
+        raise ParseError("Expected ')' after expression")
     
-    def parse_package_or_field_access(self, identifier: Dict[str, Any]) -> Dict[str, Any]:
+    def _parse_package_or_field_access(self, identifier: Node) -> Rule:
         self.consume_token()  # Skip dot
         field_or_func = self.current_token()
         if field_or_func and field_or_func.kind == "ident":
             self.consume_token()
             next_token = self.current_token()
             if next_token and next_token.kind == "lpar":
-                return self.parse_function_call({
-                    "type": "PackageCall",
-                    "package": identifier,
-                    "function": {"type": "Identifier", "value": field_or_func.text, "Pos": self.get_next_token_pos()}
-                })
-            return {
-                "type": "FieldAccess",
-                "object": identifier,
-                "field": {"type": "Identifier", "value": field_or_func.text, "Pos": self.get_next_token_pos()}
-            }
+                return (yield self._parse_function_call(PackageCall(identifier, Identifier(field_or_func.text, self.get_next_token_pos()))))
+            return FieldAccess(identifier, Identifier(field_or_func.text, self.get_next_token_pos()))
         raise ParseError("Expected field or function name after dot")
     
-    def parse_function_call(self, function_info: Dict[str, Any]) -> Dict[str, Any]:
-        print(f"Parsing function call: {function_info}")
+    def _parse_function_call(self, function_info: Node) -> Rule:
         nodes = []
         package_name = None
-        function_name = function_info["value"] if "value" in function_info else function_info["function"]["value"]
-        if function_info["type"] == "PackageCall":
-            package_name = function_info["package"]["value"]
+        if function_info.type == "PackageCall":
+            function_name = function_info.function.value
+            # Получатель - пакет или переменная (имя) либо выражение: a.b.f(), x.y().z()
+            package = function_info.package
+            package_name = package.value if package.type == "Identifier" else package
+        elif function_info.type == "Identifier":
+            function_name = function_info.value
+        else:
+            raise ParseError("Expected function name before '('")
 
         l_paren = self.current_token()
         if l_paren and l_paren.kind == "lpar":
-            nodes.append({"Name": l_paren.kind, "Text": l_paren.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_paren, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '(' after function name")
@@ -778,56 +985,56 @@ class Parser:
             type_arg = self.parse_type()
             if not type_arg:
                 raise ParseError("Expected type argument for 'make'")
-            args.append({"type": "Type", "value": type_arg})
+            args.append(Wrapper("Type", type_arg))
             
             comma = self.current_token()
             if comma and comma.kind == "comma":
-                nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                 self.consume_token()
                 while self.current_token() and self.current_token().kind != "rpar":
-                    arg = self.parse_expression()
+                    arg = yield self._parse_expression()
                     args.append(arg)
                     comma = self.current_token()
                     if comma and comma.kind == "comma":
-                        nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                        nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                         self.consume_token()
         else:
             while self.current_token() and self.current_token().kind != "rpar":
-                arg = self.parse_expression()
+                arg = yield self._parse_expression()
                 args.append(arg)
                 
                 comma = self.current_token()
                 if comma and comma.kind == "comma":
-                    nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                     self.consume_token()
 
         r_paren = self.current_token()
         if r_paren and r_paren.kind == "rpar":
-            nodes.append({"Name": r_paren.kind, "Text": r_paren.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_paren, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected ')' after function arguments")
 
-        return {"type": "FunctionCall", "package": package_name, "name": function_name, "args": args, "nodes": nodes}
+        return FunctionCall(package_name, function_name, args, nodes)
     
 
-    def parse_if_statement(self) -> Optional[Dict[str, Any]]:
+    def _parse_if_statement(self) -> Rule:
         token = self.current_token()
         if not token or token.kind != "if":
             return None
 
         nodes = []
-        nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+        nodes.append(TokenLeaf(token, self.get_next_token_pos()))
         self.consume_token()
 
         # Условие if
-        condition = self.parse_expression()
-        nodes.append({"type": "Condition", "value": condition})
+        condition = yield self._parse_expression()
+        nodes.append(Wrapper("Condition", condition))
 
         # Открывающая фигурная скобка блока then
         l_brace = self.current_token()
         if l_brace and l_brace.kind == "lbrace":
-            nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '{' after if condition")
@@ -835,7 +1042,7 @@ class Parser:
         # Тело блока then
         then_body = []
         while self.current_token() and self.current_token().kind != "rbrace":
-            stmt = self.parse_statement()
+            stmt = yield self._parse_block_statement()
             if stmt:
                 then_body.append(stmt)
             else:
@@ -843,7 +1050,7 @@ class Parser:
 
         r_brace = self.current_token()
         if r_brace and r_brace.kind == "rbrace":
-            nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '}' after if block")
@@ -852,18 +1059,18 @@ class Parser:
         else_body = []
         else_token = self.current_token()
         if else_token and else_token.kind == "else":
-            nodes.append({"Name": else_token.kind, "Text": else_token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(else_token, self.get_next_token_pos()))
             self.consume_token()
 
             l_brace = self.current_token()
             if l_brace and l_brace.kind == "lbrace":
-                nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '{' after else")
 
             while self.current_token() and self.current_token().kind != "rbrace":
-                stmt = self.parse_statement()
+                stmt = yield self._parse_block_statement()
                 if stmt:
                     else_body.append(stmt)
                 else:
@@ -871,27 +1078,21 @@ class Parser:
 
             r_brace = self.current_token()
             if r_brace and r_brace.kind == "rbrace":
-                nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '}' after else block")
 
-        return {
-            "type": "IfStatement",
-            "condition": condition,
-            "then": then_body,
-            "else": else_body if else_body else None,
-            "nodes": nodes
-        }
+        return IfStatement(condition, then_body, else_body if else_body else None, nodes)
     
 
-    def parse_for_statement(self) -> Optional[Dict[str, Any]]:
+    def _parse_for_statement(self) -> Rule:
         token = self.current_token()
         if not token or token.kind != "for":
             return None
 
         nodes = []
-        nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+        nodes.append(TokenLeaf(token, self.get_next_token_pos()))
         self.consume_token()
 
         # Проверяем, является ли это циклом range
@@ -914,14 +1115,14 @@ class Parser:
                         var_pos = self.get_next_token_pos()
                         var_names.append(var_name)
                         var_positions.append(var_pos)
-                        nodes.append({"Name": var_name.kind, "Text": var_name.text, "Pos": var_pos})
+                        nodes.append(TokenLeaf(var_name, var_pos))
                         self.consume_token()
                     else:
                         break
 
                     comma = self.current_token()
                     if comma and comma.kind == "comma":
-                        nodes.append({"Name": comma.kind, "Text": comma.text, "Pos": self.get_next_token_pos()})
+                        nodes.append(TokenLeaf(comma, self.get_next_token_pos()))
                         self.consume_token()
                     else:
                         break
@@ -929,143 +1130,139 @@ class Parser:
                 assign_token = self.current_token()
                 if assign_token and assign_token.kind == "short_declaration":
                     assign_pos = self.get_next_token_pos()
-                    nodes.append({"Name": assign_token.kind, "Text": assign_token.text, "Pos": assign_pos})
+                    nodes.append(TokenLeaf(assign_token, assign_pos))
                     self.consume_token()
 
                     # Проверяем, является ли это range
                     range_token = self.current_token()
                     if range_token and range_token.kind == "range":
-                        nodes.append({"Name": range_token.kind, "Text": range_token.text, "Pos": self.get_next_token_pos()})
+                        nodes.append(TokenLeaf(range_token, self.get_next_token_pos()))
                         self.consume_token()
 
                         # Разбираем выражение после range
-                        range_expr = self.parse_expression()
-                        nodes.append({"type": "RangeExpression", "value": range_expr})
+                        range_expr = yield self._parse_expression()
+                        nodes.append(Wrapper("RangeExpression", range_expr))
 
                         scope = self.current_scope or "-Global-"
                         for var_name in var_names:
-                            self.symbol_table["scopes"].setdefault(scope, {"variables": {}, "constants": {}})
-                            self.symbol_table["scopes"][scope]["variables"][var_name.text] = {
+                            self._declare("scopes", scope, var_name.text, {
                                 "type": "auto",
                                 "pos": self.token_counter
-                            }
+                            })
 
-                        range_stmt = {
-                            "type": "RangeStatement",
-                            "variables": [
-                                {"type": "Identifier", "value": var_name.text, "Pos": var_pos}
+                        range_stmt = RangeStatement(
+                            [
+                                Identifier(var_name.text, var_pos)
                                 for var_name, var_pos in zip(var_names, var_positions)
                             ],
-                            "expression": range_expr
-                        }
+                            range_expr
+                        )
                     else:
                         # Обычная инициализация
-                        expr = self.parse_expression()
-                        nodes.append({"type": "Expression", "value": expr})
+                        expr = yield self._parse_expression()
+                        nodes.append(Wrapper("Expression", expr))
 
                         scope = self.current_scope or "-Global-"
                         for var_name in var_names:
-                            self.symbol_table["scopes"].setdefault(scope, {"variables": {}, "constants": {}})
-                            self.symbol_table["scopes"][scope]["variables"][var_name.text] = {
+                            self._declare("scopes", scope, var_name.text, {
                                 "type": "auto",
                                 "pos": self.token_counter,
                                 "value": expr
-                            }
+                            })
 
-                        init_stmt = {
-                            "type": "VariableDeclaration",
-                            "nodes": [
-                                {"Name": var_name.kind, "Text": var_name.text, "Pos": var_pos}
+                        init_stmt = VariableDeclaration(
+                            [
+                                TokenLeaf(var_name, var_pos)
                                 for var_name, var_pos in zip(var_names, var_positions)
                             ] + [
-                                {"Name": assign_token.kind, "Text": assign_token.text, "Pos": assign_pos},
-                                {"type": "Expression", "value": expr}
+                                TokenLeaf(assign_token, assign_pos),
+                                Wrapper("Expression", expr)
                             ]
-                        }
+                        )
 
                         # Ожидаем точку с запятой после инициализации
                         semicolon1 = self.current_token()
                         if semicolon1 and semicolon1.kind == "semicolon":
-                            nodes.append({"Name": semicolon1.kind, "Text": semicolon1.text, "Pos": self.get_next_token_pos()})
+                            nodes.append(TokenLeaf(semicolon1, self.get_next_token_pos()))
                             self.consume_token()
                         else:
                             raise ParseError(f"Expected ';' after for initialization, got {semicolon1.text if semicolon1 else 'None'} at pos {self.pos}")
 
                         # Условие (опционально)
                         if self.current_token() and self.current_token().kind != "semicolon":
-                            condition = self.parse_expression()
-                            nodes.append({"type": "Condition", "value": condition})
+                            condition = yield self._parse_expression()
+                            nodes.append(Wrapper("Condition", condition))
 
                         # Вторая точка с запятой после условия
                         semicolon2 = self.current_token()
                         if semicolon2 and semicolon2.kind == "semicolon":
-                            nodes.append({"Name": semicolon2.kind, "Text": semicolon2.text, "Pos": self.get_next_token_pos()})
+                            nodes.append(TokenLeaf(semicolon2, self.get_next_token_pos()))
                             self.consume_token()
                         else:
                             raise ParseError(f"Expected ';' after for condition, got {semicolon2.text if semicolon2 else 'None'} at pos {self.pos}")
 
                         # Пост-действие (опционально)
                         if self.current_token() and self.current_token().kind != "lbrace":
-                            post_stmt = self.parse_expression()
-                            nodes.append({"type": "Post", "value": post_stmt})
+                            post_stmt = yield self._parse_expression()
+                            nodes.append(Wrapper("Post", post_stmt))
                 else:
                     # Обычная инициализация через выражение
-                    init_stmt = self.parse_expression()
-                    nodes.append({"type": "Init", "value": init_stmt})
+                    init_stmt = yield self._parse_expression()
+                    nodes.append(Wrapper("Init", init_stmt))
 
                     # Ожидаем точку с запятой после выражения
                     semicolon1 = self.current_token()
                     if semicolon1 and semicolon1.kind == "semicolon":
-                        nodes.append({"Name": semicolon1.kind, "Text": semicolon1.text, "Pos": self.get_next_token_pos()})
+                        nodes.append(TokenLeaf(semicolon1, self.get_next_token_pos()))
                         self.consume_token()
                     else:
                         raise ParseError(f"Expected ';' after for initialization, got {semicolon1.text if semicolon1 else 'None'} at pos {self.pos}")
 
                     # Условие (опционально)
                     if self.current_token() and self.current_token().kind != "semicolon":
-                        condition = self.parse_expression()
-                        nodes.append({"type": "Condition", "value": condition})
+                        condition = yield self._parse_expression()
+                        nodes.append(Wrapper("Condition", condition))
 
                     # Вторая точка с запятой после условия
                     semicolon2 = self.current_token()
                     if semicolon2 and semicolon2.kind == "semicolon":
-                        nodes.append({"Name": semicolon2.kind, "Text": semicolon2.text, "Pos": self.get_next_token_pos()})
+                        nodes.append(TokenLeaf(semicolon2, self.get_next_token_pos()))
                         self.consume_token()
                     else:
                         raise ParseError(f"Expected ';' after for condition, got {semicolon2.text if semicolon2 else 'None'} at pos {self.pos}")
 
                     # Пост-действие (опционально)
                     if self.current_token() and self.current_token().kind != "lbrace":
-                        post_stmt = self.parse_expression()
-                        nodes.append({"type": "Post", "value": post_stmt})
+                        post_stmt = yield self._parse_expression()
+                        nodes.append(Wrapper("Post", post_stmt))
 
             elif next_tok and next_tok.kind == "semicolon":
                 # Пустая инициализация
-                nodes.append({"Name": next_tok.kind, "Text": next_tok.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(next_tok, self.get_next_token_pos()))
                 self.consume_token()
 
                 # Условие (опционально)
                 if self.current_token() and self.current_token().kind != "semicolon":
-                    condition = self.parse_expression()
-                    nodes.append({"type": "Condition", "value": condition})
+                    condition = yield self._parse_expression()
+                    nodes.append(Wrapper("Condition", condition))
 
                 # Вторая точка с запятой после условия
                 semicolon2 = self.current_token()
                 if semicolon2 and semicolon2.kind == "semicolon":
-                    nodes.append({"Name": semicolon2.kind, "Text": semicolon2.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(semicolon2, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError(f"Expected ';' after for condition, got {semicolon2.text if semicolon2 else 'None'} at pos {self.pos}")
 
                 # Пост-действие (опционально)
                 if self.current_token() and self.current_token().kind != "lbrace":
-                    post_stmt = self.parse_expression()
-                    nodes.append({"type": "Post", "value": post_stmt})
+                    post_stmt = yield self._parse_expression()
+                    nodes.append(Wrapper("Post", post_stmt))
 
             # Открывающая фигурная скобка тела цикла
             l_brace = self.current_token()
             if l_brace and l_brace.kind == "lbrace":
-                nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '{' after for clause")
@@ -1073,7 +1270,7 @@ class Parser:
             # Тело цикла
             body = []
             while self.current_token() and self.current_token().kind != "rbrace":
-                stmt = self.parse_statement()
+                stmt = yield self._parse_block_statement()
                 if stmt:
                     body.append(stmt)
                 else:
@@ -1081,26 +1278,18 @@ class Parser:
 
             r_brace = self.current_token()
             if r_brace and r_brace.kind == "rbrace":
-                nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '}' after for body")
 
-            return {
-                "type": "ForStatement",
-                "init": init_stmt,
-                "condition": condition,
-                "post": post_stmt,
-                "range": range_stmt,
-                "body": body,
-                "nodes": nodes
-            }
+            return ForStatement(init_stmt, condition, post_stmt, range_stmt, body, nodes)
 
 
-    def parse_expression_list(self) -> List[Dict[str, Any]]:
+    def _parse_expression_list(self) -> Rule:
         expressions = []
         while self.current_token() and self.current_token().kind not in {"semicolon", "rbrace", "EOF"}:
-            expr = self.parse_expression()
+            expr = yield self._parse_expression()
             expressions.append(expr)
             
             comma = self.current_token()
@@ -1111,26 +1300,26 @@ class Parser:
         return expressions
 
 
-    def parse_switch_statement(self) -> Optional[Dict[str, Any]]:
+    def _parse_switch_statement(self) -> Rule:
         token = self.current_token()
         if not token or token.kind != "switch":
             return None
 
         nodes = []
-        nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+        nodes.append(TokenLeaf(token, self.get_next_token_pos()))
         self.consume_token()
 
         # Проверяем, есть ли выражение switch (опционально)
         expr = None
         next_token = self.current_token()
         if next_token and next_token.kind not in {"lbrace", "semicolon", "EOF"}:
-            expr = self.parse_expression()
-            nodes.append({"type": "Expression", "value": expr})
+            expr = yield self._parse_expression()
+            nodes.append(Wrapper("Expression", expr))
 
         # Открывающая фигурная скобка
         l_brace = self.current_token()
         if l_brace and l_brace.kind == "lbrace":
-            nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '{' after switch")
@@ -1141,19 +1330,19 @@ class Parser:
         while self.current_token() and self.current_token().kind != "rbrace":
             case_token = self.current_token()
             if case_token and case_token.kind == "case":
-                nodes.append({"Name": case_token.kind, "Text": case_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(case_token, self.get_next_token_pos()))
                 self.consume_token()
 
                 # Разбор условия case
-                conditions = self.parse_expression_list()
+                conditions = yield self._parse_expression_list()
                 if not conditions:
                     raise ParseError("Expected condition after 'case'")
-                nodes.append({"type": "CaseConditions", "value": conditions})
+                nodes.append(Wrapper("CaseConditions", conditions))
 
                 # Проверяем двоеточие
                 colon = self.current_token()
                 if colon and colon.kind == "colon":
-                    nodes.append({"Name": colon.kind, "Text": colon.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(colon, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected ':' after case condition")
@@ -1161,28 +1350,24 @@ class Parser:
                 # Разбор тела case
                 body = []
                 while self.current_token() and self.current_token().kind not in {"case", "default", "rbrace"}:
-                    stmt = self.parse_statement()
+                    stmt = yield self._parse_block_statement()
                     if stmt:
                         body.append(stmt)
                     else:
                         raise ParseError("Expected statement in case block")
 
-                cases.append({
-                    "type": "CaseClause",
-                    "conditions": conditions,
-                    "body": body
-                })
+                cases.append(CaseClause(conditions, body))
 
             elif case_token and case_token.kind == "default":
                 if default_case is not None:
                     raise ParseError("Multiple 'default' clauses are not allowed")
-                nodes.append({"Name": case_token.kind, "Text": case_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(case_token, self.get_next_token_pos()))
                 self.consume_token()
 
                 # Проверяем двоеточие
                 colon = self.current_token()
                 if colon and colon.kind == "colon":
-                    nodes.append({"Name": colon.kind, "Text": colon.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(colon, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected ':' after default")
@@ -1190,16 +1375,13 @@ class Parser:
                 # Разбор тела default
                 body = []
                 while self.current_token() and self.current_token().kind not in {"case", "default", "rbrace"}:
-                    stmt = self.parse_statement()
+                    stmt = yield self._parse_block_statement()
                     if stmt:
                         body.append(stmt)
                     else:
                         raise ParseError("Expected statement in default block")
 
-                default_case = {
-                    "type": "DefaultClause",
-                    "body": body
-                }
+                default_case = DefaultClause(body)
 
             else:
                 raise ParseError(f"Expected 'case' or 'default', got {case_token.text}")
@@ -1207,87 +1389,87 @@ class Parser:
         # Закрывающая фигурная скобка
         r_brace = self.current_token()
         if r_brace and r_brace.kind == "rbrace":
-            nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
             self.consume_token()
         else:
             raise ParseError("Expected '}' after switch cases")
 
-        return {
-            "type": "SwitchStatement",
-            "expression": expr,
-            "cases": cases,
-            "default": default_case,
-            "nodes": nodes
-        }
+        return SwitchStatement(expr, cases, default_case, nodes)
+
 
+    def parse_statement(self) -> Optional[Node]:
+        return self._run(self._parse_statement())
 
-    def parse_statement(self) -> Optional[Dict[str, Any]]:
+    def _parse_statement(self) -> Rule:
         token = self.current_token()
         if not token:
             return None
-            
-        print(f"Parsing statement at pos {self.pos}: {token.text} ({token.kind})")
-        if token.kind == "for":
-            return self.parse_for_statement()
-        if token.kind == "if":
-            return self.parse_if_statement()
-        if token.kind == "switch":
-            return self.parse_switch_statement()
-        if token.kind == "continue":
-            nodes = [{"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()}]
-            self.consume_token()
-            return {"type": "ContinueStatement", "nodes": nodes}
-        if token.kind == "break":
-            nodes = [{"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()}]
+
+        rule = self._STATEMENT_RULES.get(token.kind_id)
+        if rule is None and token.kind_id == _IDENT:
+            following = self.next_token()
+            if following and following.kind_id in _DECLARATION_FOLLOWERS:
+                rule = Parser._parse_variable_declaration
+        if rule is not None:
+            node = rule(self)
+            if isinstance(node, GeneratorType):
+                node = yield node
+            return node
+        expr = yield self._parse_expression()
+        semicolon = self.current_token()
+        if semicolon and semicolon.kind == "semicolon":
             self.consume_token()
-            semicolon = self.current_token()
-            if semicolon and semicolon.kind == "semicolon":
-                self.consume_token()
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
-            return {"type": "BreakStatement", "nodes": nodes}
-        if token.kind == "return":
-            nodes = [{"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()}]
+            expr.semicolon = Punctuation(semicolon.text, self.get_next_token_pos())
+        return expr
+
+    def _parse_continue_statement(self) -> Node:
+        nodes = [TokenLeaf(self.current_token(), self.get_next_token_pos())]
+        self.consume_token()
+        return ContinueStatement(nodes)
+
+    def _parse_break_statement(self) -> Node:
+        nodes = [TokenLeaf(self.current_token(), self.get_next_token_pos())]
+        self.consume_token()
+        semicolon = self.current_token()
+        if semicolon and semicolon.kind == "semicolon":
             self.consume_token()
-            expressions = []
-            next_token = self.current_token()
-            if next_token and next_token.kind not in {"semicolon", "rbrace", "EOF"}:
-                expressions = self.parse_expression_list()
-                for expr in expressions:
-                    nodes.append({"type": "Expression", "value": expr})
-            semicolon = self.current_token()
-            if semicolon and semicolon.kind == "semicolon":
-                self.consume_token()
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
-            return {"type": "ReturnStatement", "expressions": expressions, "nodes": nodes}
-        if token.kind == "var" or (token.kind == "ident" and self.next_token() and self.next_token().kind in {"short_declaration", "comma"}):
-            return self.parse_variable_declaration(consume_semicolon=True)
-        expr = self.parse_expression()
+            nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
+        return BreakStatement(nodes)
+
+    def _parse_return_statement(self) -> Rule:
+        nodes = [TokenLeaf(self.current_token(), self.get_next_token_pos())]
+        self.consume_token()
+        expressions = []
+        next_token = self.current_token()
+        if next_token and next_token.kind not in {"semicolon", "rbrace", "EOF"}:
+            expressions = yield self._parse_expression_list()
+            for expr in expressions:
+                nodes.append(Wrapper("Expression", expr))
         semicolon = self.current_token()
         if semicolon and semicolon.kind == "semicolon":
             self.consume_token()
-            expr["semicolon"] = {"type": "Punctuation", "value": semicolon.text, "Pos": self.get_next_token_pos()}
-        return expr
+            nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
+        return ReturnStatement(expressions, nodes)
 
-    def parse_function(self) -> Optional[Dict[str, Any]]:
+    def parse_function(self) -> Optional[Node]:
         nodes = []
         token = self.current_token()
         
         if token and token.kind == "func":
-            print(f"Parsing function at pos {self.pos}: {token.text}")
-            nodes.append({"Name": token.kind, "Text": token.text, "Pos": self.get_next_token_pos()})
+            nodes.append(TokenLeaf(token, self.get_next_token_pos()))
             self.consume_token()
 
             receiver = None
             # Проверяем, есть ли получатель (например, (s Store))
             next_token = self.current_token()
             if next_token and next_token.kind == "lpar":
-                nodes.append({"Name": next_token.kind, "Text": next_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(next_token, self.get_next_token_pos()))
                 self.consume_token()
 
                 receiver_name = self.current_token()
                 if receiver_name and receiver_name.kind == "ident":
                     receiver_name_text = receiver_name.text
-                    nodes.append({"Name": receiver_name.kind, "Text": receiver_name.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(receiver_name, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected receiver name after '('")
@@ -1296,23 +1478,20 @@ class Parser:
                 if not receiver_type:
                     raise ParseError("Expected receiver type")
 
-                nodes.append({"Name": "Type", "Text": receiver_type, "Pos": self.get_next_token_pos()})
+                nodes.append(Leaf("Type", receiver_type, self.get_next_token_pos()))
 
                 r_paren = self.current_token()
                 if r_paren and r_paren.kind == "rpar":
-                    nodes.append({"Name": r_paren.kind, "Text": r_paren.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(r_paren, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected ')' after receiver")
 
-                receiver = {
-                    "name": receiver_name_text,
-                    "type": receiver_type
-                }
+                receiver = Receiver(receiver_name_text, receiver_type)
 
             func_name = self.current_token()
             if func_name and func_name.kind == "ident":
-                nodes.append({"Name": func_name.kind, "Text": func_name.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(func_name, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected function name after 'func' or receiver")
@@ -1321,7 +1500,7 @@ class Parser:
 
             l_paren = self.current_token()
             if l_paren and l_paren.kind == "lpar":
-                nodes.append({"Name": l_paren.kind, "Text": l_paren.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(l_paren, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '(' after function name")
@@ -1345,15 +1524,11 @@ class Parser:
                     raise ParseError("Expected parameter type")
 
                 for param_name in param_names:
-                    self.symbol_table["scopes"].setdefault(func_name.text, {"variables": {}, "constants": {}})
-                    self.symbol_table["scopes"][func_name.text]["variables"][param_name.text] = {
+                    self._declare("scopes", func_name.text, param_name.text, {
                         "type": param_type,
                         "pos": self.token_counter
-                    }
-                    params.append({
-                        "param_name": {"Name": param_name.kind, "Text": param_name.text, "Pos": self.get_next_token_pos()},
-                        "param_type": param_type
                     })
+                    params.append(Param(TokenLeaf(param_name, self.get_next_token_pos()), param_type))
 
                 comma = self.current_token()
                 if comma and comma.kind == "comma":
@@ -1361,7 +1536,7 @@ class Parser:
 
             r_paren = self.current_token()
             if r_paren and r_paren.kind == "rpar":
-                nodes.append({"Name": r_paren.kind, "Text": r_paren.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(r_paren, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected ')' after parameters")
@@ -1369,7 +1544,7 @@ class Parser:
             return_types = []
             return_token = self.current_token()
             if return_token and return_token.kind == "lpar":
-                nodes.append({"Name": return_token.kind, "Text": return_token.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(return_token, self.get_next_token_pos()))
                 self.consume_token()
                 
                 while self.current_token() and self.current_token().kind != "rpar":
@@ -1385,94 +1560,302 @@ class Parser:
                 
                 r_paren_return = self.current_token()
                 if r_paren_return and r_paren_return.kind == "rpar":
-                    nodes.append({"Name": r_paren_return.kind, "Text": r_paren_return.text, "Pos": self.get_next_token_pos()})
+                    nodes.append(TokenLeaf(r_paren_return, self.get_next_token_pos()))
                     self.consume_token()
                 else:
                     raise ParseError("Expected ')' after return types")
-            elif return_token and (return_token.kind in self._get_keywords() or return_token.kind == "ident"):
+            elif return_token and _is_type_name(return_token):
                 return_type = self.parse_type()
                 if return_type:
                     return_types.append(return_type)
 
             l_brace = self.current_token()
             if l_brace and l_brace.kind == "lbrace":
-                nodes.append({"Name": l_brace.kind, "Text": l_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(l_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '{' after function declaration")
 
             body = []
-            while self.current_token() and self.current_token().kind != "rbrace":
-                stmt = self.parse_statement()
-                if stmt:
-                    body.append(stmt)
+            body_span = None
+            body_pos = self.token_counter
+            if self.lazy_bodies:
+                # Перескакиваем тело целиком: от токена после '{' до парной '}'
+                body_span = (self.pos, self._closing_brace(self.pos - 1))
+                self.pos = body_span[1]
+            else:
+                while self.current_token() and self.current_token().kind != "rbrace":
+                    stmt = self._run(self._parse_block_statement())
+                    if stmt:
+                        body.append(stmt)
 
             r_brace = self.current_token()
             if r_brace and r_brace.kind == "rbrace":
-                nodes.append({"Name": r_brace.kind, "Text": r_brace.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(r_brace, self.get_next_token_pos()))
                 self.consume_token()
             else:
                 raise ParseError("Expected '}' after function body")
 
             semicolon = self.current_token()
             if semicolon and semicolon.kind == "semicolon":
-                nodes.append({"Name": semicolon.kind, "Text": semicolon.text, "Pos": self.get_next_token_pos()})
+                nodes.append(TokenLeaf(semicolon, self.get_next_token_pos()))
                 self.consume_token()
 
             self.current_scope = "-Global-"
-            print(f"Finished parsing function at pos {self.pos}")
-
-            return {
-                "type": "FunctionDeclaration",
-                "name": func_name.text,
-                "receiver": receiver,
-                "params": params,
-                "return_types": return_types,
-                "body": body,
-                "nodes": nodes
-            }
+
+            declaration = FunctionDeclaration(func_name.text, receiver, params, return_types, body, nodes)
+            if body_span is not None:
+                declaration.body = None
+                declaration.parser = self
+                declaration.body_span = body_span
+                declaration.body_pos = body_pos
+            return declaration
         return None
 
-    def _get_keywords(self) -> List[str]:
-        return [
-            "bool", "string", "int", "int8", "int16", "int32", "int64",
-            "uint", "uint8", "uint16", "uint32", "uint64", "float32", "float64"
-        ]
-    
-    def parse(self) -> Dict[str, Any]:
-        children = []
-        
+    def _matching(self, index: int) -> int:
+        # Индекс парной скобки: из индекса скобок лексера (TokenBuffer) или подсчётом глубины; -1 - пары нет
+        token = self.tokens[index]
+        if hasattr(token, "match"):
+            return token.match
+        opening = token.kind
+        closing = _BRACKET_PAIRS[opening]
+        depth = 0
+        for i in range(index, len(self.tokens)):
+            kind = self.tokens[i].kind
+            if kind == opening:
+                depth += 1
+            elif kind == closing:
+                depth -= 1
+                if depth == 0:
+                    return i
+        return -1
+
+    def _closing_brace(self, index: int) -> int:
+        closing = self._matching(index)
+        if closing < 0:
+            raise ParseError("Expected '}' after function body")
+        return closing
+
+    def parse_body(self, declaration: FunctionDeclaration) -> List[Node]:
+        """Разбирает отложенное тело функции и записывает его в declaration.body."""
+        if declaration.body_parsed:
+            return declaration.body
+        start, end = declaration.body_span
+        saved = self.pos, self.token_counter, self.current_scope
+        # Нумерация Pos продолжается с '{', область видимости - сама функция
+        self.pos = start
+        self.token_counter = declaration.body_pos
+        self.current_scope = declaration.name
+        try:
+            body = []
+            while self.current_token() and self.current_token().kind != "rbrace":
+                stmt = self._run(self._parse_block_statement())
+                if stmt:
+                    body.append(stmt)
+            if self.pos != end:
+                raise ParseError("Expected '}' after function body")
+        finally:
+            self.pos, self.token_counter, self.current_scope = saved
+
+        declaration.body = body
+        return body
+
+    def parse_bodies(self, program: Program) -> Program:
+        """Разбирает все отложенные тела функций программы."""
+        for child in program.children:
+            if isinstance(child, FunctionDeclaration) and not child.body_parsed:
+                self.parse_body(child)
+        return program
+
+    def parse(self) -> Program:
+        return self._parse_program({}, [], 0)
+
+    def iter_declarations(self) -> Iterator[Node]:
+        """Объявления верхнего уровня по одному, сразу после разбора каждого.
+
+        Дерево Program не собирается и записи для reparse не сохраняются, так
+        что память не растёт с числом объявлений; таблица символов, импорты и
+        диагностики заполняются так же, как при parse().
+        """
+        return self._iter_declarations({}, [], 0, record_spans=False)
+
+    def reparse(self, program: Program, diff) -> Program:
+        """Разбирает поток токенов заново после Lexer.apply_edit (diff - его TokenDiff).
+
+        Объявления верхнего уровня целиком до правки или после неё переносятся
+        из program без разбора; внутри правленого участка объявление переносится,
+        если совпал хеш его токенов. Заново разбираются только затронутые
+        объявления. Перенесённые поддеревья не обходятся и не меняются: сдвиг их
+        номеров Pos и индексов токенов - одна пара чисел на объявление в
+        program.shifts, которая применяется при выводе. Таблица символов и
+        импорты собираются из записей объявлений. Объявление переразбирается и тогда, когда изменился набор
+        известных к нему типов или в нём была ошибка. Токены, на которые разбор
+        заглядывал за конец объявления (_LOOKAHEAD), считаются его частью.
+        """
+        if self.lazy_bodies:
+            raise ValueError("reparse does not support lazy_bodies")
+        if not isinstance(self.tokens, Sequence):
+            raise ValueError("reparse requires a token sequence, not a stream")
+        records = self.declarations
+        if len(records) != len(program.children) or any(
+                record.node is not child for record, child in zip(records, program.children)):
+            raise ValueError("program was not produced by the last parse of this parser")
+
+        first = diff.start
+        old_end = first + len(diff.removed)
+        new_end = first + len(diff.inserted)
+        index_delta = new_end - old_end
+        # Старые объявления по началу в новом потоке токенов; задетые правкой - отдельно
+        reuse_at = {}
+        touched = []
+        for record in records:
+            if record.end + _LOOKAHEAD <= first:
+                reuse_at[record.start] = record
+            elif record.start >= old_end:
+                reuse_at[record.start + index_delta] = record
+            else:
+                touched.append(record)
+
+        self.pos = 0
+        self.token_counter = 0
+        self.symbol_table = self._new_symbol_table()
+        self.symbols = []
+        self.imports = []
+        self.diagnostics = []
+        self.current_scope = "-Global-"
+        return self._parse_program(reuse_at, touched, new_end)
+
+    def _parse_program(self, reuse_at: Dict[int, DeclarationRecord], touched: List[DeclarationRecord],
+                       edit_end: int) -> Program:
+        record_spans = isinstance(self.tokens, Sequence)
+        children = list(self._iter_declarations(reuse_at, touched, edit_end, record_spans))
+        shifts = {n: record.shift for n, record in enumerate(self.declarations) if record.shift != (0, 0)}
+        return Program(children, shifts)
+
+    def _iter_declarations(self, reuse_at: Dict[int, DeclarationRecord], touched: List[DeclarationRecord],
+                           edit_end: int, record_spans: bool) -> Iterator[Node]:
+        self.declarations = []
+
         while self.current_token():
             token = self.current_token()
-            print(f"Parsing token at pos {self.pos}: {token.text} ({token.kind})")
-            if token.kind == "package":
-                children.append(self.parse_package())
-            elif token.kind == "import":
-                children.append(self.parse_import())
-            elif token.kind == "type":
-                type_decl = self.parse_type_declaration()
-                if type_decl:
-                    children.append(type_decl)
-            elif token.kind == "func":
-                func_decl = self.parse_function()
-                if func_decl:
-                    children.append(func_decl)
-            elif token.kind == "ident":
-                var_decl = self.parse_variable_declaration()
-                if var_decl:
-                    children.append(var_decl)
-                else:
-                    self.consume_token()
-            elif token.kind == "EOF":
+            if token.kind_id == _EOF:
                 break
-            else:
-                self.consume_token()
+            start = self.pos
+            record = reuse_at.get(start)
+            if record is None and start < edit_end:
+                record = self._unchanged_declaration(start, touched)
+            if record is not None and not record.diagnostics and record.types == frozenset(self.symbol_table["types"]):
+                yield self._reuse_declaration(record, start)
+                continue
+
+            pos_start = self.token_counter
+            types = frozenset(self.symbol_table["types"]) if record_spans else frozenset()
+            marks = len(self.symbols), len(self.imports), len(self.diagnostics)
+            node = self._parse_declaration()
+            if node is None:
+                continue
+            if record_spans:
+                self.declarations.append(DeclarationRecord(
+                    node, start, self.pos, self._span_key(start, self.pos + _LOOKAHEAD), pos_start, self.token_counter, types,
+                    self.symbols[marks[0]:], self.imports[marks[1]:], self.diagnostics[marks[2]:]
+                ))
+            yield node
+
+    def _parse_declaration(self) -> Optional[Node]:
+        # Одно объявление верхнего уровня; None - токен пропущен без узла
+        rule = self._DECLARATION_RULES.get(self.current_token().kind_id)
+        start = self._mark()
+        try:
+            if rule is not None:
+                return rule(self)
+            self.consume_token()
+            return None
+        except ParseError as error:
+            if not self.recover:
+                raise
+            self.current_scope = "-Global-"
+            return self._recover(start, error, in_block=False)
+
+    def _parse_top_level_variable(self) -> Optional[Node]:
+        var_decl = self.parse_variable_declaration()
+        if not var_decl:
+            self.consume_token()
+        return var_decl
+
+    def _span_key(self, start: int, end: int) -> int:
+        return hash(tuple((token.kind, token.text) for token in self.tokens[start:end]))
+
+    def _unchanged_declaration(self, start: int, touched: List[DeclarationRecord]) -> Optional[DeclarationRecord]:
+        # Задетое правкой объявление, токены которого (с заглядыванием) совпали с токенами от start.
+        # Запись выдаётся один раз: одинаковые объявления не должны делить один узел
+        for index, record in enumerate(touched):
+            end = start + record.end - record.start + _LOOKAHEAD
+            if end <= len(self.tokens) and self._span_key(start, end) == record.key:
+                del touched[index]
+                return record
+        return None
 
-        return {"type": "Program", "children": children}
+    def _reuse_declaration(self, record: DeclarationRecord, start: int) -> Node:
+        # Узел переносится как есть: сдвиг копится в записи и применяется при выводе (Program.shifts)
+        pos_delta = self.token_counter - record.pos_start
+        pos_shift = record.shift[0] + pos_delta
+        index_shift = record.shift[1] + start - record.start
+        for table, owner, name, value in record.symbols:
+            value = shifted(value, pos_shift, index_shift)
+            if pos_shift and isinstance(value, dict) and "pos" in value:
+                value["pos"] += pos_shift
+            self._declare(table, owner, name, value)
+        for entry in record.imports:
+            if pos_shift:
+                package = entry["Package"]
+                entry = {"Package": {**package, "Pos": package["Pos"] + pos_shift}}
+            self.imports.append(entry)
+
+        self.pos = start + record.end - record.start
+        self.token_counter = record.pos_end + pos_delta
+        self.declarations.append(record._replace(
+            start=start, end=self.pos, pos_start=record.pos_start + pos_delta, pos_end=self.token_counter,
+            shift=(pos_shift, index_shift)
+        ))
+        return record.node
 
     def get_symbol_table(self) -> Dict[str, Any]:
-        return self.symbol_table
+        # Значения переменных - узлы дерева: в таблицу для вывода они попадают словарями
+        return to_plain(self.symbol_table)
 
     def get_imports(self) -> List[Dict[str, Any]]:
         return self.imports
+
+    def get_diagnostics(self) -> List[Dict[str, Any]]:
+        return [diagnostic._asdict() for diagnostic in self.diagnostics]
+
+    # Таблицы разбора: вид токена (целое из KIND_IDS) -> правило для конструкции,
+    # которая с него начинается. Правило - генератор или функция, сразу
+    # возвращающая узел.
+    _DECLARATION_RULES = {
+        KIND_IDS["package"]: parse_package,
+        KIND_IDS["import"]: parse_import,
+        KIND_IDS["type"]: parse_type_declaration,
+        KIND_IDS["func"]: parse_function,
+        _IDENT: _parse_top_level_variable,
+    }
+    _STATEMENT_RULES = {
+        KIND_IDS["for"]: _parse_for_statement,
+        KIND_IDS["if"]: _parse_if_statement,
+        KIND_IDS["switch"]: _parse_switch_statement,
+        KIND_IDS["continue"]: _parse_continue_statement,
+        KIND_IDS["break"]: _parse_break_statement,
+        KIND_IDS["return"]: _parse_return_statement,
+        KIND_IDS["var"]: _parse_variable_declaration,
+    }
+    _OPERAND_RULES = {
+        _IDENT: _parse_operand_name,
+        KIND_IDS["lbracket"]: _parse_array,
+        KIND_IDS["integer"]: _parse_number_literal,
+        KIND_IDS["float"]: _parse_number_literal,
+        KIND_IDS["string"]: _parse_string_literal,
+        KIND_IDS["raw_string"]: _parse_string_literal,
+        KIND_IDS["lpar"]: _parse_parenthesized,
+        **dict.fromkeys(map(KIND_IDS.__getitem__, _PREFIX_KINDS), _parse_prefix_operation),
+    }
     
\ No newline at end of file
@@ -0,0 +1,496 @@
+"""Генератор модуля dfaScanner.py: таблица токенов lexer.py, скомпилированная в ДКА.
+
+Запуск:
+    python scannerGen.py            - пересобрать dfaScanner.py
+    python scannerGen.py --check    - проверить, что модуль соответствует таблице,
+                                      и сравнить оба движка лексера на go/*.go
+    python scannerGen.py --check a.go b.go
+
+Правила сканера переводятся в НКА (построение Томпсона), затем в ДКА подмножествами.
+Символы разбиваются на классы эквивалентности: для ASCII класс берётся из таблицы,
+для остальных символов - по признакам \\w, \\d и \\s, которые только и различают
+шаблоны таблицы. Приоритет re сохраняется так: альтернативы проверяются в порядке
+таблицы, ветви верхнего уровня - слева направо, внутри ветви выбирается самое
+длинное совпадение (или самое короткое для ленивых повторений). Правила, где порядок
+перебора re не сводится к длине совпадения, генератор не поддерживает.
+"""
+import glob
+import os
+import sys
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import lexer
+
+OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dfaScanner.py")
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "go", "*.go")
+
+# Признаки символа вне ASCII: (\w, \d, \s)
+UNICODE_FEATURES = [(w, d, s) for w in (False, True) for d in (False, True) for s in (False, True)]
+
+
+class CharSet(NamedTuple):
+    """Множество символов одного атома шаблона."""
+    negated: bool
+    chars: FrozenSet[str]
+    ranges: Tuple[Tuple[str, str], ...] = ()
+    escapes: FrozenSet[str] = frozenset() # Подмножество {'w', 'd', 's'}
+
+    def contains(self, ch: str) -> bool:
+        found = (ch in self.chars
+                 or any(lo <= ch <= hi for lo, hi in self.ranges)
+                 or ('w' in self.escapes and (ch.isalnum() or ch == '_'))
+                 or ('d' in self.escapes and ch.isdecimal())
+                 or ('s' in self.escapes and ch.isspace()))
+        return found != self.negated
+
+    def contains_features(self, word: bool, digit: bool, space: bool) -> bool:
+        """Принадлежность символа вне ASCII, известного только по признакам."""
+        found = (('w' in self.escapes and word)
+                 or ('d' in self.escapes and digit)
+                 or ('s' in self.escapes and space))
+        return found != self.negated
+
+
+DOT = CharSet(True, frozenset('\n'))
+
+
+class RegexParser:
+    """Разбор подмножества синтаксиса re, которым записана таблица токенов.
+
+    Узлы: ('set', CharSet), ('cat', [узлы]), ('alt', [узлы]), ('star', узел, ленивое),
+    ('plus', узел, ленивое), ('opt', узел, ленивое).
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.pos = 0
+
+    def error(self, message: str):
+        raise ValueError(f"Шаблон {self.pattern!r}, позиция {self.pos}: {message}")
+
+    def peek(self) -> Optional[str]:
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.pos != len(self.pattern):
+            self.error("лишняя ')'")
+        return node
+
+    def parse_alt(self):
+        branches = [self.parse_cat()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.parse_cat())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def parse_cat(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.parse_repeat())
+        return ('cat', items)
+
+    def parse_repeat(self):
+        node = self.parse_atom()
+        ch = self.peek()
+        if ch in ('*', '+', '?'):
+            self.pos += 1
+            lazy = self.peek() == '?'
+            if lazy:
+                self.pos += 1
+            node = ({'*': 'star', '+': 'plus', '?': 'opt'}[ch], node, lazy)
+        return node
+
+    def parse_atom(self):
+        ch = self.peek()
+        self.pos += 1
+        if ch == '(':
+            if self.pattern.startswith('?:', self.pos):
+                self.pos += 2
+            elif self.peek() == '?':
+                self.error("расширения групп не поддерживаются")
+            node = self.parse_alt()
+            if self.peek() != ')':
+                self.error("ожидалась ')'")
+            self.pos += 1
+            return node
+        if ch == '[':
+            return ('set', self.parse_class())
+        if ch == '.':
+            return ('set', DOT)
+        if ch == '\\':
+            return ('set', self.parse_escape())
+        if ch in ('^', '$', '{', '*', '+', '?'):
+            self.error(f"'{ch}' не поддерживается")
+        return ('set', CharSet(False, frozenset(ch)))
+
+    def parse_escape(self) -> CharSet:
+        ch = self.peek()
+        if ch is None:
+            self.error("обрыв после '\\'")
+        self.pos += 1
+        if ch in 'wds':
+            return CharSet(False, frozenset(), escapes=frozenset(ch))
+        if ch.isalnum():
+            self.error(f"экранирование '\\{ch}' не поддерживается")
+        return CharSet(False, frozenset(ch))
+
+    def parse_class(self) -> CharSet:
+        negated = self.peek() == '^'
+        if negated:
+            self.pos += 1
+        chars, ranges, escapes = set(), [], set()
+        first = True
+        while True:
+            ch = self.peek()
+            if ch is None:
+                self.error("незакрытый класс символов")
+            if ch == ']' and not first:
+                self.pos += 1
+                break
+            first = False
+            if ch == '\\':
+                self.pos += 1
+                item = self.parse_escape()
+                chars |= item.chars
+                escapes |= item.escapes
+                continue
+            self.pos += 1
+            if self.peek() == '-' and self.pattern[self.pos + 1:self.pos + 2] not in ('', ']'):
+                high = self.pattern[self.pos + 1]
+                self.pos += 2
+                ranges.append((ch, high))
+            else:
+                chars.add(ch)
+        return CharSet(negated, frozenset(chars), tuple(ranges), frozenset(escapes))
+
+
+class Rule(NamedTuple):
+    """Ветвь верхнего уровня одного типа токена."""
+    alternative: int # Номер типа токена среди правил сканера
+    branch: int
+    node: tuple
+    lazy: bool
+
+
+class Automaton(NamedTuple):
+    """ДКА; допускающие состояния хранят номера правил, номер правила - его приоритет."""
+    names: List[str] # Имя типа токена по номеру правила
+    boundary: List[bool] # Требует ли правило границы слова после совпадения
+    lazy: List[bool]
+    ascii_classes: List[int]
+    unicode_classes: Dict[Tuple[bool, bool, bool], int]
+    class_count: int
+    transitions: List[int]
+    accepts: List[Tuple[int, ...]]
+
+
+def scanner_rules() -> Tuple[List[str], List[bool], List[Rule]]:
+    """Правила сканера в том же порядке и с теми же условиями, что и в lexer.build_scanner."""
+    names, boundary, rules = [], [], []
+    for token_type in lexer.get_token_types_list():
+        if token_type.class_ == "keyword":
+            continue
+        alternative = len(names)
+        names.append(token_type.name)
+        boundary.append(token_type.class_ == "constant")
+        root = RegexParser(token_type.regex).parse()
+        branches = root[1] if root[0] == 'alt' else [root]
+        for number, node in enumerate(branches):
+            rules.append(Rule(alternative, number, node, is_lazy(node)))
+    return names, boundary, rules
+
+
+def is_lazy(node: tuple) -> bool:
+    kind = node[0]
+    if kind in ('star', 'plus', 'opt'):
+        return node[2] or is_lazy(node[1])
+    if kind in ('cat', 'alt'):
+        return any(is_lazy(child) for child in node[1])
+    return False
+
+
+def collect_sets(node: tuple, result: List[CharSet]):
+    kind = node[0]
+    if kind == 'set':
+        if node[1] not in result:
+            result.append(node[1])
+    elif kind in ('cat', 'alt'):
+        for child in node[1]:
+            collect_sets(child, result)
+    else:
+        collect_sets(node[1], result)
+
+
+class NFA:
+    """НКА Томпсона: переходы по номеру атома или None для пустого перехода."""
+
+    def __init__(self):
+        self.edges: List[List[Tuple[Optional[int], int]]] = []
+        self.accepts: Dict[int, int] = {} # Конечное состояние -> номер правила
+
+    def state(self) -> int:
+        self.edges.append([])
+        return len(self.edges) - 1
+
+    def build(self, node: tuple, sets: List[CharSet]) -> Tuple[int, int]:
+        kind = node[0]
+        if kind == 'set':
+            start, end = self.state(), self.state()
+            self.edges[start].append((sets.index(node[1]), end))
+            return start, end
+        if kind == 'cat':
+            start = end = self.state()
+            for child in node[1]:
+                child_start, child_end = self.build(child, sets)
+                self.edges[end].append((None, child_start))
+                end = child_end
+            return start, end
+        if kind == 'alt':
+            start, end = self.state(), self.state()
+            for child in node[1]:
+                child_start, child_end = self.build(child, sets)
+                self.edges[start].append((None, child_start))
+                self.edges[child_end].append((None, end))
+            return start, end
+        inner_start, inner_end = self.build(node[1], sets)
+        start, end = self.state(), self.state()
+        self.edges[start].append((None, inner_start))
+        self.edges[inner_end].append((None, end))
+        if kind in ('star', 'opt'):
+            self.edges[start].append((None, end))
+        if kind in ('star', 'plus'):
+            self.edges[inner_end].append((None, inner_start))
+        return start, end
+
+    def closure(self, states) -> FrozenSet[int]:
+        result = set(states)
+        stack = list(states)
+        while stack:
+            for label, target in self.edges[stack.pop()]:
+                if label is None and target not in result:
+                    result.add(target)
+                    stack.append(target)
+        return frozenset(result)
+
+
+def build_automaton() -> Automaton:
+    names, boundary, rules = scanner_rules()
+    sets: List[CharSet] = []
+    for rule in rules:
+        collect_sets(rule.node, sets)
+
+    # Классы символов: одинаковый вектор принадлежности атомам - один класс
+    vectors: Dict[Tuple[bool, ...], int] = {}
+    ascii_classes = []
+    for code in range(128):
+        vector = tuple(s.contains(chr(code)) for s in sets)
+        ascii_classes.append(vectors.setdefault(vector, len(vectors)))
+    for s in sets:
+        for ch in s.chars | {c for r in s.ranges for c in r}:
+            if ord(ch) >= 128:
+                raise ValueError(f"Символ {ch!r} вне ASCII в таблице токенов не поддерживается")
+    unicode_classes = {}
+    for features in UNICODE_FEATURES:
+        vector = tuple(s.contains_features(*features) for s in sets)
+        unicode_classes[features] = vectors.setdefault(vector, len(vectors))
+    class_count = len(vectors)
+    class_members = [[i for i, inside in enumerate(vector) if inside] for vector in vectors]
+
+    nfa = NFA()
+    root = nfa.state()
+    for number, rule in enumerate(rules):
+        start, end = nfa.build(rule.node, sets)
+        nfa.edges[root].append((None, start))
+        nfa.accepts[end] = number
+
+    start = nfa.closure([root])
+    dfa_states = {start: 0}
+    queue = [start]
+    transitions: List[int] = []
+    accepts = []
+    while queue:
+        current = queue.pop(0)
+        accepts.append(tuple(sorted(nfa.accepts[s] for s in current if s in nfa.accepts)))
+        for members in class_members:
+            targets = [target for s in current for label, target in nfa.edges[s]
+                       if label is not None and label in members]
+            if not targets:
+                transitions.append(-1)
+                continue
+            target = nfa.closure(targets)
+            if target not in dfa_states:
+                dfa_states[target] = len(dfa_states)
+                queue.append(target)
+            transitions.append(dfa_states[target])
+    if accepts[0]:
+        raise ValueError("Правило таблицы допускает пустое совпадение")
+
+    return Automaton([names[rule.alternative] for rule in rules], [boundary[rule.alternative] for rule in rules],
+                     [rule.lazy for rule in rules], ascii_classes, unicode_classes, class_count, transitions, accepts)
+
+
+def _wrap(values: list, indent: str = "    ", width: int = 100) -> str:
+    lines, line = [], indent
+    for value in values:
+        item = repr(value) + ", "
+        if len(line) + len(item) > width:
+            lines.append(line.rstrip())
+            line = indent
+        line += item
+    lines.append(line.rstrip())
+    return "\n".join(lines)
+
+
+TEMPLATE = '''\
+# Сгенерировано scannerGen.py из таблицы токенов lexer.py. Не редактировать вручную:
+# после изменения таблицы выполните `python scannerGen.py`.
+from typing import Optional, Tuple
+
+# Подпись таблицы токенов, из которой собран автомат (см. lexer.table_signature)
+TABLE_SIGNATURE = {signature!r}
+
+# Правило - ветвь верхнего уровня одного типа токена; номер правила задаёт приоритет.
+# Имена типов токенов по номеру правила
+TOKEN_NAMES = (
+{names}
+)
+# Правила, после которых должна стоять граница слова (lexer.KEYWORD_BOUNDARY)
+_BOUNDARY = (
+{boundary}
+)
+# Ленивые правила: из них берётся самое короткое совпадение
+_LAZY = (
+{lazy}
+)
+
+# Класс символа ASCII по его коду
+_ASCII_CLASSES = (
+{ascii_classes}
+)
+# Класс символа вне ASCII по признакам (\\\\w, \\\\d, \\\\s)
+_UNICODE_CLASSES = {{
+{unicode_classes}
+}}
+# Переходы: _TRANSITIONS[состояние][класс], -1 - тупик
+_TRANSITIONS = (
+{transitions}
+)
+# Правила, допускаемые в состоянии, в порядке приоритета
+_ACCEPTS = (
+{accepts}
+)
+
+_unicode_cache = {{}}
+
+
+def _unicode_class(ch: str) -> int:
+    cls = _unicode_cache.get(ch)
+    if cls is None:
+        cls = _UNICODE_CLASSES[(ch.isalnum() or ch == '_', ch.isdecimal(), ch.isspace())]
+        _unicode_cache[ch] = cls
+    return cls
+
+
+def _at_boundary(code: str, end: int) -> bool:
+    if end >= len(code):
+        return True
+    ch = code[end]
+    return ch != '.' and not (ch.isalnum() or ch == '_')
+
+
+def match(code: str, pos: int) -> Optional[Tuple[str, int]]:
+    """Самый приоритетный токен, начинающийся в pos: (имя типа, конец) или None."""
+    transitions = _TRANSITIONS
+    ascii_classes = _ASCII_CLASSES
+    accepts = _ACCEPTS
+    length = len(code)
+    state = 0
+    end = pos
+    best = len(TOKEN_NAMES)
+    best_end = -1
+    while end < length:
+        ch = code[end]
+        index = ord(ch)
+        state = transitions[state][ascii_classes[index] if index < 128 else _unicode_class(ch)]
+        if state < 0:
+            break
+        end += 1
+        for rule in accepts[state]:
+            if rule > best:
+                break
+            if _BOUNDARY[rule] and not _at_boundary(code, end):
+                continue
+            # Более длинное совпадение того же правила выигрывает, если правило не ленивое
+            if rule < best or not _LAZY[rule]:
+                best = rule
+                best_end = end
+            break
+    if best_end < 0:
+        return None
+    return TOKEN_NAMES[best], best_end
+'''
+
+
+def render(automaton: Automaton) -> str:
+    return TEMPLATE.format(
+        signature=lexer.table_signature(),
+        names=_wrap(automaton.names),
+        boundary=_wrap(automaton.boundary),
+        lazy=_wrap(automaton.lazy),
+        ascii_classes=_wrap(automaton.ascii_classes),
+        unicode_classes="\n".join(f"    {features!r}: {cls}," for features, cls in automaton.unicode_classes.items()),
+        transitions="\n".join(f"    {tuple(automaton.transitions[i:i + automaton.class_count])!r},"
+                               for i in range(0, len(automaton.transitions), automaton.class_count)),
+        accepts=_wrap(automaton.accepts),
+    )
+
+
+def generate(path: str = OUTPUT_FILE):
+    source = render(build_automaton())
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        file.write(source)
+    print(f"Записан {path}")
+
+
+def check(paths: List[str]) -> bool:
+    """Сравнивает токены и ошибки движков regex и dfa на заданных файлах."""
+    import contextlib
+    import io
+
+    with open(OUTPUT_FILE, encoding="utf-8") as file:
+        if file.read() != render(build_automaton()):
+            print(f"{OUTPUT_FILE} устарел: выполните `python scannerGen.py`")
+            return False
+
+    ok = True
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            code = file.read()
+        results = []
+        for engine in ("regex", "dfa"):
+            lex = lexer.Lexer(code, engine=engine)
+            with contextlib.redirect_stdout(io.StringIO()):
+                lex.lex_analyze()
+            tokens = [(t.kind, t.text, t.line, t.column, t.id) for t in lex.token_list]
+            categories = [[(t.kind, t.text, t.id) for t in tokens_] for tokens_ in lex.category_lists]
+            results.append((tokens, categories, lex.errors))
+        if results[0] == results[1]:
+            print(f"OK    {path}: {len(results[0][0])} токенов")
+        else:
+            ok = False
+            regex_tokens, dfa_tokens = results[0][0], results[1][0]
+            index = next((i for i, (a, b) in enumerate(zip(regex_tokens, dfa_tokens)) if a != b),
+                         min(len(regex_tokens), len(dfa_tokens)))
+            print(f"DIFF  {path}: первое расхождение на токене {index}")
+            print(f"      regex: {regex_tokens[index:index + 1]}")
+            print(f"      dfa:   {dfa_tokens[index:index + 1]}")
+    return ok
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    if arguments[:1] == ["--check"]:
+        files = arguments[1:] or sorted(glob.glob(SAMPLES))
+        sys.exit(0 if check(files) else 1)
+    generate()
@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from typing import List
+
+# Размер куска текста: правка пересобирает один-два куска и сдвигает начала остальных
+CHUNK_SIZE = 1 << 14
+
+
+class SourceText:
+    """Текст, который правится по месту (см. Lexer.apply_edit).
+
+    Строка Python неизменяема, и замена участка в ней копирует весь текст. Здесь
+    текст хранится кусками не длиннее CHUNK_SIZE: splice пересобирает только куски,
+    задетые правкой. Чтение - срезами и find, как у str.
+    """
+
+    def __init__(self, text: str = ""):
+        self.chunks: List[str] = []
+        self.starts: List[int] = [] # Смещения начал кусков
+        self.length = len(text)
+        self._set_chunks(0, 0, 0, text)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __str__(self) -> str:
+        return "".join(self.chunks)
+
+    def __getitem__(self, index: slice) -> str:
+        start, stop, step = index.indices(self.length)
+        if step != 1:
+            return str(self)[index]
+        if start >= stop:
+            return ""
+        k = bisect_right(self.starts, start) - 1
+        chunk_start = self.starts[k]
+        chunk = self.chunks[k]
+        if stop <= chunk_start + len(chunk):
+            return chunk[start - chunk_start:stop - chunk_start]
+        parts = [chunk[start - chunk_start:]]
+        for chunk_start, chunk in zip(self.starts[k + 1:], self.chunks[k + 1:]):
+            if chunk_start + len(chunk) >= stop:
+                parts.append(chunk[:stop - chunk_start])
+                break
+            parts.append(chunk)
+        return "".join(parts)
+
+    def find(self, sub: str, start: int = 0) -> int:
+        start = max(start, 0)
+        k = max(bisect_right(self.starts, start) - 1, 0)
+        # Хвост предыдущего куска: вхождение может начаться в нём и закончиться в следующем
+        carry = ""
+        for chunk_start, chunk in zip(self.starts[k:], self.chunks[k:]):
+            skip = max(start - chunk_start, 0)
+            piece = carry + chunk[skip:]
+            found = piece.find(sub)
+            if found != -1:
+                return chunk_start + skip - len(carry) + found
+            carry = piece[max(len(piece) - len(sub) + 1, 0):] if len(sub) > 1 else ""
+        return -1
+
+    def splice(self, offset: int, removed_len: int, inserted_text: str):
+        """Заменяет removed_len символов с offset на inserted_text."""
+        end = offset + removed_len
+        low = max(bisect_right(self.starts, offset) - 1, 0)
+        high = max(bisect_right(self.starts, end) - 1, low)
+        text = (self.chunks[low][:offset - self.starts[low]] + inserted_text
+                + self.chunks[high][end - self.starts[high]:])
+        if len(text) < CHUNK_SIZE // 4 and high + 1 < len(self.chunks):
+            # Короткий кусок сливается со следующим, чтобы куски не дробились от правки к правке
+            high += 1
+            text += self.chunks[high]
+        self.length += len(inserted_text) - removed_len
+        self._set_chunks(low, high + 1, self.starts[low], text)
+
+    def _set_chunks(self, low: int, high: int, start: int, text: str):
+        """Заменяет куски [low, high) текстом text, который начинается со смещения start."""
+        # Хотя бы один кусок остаётся всегда; текст делится на куски поровну
+        count = max(-(-len(text) // CHUNK_SIZE), 1 if low == 0 and high >= len(self.chunks) else 0)
+        size = -(-len(text) // count) if count else 0
+        chunks = [text[i * size:(i + 1) * size] for i in range(count)]
+        tail_starts = self.starts[high:]
+        if tail_starts:
+            delta = start + len(text) - tail_starts[0]
+            tail_starts = [chunk_start + delta for chunk_start in tail_starts]
+        self.chunks[low:high] = chunks
+        self.starts[low:] = [start + i * size for i in range(count)] + tail_starts
@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def levenshtein_distance(s1: str, s2: str, limit: Optional[int] = None) -> int:
+    """Вычисляет расстояние Левенштейна между двумя строками.
+
+    Если задан limit, вычисление прекращается, как только расстояние заведомо
+    его превысит; тогда возвращается limit + 1.
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if limit is not None and len(s1) - len(s2) > limit:
+        return limit + 1
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        if limit is not None and min(current_row) > limit:
+            return limit + 1
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def _bigrams(word: str) -> set:
+    padded = f"\0{word}\0"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class NGramIndex:
+    """Индекс слов по биграммам для поиска ближайшего слова с ограничением расстояния.
+
+    Каждая правка затрагивает не больше двух биграмм, поэтому слово на расстоянии
+    не больше k делит с запросом минимум len(биграммы) - 2k биграмм. Расстояние
+    Левенштейна считается только для прошедших этот фильтр кандидатов.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.words: List[str] = []
+        self.known = set()
+        self.postings: Dict[str, List[int]] = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if word in self.known:
+            return
+        self.known.add(word)
+        word_id = len(self.words)
+        self.words.append(word)
+        for gram in _bigrams(word):
+            self.postings.setdefault(gram, []).append(word_id)
+
+    def closest(self, word: str, max_distance: int) -> Optional[Tuple[int, int, str]]:
+        """Ближайшее слово на расстоянии не больше max_distance: (расстояние, номер, слово)."""
+        grams = _bigrams(word)
+        required = len(grams) - 2 * max_distance
+        if required > 0:
+            counts: Dict[int, int] = {}
+            for gram in grams:
+                for word_id in self.postings.get(gram, ()):
+                    counts[word_id] = counts.get(word_id, 0) + 1
+            candidates = sorted(word_id for word_id, count in counts.items() if count >= required)
+        else:
+            candidates = range(len(self.words))
+
+        best = None
+        bound = max_distance
+        for word_id in candidates:
+            candidate = self.words[word_id]
+            if abs(len(candidate) - len(word)) > bound:
+                continue
+            distance = levenshtein_distance(word, candidate, bound)
+            if distance <= bound and (best is None or distance < best[0]):
+                best = (distance, word_id, candidate)
+                bound = distance
+        return best
+
+
+class SuggestionIndex:
+    """Подсказки для нераспознанных слов: ключевые слова и операторы плюс встреченные идентификаторы.
+
+    Общий индекс строится один раз; идентификаторы копятся и попадают в свой
+    индекс только при первом запросе, чтобы не замедлять разбор без ошибок.
+    """
+
+    def __init__(self, base: NGramIndex):
+        self.base = base
+        self.names = NGramIndex()
+        self.pending: List[str] = []
+
+    def add_name(self, name: str):
+        self.pending.append(name)
+
+    def suggest(self, word: str) -> Optional[str]:
+        for name in self.pending:
+            self.names.add(name)
+        self.pending.clear()
+
+        # Не больше одной правки на три символа, как у порога 0.6 в difflib
+        max_distance = len(word) // 3
+        if max_distance == 0:
+            return None
+        candidates = [found for found in (self.base.closest(word, max_distance),
+                                          self.names.closest(word, max_distance)) if found]
+        if not candidates:
+            return None
+        # При равном расстоянии ключевые слова и операторы предпочтительнее идентификаторов
+        return min(candidates, key=lambda found: found[0])[2]
@@ -0,0 +1,47 @@
+"""cstBinary: cst.bin читается в те же данные, что лежат в *.json, и закрывается при живых срезах."""
+import contextlib
+import glob
+import io
+import json
+import os
+
+import pytest
+
+from cstBinary import CstFile
+from main import process_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_reports(path: str, output_dir) -> str:
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = process_file(path, str(output_dir), binary=True)
+    assert summary["error"] is None
+    return str(output_dir / "cst.bin")
+
+
+def load_json(path) -> object:
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))))
+def test_binary_round_trip_matches_json(path, tmp_path):
+    with CstFile(write_reports(path, tmp_path)) as cst_file:
+        assert cst_file.to_plain() == load_json(tmp_path / "cst.json")
+        for name in ("symbol_table", "imports", "diagnostics"):
+            assert cst_file.to_plain(name=name) == load_json(tmp_path / (name + ".json")), name
+
+
+def test_close_with_column_slices_alive(tmp_path):
+    path = write_reports(os.path.join(ROOT, "go", "store.go"), tmp_path)
+    with CstFile(path) as cst_file:
+        rows = [cst_file.tokens[index] for index in range(5)]
+        lines, columns = cst_file.tokens.lines[0:5], cst_file.tokens.columns[:5]
+        exported = memoryview(cst_file.tokens.lines)
+    # Отображение живёт, пока живы срезы
+    assert list(lines) == [row[2] for row in rows] and list(columns) == [row[3] for row in rows]
+    assert exported[0] == rows[0][2]
+    cst_file.close()
+    with pytest.raises(ValueError):
+        cst_file.tokens.lines[0]
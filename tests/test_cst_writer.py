@@ -0,0 +1,84 @@
+"""CstWriter: форматы indent, compact и jsonl совпадают с json.dumps от program.to_dict()."""
+import contextlib
+import glob
+import io
+import json
+import os
+
+import pytest
+
+from cstModel import Program
+from cstWriter import COMPACT_SEPARATORS, FORMATS, MAX_INDENT_DEPTH, CstWriter, dumps, file_name
+from lexer import Lexer
+from parser import Parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Объявления-словари со строками не из ASCII, числами с плавающей точкой и пустыми контейнерами
+SMALL_TREE = [
+    {"type": "Пакет", "name": "главный \"пакет\"\n\t☃", "nodes": []},
+    {"type": "Values", "floats": [1.5, -0.0, 1e300, 2.5e-08, float("inf")], "empty": {}, "nested": [[], {}, [{}]],
+     "flags": [True, False, None], "ключ": {"вложенный": "текст 𝄞"}},
+]
+
+
+def expected_texts(declarations):
+    """Ожидаемый текст каждого формата по json.dumps."""
+    program = {"type": Program.type, "children": declarations}
+    return {
+        "indent": json.dumps(program, indent=2, ensure_ascii=False),
+        "compact": json.dumps(program, separators=COMPACT_SEPARATORS, ensure_ascii=False),
+        "jsonl": "".join(json.dumps(declaration, separators=COMPACT_SEPARATORS, ensure_ascii=False) + "\n"
+                         for declaration in declarations),
+    }
+
+
+def written_text(declarations, format, tmp_path) -> str:
+    path = tmp_path / file_name(format)
+    with CstWriter(str(path), format) as writer:
+        for declaration in declarations:
+            writer.write(declaration)
+    return path.read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))))
+def test_formats_match_json_on_samples(path, tmp_path):
+    with open(path, encoding='utf-8') as file:
+        code = file.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes = list(Parser(Lexer(code).lex_analyze(), recover=True).iter_declarations())
+    declarations = [node.to_dict() for node in nodes]
+    expected = expected_texts(declarations)
+    for format in FORMATS:
+        # Узлы и их словари записываются одинаково
+        assert written_text(nodes, format, tmp_path) == expected[format], format
+        assert written_text(declarations, format, tmp_path) == expected[format], format
+
+
+@pytest.mark.parametrize("declarations", [SMALL_TREE, SMALL_TREE[:1], []])
+def test_formats_match_json_on_small_tree(declarations, tmp_path):
+    expected = expected_texts(declarations)
+    for format in FORMATS:
+        assert written_text(declarations, format, tmp_path) == expected[format], format
+
+
+def test_indent_stops_at_max_depth():
+    # Цепочка контейнеров глубже MAX_INDENT_DEPTH: словари и списки через один
+    depth = MAX_INDENT_DEPTH + 5
+    inner = [1.5, "ё", {}, []]
+    value = inner
+    for level in range(depth - 1, -1, -1):
+        value = {"k": value} if level % 2 else [value]
+    # Уровни до MAX_INDENT_DEPTH - с отступами, как у json.dumps(indent=2); глубже -
+    # одной строкой с разделителями json.dumps для indent
+    cut = value
+    for _ in range(MAX_INDENT_DEPTH):
+        cut = cut["k"] if isinstance(cut, dict) else cut[0]
+    opening, closing = [], []
+    for level in range(MAX_INDENT_DEPTH):
+        key = '"k": ' if level % 2 else ""
+        opening.append(("{" if level % 2 else "[") + "\n" + " " * (2 * (level + 1)) + key)
+        closing.append("\n" + " " * (2 * level) + ("}" if level % 2 else "]"))
+    expected = ("".join(opening) + json.dumps(cut, separators=(",", ": "), ensure_ascii=False)
+                + "".join(reversed(closing)))
+    assert dumps(value, indent=2) == expected
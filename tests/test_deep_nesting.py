@@ -0,0 +1,92 @@
+"""Конструкции Go глубиной 10 000: разбор, to_dict и запись CST без предела рекурсии."""
+import contextlib
+import glob
+import io
+import json
+import os
+
+import pytest
+
+from cstModel import Program
+from cstWriter import COMPACT_SEPARATORS, FORMATS, CstWriter, dumps, file_name
+from lexer import Lexer
+from main import process_file
+from parser import Parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEPTH = 10_000
+
+# Тело функции f с вложенностью DEPTH и тип узла, который встречается DEPTH раз
+NESTED = {
+    "binary": ("x = " + " + ".join(["a"] * (DEPTH + 1)) + ";\n", "BinaryOperation"),
+    "unary": ("x = " + "!" * DEPTH + "a;\n", "UnaryOperation"),
+    "call": ("x = " + "g(" * DEPTH + "a" + ")" * DEPTH + ";\n", "FunctionCall"),
+    "if": ("if a {\n" * DEPTH + "}\n" * DEPTH, "IfStatement"),
+    "for": ("for _, v := range a {\n" * DEPTH + "}\n" * DEPTH, "ForStatement"),
+    "switch": ("switch a {\ncase 1:\n" * DEPTH + "}\n" * DEPTH, "SwitchStatement"),
+    # Скобки узла не дают: DEPTH раз встречается сложение внутри них
+    "paren": ("x = " + "(a + " * DEPTH + "a" + ")" * DEPTH + ";\n", "BinaryOperation"),
+    "array": ("x = " + "[]T{" * DEPTH + "a" + "}" * DEPTH + ";\n", "ArrayLiteral"),
+    "struct": ("x = " + "T{a: " * DEPTH + "1" + "}" * DEPTH + ";\n", "StructInitialization"),
+}
+
+
+def source(name: str) -> str:
+    # Тип T объявлен заранее, чтобы T{...} внутри выражений разбирался как литерал
+    return "package p;\n\ntype T struct {\n\ta int;\n};\n\nfunc f() {\n" + NESTED[name][0] + "}\n"
+
+
+def parse(code: str):
+    """Парсер после разбора и объявления верхнего уровня."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser(Lexer(code).lex_analyze(), recover=True)
+        return parser, list(parser.iter_declarations())
+
+
+@pytest.mark.parametrize("name", sorted(NESTED))
+def test_deep_nesting_writes_cst(name, tmp_path):
+    parser, nodes = parse(source(name))
+    assert parser.get_diagnostics() == []
+    declarations = [node.to_dict() for node in nodes]
+    node_type = NESTED[name][1]
+    for format in FORMATS:
+        path = tmp_path / file_name(format)
+        with CstWriter(str(path), format) as writer:
+            for declaration in declarations:
+                writer.write(declaration)
+        text = path.read_text(encoding='utf-8')
+        assert text.count(f'"{node_type}"') == DEPTH
+    # Узлы и их словари записываются одинаково
+    program = {"type": Program.type, "children": declarations}
+    assert dumps(Program(nodes), separators=COMPACT_SEPARATORS) == \
+        dumps(program, separators=COMPACT_SEPARATORS)
+
+
+@pytest.mark.parametrize("name", ["binary", "if", "paren", "array", "struct"])
+def test_deep_nesting_process_file(name, tmp_path):
+    path = tmp_path / "deep.go"
+    path.write_text(source(name), encoding='utf-8')
+    output_dir = tmp_path / "out"
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = process_file(str(path), str(output_dir), binary=True, token_formats=("txt", "jsonl"))
+    assert summary["error"] is None
+    for report in ("cst.json", "cst.bin", "symbol_table.json", "imports.json", "diagnostics.json"):
+        assert os.path.getsize(output_dir / report) > 0
+
+
+@pytest.mark.parametrize("value", [
+    {"a": [1, 2.5, None, True, False, "строка \"в кавычках\"\n"], "b": {}, "c": [], 3: {"d": [[]]}},
+    [float("nan"), float("inf"), -float("inf"), 10 ** 30, -0.0, ()],
+    "",
+])
+def test_dumps_matches_json(value):
+    for options in ({}, {"indent": 2}, {"separators": COMPACT_SEPARATORS}):
+        assert dumps(value, **options) == json.dumps(value, ensure_ascii=False, **options)
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))))
+def test_dumps_matches_json_on_samples(path):
+    with open(path, encoding='utf-8') as file:
+        program = Program(parse(file.read())[1])
+    for options in ({"indent": 2}, {"separators": COMPACT_SEPARATORS}):
+        assert dumps(program, **options) == json.dumps(program.to_dict(), ensure_ascii=False, **options)
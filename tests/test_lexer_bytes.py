@@ -0,0 +1,70 @@
+"""Байтовый режим лексера (Lexer.from_file, Lexer(bytes)) против строкового."""
+import glob
+import mmap
+import os
+
+import pytest
+
+from lexer import Lexer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NON_ASCII_SOURCES = [
+    "package main\nfunc main() {\n\tfor\u2028x := 1\n}\n",
+    "package main\nvar\u00a0a = 1\n",
+    "package main\nvar x = \u0663 + 1\n",
+    "package main\nvar \u0438\u043c\u044f = \"\u0422\u043e\u0432\u0430\u0440\" // \u043a\u043e\u043c\u043c\u0435\u043d\u0442\u0430\u0440\u0438\u0439\n",
+    "package main\nfunc f() { s := `\u0441\u044b\u0440\u0430\u044f\n\u2713`; \u03be := s }\n",
+    "package main\nvar a = 1\u3000+ 2\n",
+    "package main\nvar b = \"\u4f60\u597d\" + c\u00b2\n",
+    # Символ вне ASCII сразу за токеном, внутри числа и в строке без слов (ошибка с '$' не в конце текста)
+    "package main\nvar x = 1.\u0663\nvar s = \"a\"\u00e9\n",
+    "package main\n\u2713\nvar a = \u00e9b + 1\u2713\n",
+    "package main\nvar s = \"\u0441\u0442\u0440\u043e\u043a\u0430\n\u0434\u0432\u0435\"\u00e9 + 1\n\u2713",
+]
+
+ASCII_SOURCES = [
+    "package main\nvar a\x1c= 1\x1f\n",
+    "package main\nfunc f() { x := (1 + 2] }\n",
+    "package main\n)\nfunc a() { b() }\n",
+]
+
+
+def lex_result(lexer: Lexer):
+    with lexer:
+        tokens = lexer.lex_analyze()
+        rows = [(token.text, token.kind, token.line, token.column, token.id) for token in tokens]
+        categories = [[(token.text, token.id) for token in category] for category in lexer.category_lists]
+        return rows, categories, list(lexer.errors)
+
+
+@pytest.mark.parametrize("source", NON_ASCII_SOURCES + ASCII_SOURCES)
+def test_bytes_match_str(source):
+    expected = lex_result(Lexer(source))
+    assert lex_result(Lexer(source.encode('utf-8'))) == expected
+
+
+@pytest.mark.parametrize("source", NON_ASCII_SOURCES + ASCII_SOURCES)
+def test_from_file_matches_str(source, tmp_path):
+    path = tmp_path / "source.go"
+    path.write_bytes(source.encode('utf-8'))
+    assert lex_result(Lexer.from_file(str(path))) == lex_result(Lexer(source))
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))))
+def test_sample_files(path):
+    with open(path, encoding='utf-8') as file:
+        source = file.read()
+    assert lex_result(Lexer.from_file(path)) == lex_result(Lexer(source))
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))))
+def test_file_is_mapped(path):
+    # Файлы с символами вне ASCII тоже сканируются по отображению, без декодирования целиком
+    with Lexer.from_file(path) as lexer:
+        assert lexer.is_bytes and isinstance(lexer.code, mmap.mmap)
+
+
+def test_invalid_utf8_matches_replaced_text():
+    data = b"package main\nvar s = \"\xff\"\nvar \xfe = 1\n"
+    assert lex_result(Lexer(data)) == lex_result(Lexer(data.decode('utf-8', errors='replace')))
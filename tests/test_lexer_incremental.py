@@ -0,0 +1,110 @@
+"""Lexer.apply_edit против полного сканирования того же текста."""
+import glob
+import os
+import random
+
+import pytest
+
+import lexer as lexer_module
+import sourceText
+from lexer import Lexer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIECES = ["(", ")", "{", "}", "[", "]", "x", " ", "\n", "func f() {", "}\n", "\"", "`", "/*", "*/",
+          "1.", "<<", "=", ";", "a.b(", "))", "]]"]
+
+
+def fresh(text: str) -> Lexer:
+    lexer = Lexer(text)
+    lexer.lex_analyze()
+    return lexer
+
+
+def stream(lexer: Lexer):
+    # Номера в таблицах идентификаторов после правок могут отличаться, поэтому не сравниваются
+    tokens = lexer.token_list
+    return [(token.kind, token.text, token.line, token.column) for token in tokens], list(tokens.matches)
+
+
+# ']' снимает со стека '(' и отбрасывается: '{' и '}' остаются парой, '(' после g - без пары
+MISMATCH = "package p;\nfunc f() { g( ] }\n"
+
+
+def open_brackets_before(lexer: Lexer, index: int):
+    # Полное сканирование с самого начала: стек открывающих скобок перед токеном index
+    stack = []
+    tokens = lexer.token_list
+    for i in range(index):
+        del stack[tokens.depths[i]:]
+        if tokens[i].text in "([{":
+            stack.append(i)
+        elif tokens[i].text in ")]}":
+            stack.pop()
+    del stack[tokens.depths[index]:]
+    return stack
+
+
+def sources():
+    result = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))):
+        with open(path, encoding='utf-8') as file:
+            result.append(file.read())
+    return result + ["package p;\n)\nfunc a() { b() }\n", MISMATCH]
+
+
+def test_stray_closing_bracket_dropped():
+    text = "package p;\nfunc a() { b() }\n"
+    lexer = fresh(text)
+    diff = lexer.apply_edit(len("package p;\n"), 0, ")\n")
+    assert stream(lexer) == stream(fresh("package p;\n)\nfunc a() { b() }\n"))
+    assert any("лишняя закрывающая скобка" in error for error in diff.errors)
+
+
+def test_mismatch_pairs_follow_bracket_stack():
+    lexer = fresh(MISMATCH)
+    tokens = lexer.token_list
+    index = {(token.text, token.column): token.index for token in tokens}
+    assert tokens[index["{", 10]].match == index["}", 17]
+    assert tokens[index["}", 17]].match == index["{", 10]
+    assert tokens[index["(", 7]].match == index[")", 8]
+    assert tokens[index["(", 13]].match == -1
+
+    # То же после правки, которая вносит несоответствие
+    lexer = fresh("package p;\nfunc f() { g() }\n")
+    lexer.apply_edit(len("package p;\nfunc f() { g("), 1, " ]")
+    assert stream(lexer) == stream(fresh(MISMATCH))
+
+
+def test_unclosed_bracket_reported_at_end():
+    lexer = fresh("package p\nfunc a() { b() }\n")
+    diff = lexer.apply_edit(len("package p\nfunc a() { b("), 0, "(")
+    assert stream(lexer) == stream(fresh("package p\nfunc a() { b(() }\n"))
+    assert any("незакрытая скобка" in error for error in diff.errors)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("small", [False, True])
+def test_random_edits_match_full_lex(seed, small, monkeypatch):
+    if small:
+        # Малые куски текста, окна и шаг снимков стека, чтобы правки задевали их границы
+        monkeypatch.setattr(sourceText, "CHUNK_SIZE", 64)
+        monkeypatch.setattr(lexer_module, "WINDOW_SIZE", 16)
+        monkeypatch.setattr(lexer_module, "CHECKPOINT_INTERVAL", 8)
+    rng = random.Random(seed)
+    texts = sources()
+    for _ in range(40):
+        text = rng.choice(texts)
+        lexer = fresh(text)
+        for _ in range(6):
+            offset = rng.randrange(len(text) + 1)
+            removed = min(rng.randrange(4), len(text) - offset)
+            inserted = "".join(rng.choice(PIECES) for _ in range(rng.randrange(3)))
+            lexer.apply_edit(offset, removed, inserted)
+            text = text[:offset] + inserted + text[offset + removed:]
+            expected = fresh(text)
+            assert stream(lexer) == stream(expected), repr(text)
+            assert list(lexer.token_list.depths) == list(expected.token_list.depths)
+            assert lexer.checkpoints == sorted(set(lexer.checkpoints))
+            for index, stack in zip(lexer.checkpoints, lexer.checkpoint_stacks):
+                assert list(stack) == open_brackets_before(expected, index)
+            assert lexer.error_spans == expected.error_spans
@@ -0,0 +1,93 @@
+"""ParseCache: подпись кода анализатора и ограничение размера без обхода каталога на каждой записи."""
+import ast
+import os
+import shutil
+
+from parseCache import SIGNATURE_MODULES, ParseCache, parser_signature
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def project_imports(name: str):
+    with open(os.path.join(ROOT, name + ".py"), encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return {name for name in names if os.path.exists(os.path.join(ROOT, name + ".py"))}
+
+
+def test_signature_covers_imported_modules():
+    # main импортирует и модули записи отчётов: они читают результат, но не меняют его
+    writers = {"cstWriter", "cstBinary", "parseCache"}
+    for name in SIGNATURE_MODULES:
+        if os.path.exists(os.path.join(ROOT, name + ".py")):
+            assert project_imports(name) - writers <= set(SIGNATURE_MODULES), name
+
+
+def test_signature_changes_with_line_index(tmp_path):
+    for name in SIGNATURE_MODULES:
+        if os.path.exists(os.path.join(ROOT, name + ".py")):
+            shutil.copy(os.path.join(ROOT, name + ".py"), tmp_path)
+    before = parser_signature(str(tmp_path))
+    assert before == parser_signature(ROOT)
+    with open(tmp_path / "lineIndex.py", "a", encoding='utf-8') as file:
+        file.write("\n# правка\n")
+    assert parser_signature(str(tmp_path)) != before
+
+
+def test_put_keeps_running_size(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path), max_bytes=1 << 20)
+    scans = []
+    entries = ParseCache._entries
+    monkeypatch.setattr(ParseCache, "_entries", lambda self: scans.append(1) or entries(self))
+    for number in range(50):
+        cache.put(cache.key(str(number).encode()), {"value": number})
+    assert not scans
+    assert cache.size == sum(size for _, size, _ in entries(cache))
+    assert cache.get(cache.key(b"7")) == {"value": 7}
+
+
+def test_evict_when_limit_crossed(tmp_path):
+    payload = os.urandom(2000) # Не сжимается: запись ~2 КБ
+    cache = ParseCache(str(tmp_path), max_bytes=20_000)
+    for number in range(40):
+        cache.put(cache.key(str(number).encode()), payload)
+        on_disk = sum(size for _, size, _ in cache._entries())
+        assert on_disk == cache.size <= cache.max_bytes
+    assert cache.get(cache.key(b"39")) == payload
+    assert cache.get(cache.key(b"0")) is None
+    # Новый объект кэша начинает с размера каталога
+    assert ParseCache(str(tmp_path), max_bytes=20_000).size == cache.size
+
+
+def test_limit_is_shared_between_caches(tmp_path):
+    # Два объекта кэша на одном каталоге - как два процесса пула: предел общий
+    payload = os.urandom(2000)
+    first, second = ParseCache(str(tmp_path), max_bytes=20_000), ParseCache(str(tmp_path), max_bytes=20_000)
+    for number in range(40):
+        cache = (first, second)[number % 2]
+        cache.put(cache.key(str(number).encode()), payload)
+        on_disk = sum(size for _, size, _ in cache._entries())
+        assert on_disk == first.size == second.size <= cache.max_bytes
+
+
+def test_key_and_lexer_read_file_once(tmp_path, monkeypatch):
+    import contextlib
+    import io
+
+    import main
+    path = tmp_path / "a.go"
+    path.write_text("package p;\n\nfunc f() {\n\tx := \"строка\";\n}\n", encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = main.analyze_file(str(path))
+        # С кэшем лексер получает прочитанные для ключа байты и файл заново не открывает
+        monkeypatch.setattr(main.Lexer, "from_file", None)
+        cache = ParseCache(str(tmp_path / "cache"))
+        summary = main.process_file(str(path), str(tmp_path / "out"), cache)
+    assert summary["error"] is None and not summary["cached"]
+    stored = cache.get(cache.key(path.read_bytes()))
+    assert stored["token_rows"] == expected["token_rows"] and stored["cst"] == expected["cst"]
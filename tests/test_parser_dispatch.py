@@ -0,0 +1,57 @@
+"""Таблицы разбора по целым видам токенов и скрипт замера dispatchBench."""
+import contextlib
+import glob
+import io
+import os
+
+import dispatchBench
+import lexer
+from parser import _BUILTIN_TYPES, Parser, _is_type_name
+from tokenModel import KIND_IDS, KIND_NAMES, Token
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEXER_KINDS = {token_type.name for token_type in lexer._TOKEN_TYPES}
+
+
+def test_builtin_types_are_not_token_kinds():
+    code = "package p;\n\nfunc f(a int, b string) (bool, float64) {\n\tvar x uint8 = 1;\n\treturn x;\n}\n"
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser(lexer.Lexer(code).lex_analyze(), recover=True)
+        parser.parse()
+    assert parser.get_diagnostics() == []
+    assert parser.get_symbol_table()["scopes"]["f"]["variables"]["x"]["type"] == "uint8"
+    assert not (_BUILTIN_TYPES - LEXER_KINDS) & set(KIND_NAMES)
+
+
+def test_kind_id_does_not_grow_kind_table():
+    # Токены, собранные не лексером, могут нести любые виды: чтение kind_id их не заносит
+    names = list(KIND_NAMES)
+    builtin, unknown = Token("int", "int", 1, 1, "N:0"), Token("mystery", "m", 1, 5, "N:1")
+    assert builtin.kind_id == unknown.kind_id == -1
+    assert _is_type_name(builtin) and not _is_type_name(unknown)
+    assert KIND_NAMES == names and "int" not in KIND_IDS and "mystery" not in KIND_IDS
+
+
+def test_benchmark_runs():
+    tokens = dispatchBench.load_tokens(sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))), 1000)
+    result = dispatchBench.benchmark(tokens, repeat=1)
+    assert result["tokens"] == len(tokens) >= 1000
+    assert result["dispatch_before_ns"] > 0 and result["dispatch_after_ns"] > 0 and result["parse_us"] > 0
+    assert "ns/token" in dispatchBench.report(result)
+
+
+def test_struct_literal_in_assignment_needs_no_rewind(monkeypatch):
+    # 'T {' справа от присваивания распознаётся заглядыванием: поток без истории
+    # прочитанных токенов даёт то же дерево, что и список токенов
+    import parser as parser_module
+    from tokenCursor import StreamCursor
+    code = ("package p;\n\ntype S struct {\n\ta int;\n};\n\nfunc f() {\n\tx = T{a: 1};\n"
+            "\ty = pkg.T{b: 2};\n\tz = S{a: 3};\n}\n")
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = Parser(lexer.Lexer(code).lex_analyze()).parse().to_dict()
+        monkeypatch.setattr(parser_module, "make_cursor", lambda tokens: StreamCursor(tokens, history=0))
+        program = Parser(lexer.Lexer(code).iter_tokens()).parse()
+    assert program.to_dict() == expected
+    body = program.children[2].body
+    # Как и прежде, от 'pkg.T' в узел попадает только имя типа
+    assert [node.right.struct_name for node in body] == ["T", "T", "S"]
@@ -0,0 +1,106 @@
+"""Parser.reparse после Lexer.apply_edit против полного разбора того же потока токенов."""
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+
+import pytest
+
+from lexer import Lexer
+from parser import Parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIECES = [";", "x", "}", "{", "\n", "a := 1;", "func k() {\n}\n", "type Q struct {\n\tz int;\n};\n",
+          "var v int = 3;\n", "Product", "(", ")", "// c\n", ""]
+
+
+def sources():
+    result = ["package p;\nfunc a() {\n}\n\nfunc b() {\n}\n"]
+    for path in sorted(glob.glob(os.path.join(ROOT, "go", "*.go"))):
+        with open(path, encoding='utf-8') as file:
+            result.append(file.read())
+    return result
+
+
+def snapshot(parser: Parser, program) -> str:
+    return json.dumps([program.to_dict(), parser.get_symbol_table(), parser.get_imports(),
+                       parser.get_diagnostics()], ensure_ascii=False, default=str)
+
+
+def full_parse(tokens) -> str:
+    parser = Parser(tokens, recover=True)
+    return snapshot(parser, parser.parse())
+
+
+def edited(text: str, offset: int, removed: int, inserted: str):
+    """Парсер и дерево после одной правки через reparse и снимок полного разбора."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        lexer = Lexer(text)
+        parser = Parser(lexer.lex_analyze(), recover=True)
+        program = parser.parse()
+        diff = lexer.apply_edit(offset, removed, inserted)
+        program = parser.reparse(program, diff)
+        return parser, program, full_parse(lexer.token_list)
+
+
+def test_semicolon_after_declaration_end():
+    # ';' вставлена сразу за '}' функции a: её разбор заглядывал на этот токен
+    text = "package p;\nfunc a() {\n}\n\nfunc b() {\n}\n"
+    parser, program, expected = edited(text, text.index("func b"), 2, ";")
+    assert snapshot(parser, program) == expected
+    assert '{"Name": "semicolon", "Text": ";"' in json.dumps(program.children[1].to_dict())
+
+
+def test_duplicated_declaration_gets_own_node():
+    # Копия задетого правкой объявления совпадает с ним по токенам, но узел у каждой свой
+    text = "package p;\n\nfunc k() {\n}\nfunc m() {\n}\n"
+    parser, program, expected = edited(text, text.index("}") + 1, 1, "func k() {\n}\n")
+    assert snapshot(parser, program) == expected
+    assert program.children[1] is not program.children[2]
+
+
+def test_reused_declaration_is_not_modified():
+    # Правка выше объявления b не трогает его узел: сдвиг хранится в program.shifts
+    text = "package p;\nfunc a() {\n}\n\nfunc b() {\n\tx := 1;\n}\n"
+    with contextlib.redirect_stdout(io.StringIO()):
+        lexer = Lexer(text)
+        parser = Parser(lexer.lex_analyze(), recover=True)
+        program = parser.parse()
+        node = program.children[2]
+        leaves = [(leaf.token.index, leaf.pos) for leaf in node.nodes]
+        for _ in range(2):
+            diff = lexer.apply_edit(text.index("{") + 1, 0, "\n\ty := 2;")
+            program = parser.reparse(program, diff)
+        expected = full_parse(lexer.token_list)
+    assert program.children[2] is node
+    assert [(leaf.token.index, leaf.pos) for leaf in node.nodes] == leaves
+    assert program.shifts[2] == (2 * 4, 2 * 4) # "y := 2;" - четыре токена
+    assert snapshot(parser, program) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_edits_match_full_parse(seed):
+    generator = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for text in sources():
+            for _ in range(20):
+                lexer = Lexer(text)
+                parser = Parser(lexer.lex_analyze(), recover=True)
+                program = parser.parse()
+                current = text
+                for _ in range(4):
+                    # Правки чаще всего у границ объявлений: сразу за '}' или перед 'func'
+                    anchors = [i + 1 for i, char in enumerate(current) if char == "}"]
+                    anchors += [i for i in range(len(current)) if current.startswith("func", i)]
+                    if anchors and generator.random() < 0.5:
+                        offset = generator.choice(anchors)
+                    else:
+                        offset = generator.randrange(len(current) + 1)
+                    removed = min(generator.choice([0, 0, 1, 2, 5]), len(current) - offset)
+                    inserted = generator.choice(PIECES)
+                    current = current[:offset] + inserted + current[offset + removed:]
+                    diff = lexer.apply_edit(offset, removed, inserted)
+                    program = parser.reparse(program, diff)
+                    assert snapshot(parser, program) == full_parse(lexer.token_list), (text[:20], offset, inserted)
@@ -0,0 +1,89 @@
+"""Режим восстановления Parser(recover=True): ошибка в объявлении не прерывает разбор файла."""
+import contextlib
+import io
+
+import pytest
+
+from lexer import Lexer
+from parser import Parser
+from tokenModel import KIND_IDS
+
+
+def parse(code: str, recover: bool = True):
+    """Парсер после разбора и дерево Program."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser(Lexer(code).lex_analyze(), recover=recover)
+        return parser, parser.parse()
+
+
+def declaration_types(program):
+    return [node.type for node in program.children]
+
+
+@pytest.mark.parametrize("recover", [False, True])
+def test_call_on_call_and_field_receivers(recover):
+    parser, program = parse("package p;\n\nfunc a() {\n\tx.y().z();\n\tw := a.b.c(1);\n}\n", recover)
+    assert parser.get_diagnostics() == []
+    body = program.children[1].body
+    chained = body[0]
+    assert (chained.type, chained.name, chained.package.type) == ("FunctionCall", "z", "FunctionCall")
+    assert (chained.package.package, chained.package.name) == ("x", "y")
+    field_call = body[1].to_dict()["nodes"][2]["value"]
+    assert (field_call["name"], field_call["package"]["type"]) == ("c", "FieldAccess")
+
+
+def test_call_without_name_becomes_diagnostic():
+    parser, program = parse("package p;\n\nfunc a() {\n\ta[i]();\n\tq := 1;\n}\n\nfunc b() {\n}\n")
+    assert [diagnostic["message"] for diagnostic in parser.get_diagnostics()] == ["Expected function name before '('"]
+    assert declaration_types(program) == ["PackageDeclaration", "FunctionDeclaration", "FunctionDeclaration"]
+
+
+def error_texts(node):
+    return [leaf.token.text for leaf in node.nodes]
+
+
+def test_every_error_in_file_is_reported():
+    code = ("package p;\n\nfunc a() {\n\tx := ;\n\ty := 1;\n\tz := 1 +\n}\n\ntype 1\n"
+            "func b() {\n\tif {\n\t}\n\tw := 2;\n}\n")
+    parser, program = parse(code)
+    assert [(diagnostic["message"], diagnostic["line"]) for diagnostic in parser.get_diagnostics()] == [
+        ("Unexpected token: ;", 4), ("Unexpected token: }", 7), ("Expected type name after 'type'", 9),
+        ("Unexpected token: {", 11),
+    ]
+    assert declaration_types(program) == ["PackageDeclaration", "FunctionDeclaration", "Error", "FunctionDeclaration"]
+    # Оператор с ошибкой пропускается до ';' включительно или до '}' блока
+    first, second = program.children[1].body, program.children[3].body
+    assert [node.type for node in first] == ["Error", "VariableDeclaration", "Error"]
+    assert error_texts(first[0]) == ["x", ":=", ";"]
+    assert error_texts(first[2]) == ["z", ":=", "1", "+"]
+    assert error_texts(program.children[2]) == ["type", "1"]
+    # Ошибка в заголовке if пропускает оператор вместе с блоком
+    assert [node.type for node in second] == ["Error", "VariableDeclaration"]
+    assert error_texts(second[0]) == ["if", "{", "}"]
+
+
+@pytest.mark.parametrize("declaration, node_type", [
+    ("func b() {\n}\n", "FunctionDeclaration"),
+    ("type T struct {\n\tx int;\n};\n", "TypeDeclaration"),
+    ("var v = 1;\n", None),
+])
+def test_top_level_error_resyncs_at_declaration(declaration, node_type):
+    parser, program = parse("package p;\n\ntype 1 2\n" + declaration)
+    assert len(parser.get_diagnostics()) == 1
+    assert error_texts(program.children[1]) == ["type", "1", "2"]
+    # var верхнего уровня узла не даёт, но и в ErrorNode не попадает
+    assert declaration_types(program)[2:] == ([node_type] if node_type else [])
+
+
+@pytest.mark.parametrize("recover", [False, True])
+def test_parser_bug_is_not_recovered(monkeypatch, recover):
+    def broken(self, *args):
+        raise AttributeError("broken rule")
+
+    # Восстанавливаются только ошибки синтаксиса: ошибка в самом парсере выходит как есть
+    monkeypatch.setattr(Parser, "_parse_function_call", broken)
+    with pytest.raises(AttributeError):
+        parse("package p;\n\nfunc a() {\n\tf();\n}\n", recover)
+    monkeypatch.setitem(Parser._DECLARATION_RULES, KIND_IDS["type"], broken)
+    with pytest.raises(AttributeError):
+        parse("package p;\n\ntype T struct {\n\tx int;\n};\n", recover)
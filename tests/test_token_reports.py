@@ -0,0 +1,33 @@
+"""Отчёты по токенам: файлы категорий совпадают со списками категорий лексера."""
+import zipfile
+
+from lexer import Lexer
+from tokenReports import CATEGORY_REPORTS, REPORT_HEADER, token_rows, write_token_reports
+
+# Первая ')' лишняя: лексер выдаёт ей номер P:1 и отбрасывает, вторая ')' с тем же номером первой не считается
+STRAY_BRACKET = "package p;\n)\nfunc a() { b() }\n"
+
+
+def report_lines(tokens):
+    return [f"{token.text:<25} {token.kind:<15} {token.line:<5} {token.column:<5} {token.id:<5}\n" for token in tokens]
+
+
+def test_category_files_follow_lexer_lists(tmp_path):
+    lexer = Lexer(STRAY_BRACKET)
+    tokens = lexer.lex_analyze()
+    rows = token_rows(tokens, lexer.category_lists)
+    write_token_reports(rows, str(tmp_path), ("txt", "csv", "npz"))
+
+    assert [token.id for token in tokens if token.text == ")"] == ["P:1", "P:1"]
+    for name, category_list in zip(CATEGORY_REPORTS, lexer.category_lists):
+        with open(tmp_path / name, encoding='utf-8') as file:
+            assert file.read() == REPORT_HEADER + "".join(report_lines(category_list)), name
+    assert not any(row[0] == ")" and row[5] for row in rows)
+
+    # Остальные форматы - все токены, признак first - только в npz
+    with open(tmp_path / "tokens.csv", encoding='utf-8') as file:
+        assert len(file.read().splitlines()) == len(tokens) + 1
+    with zipfile.ZipFile(tmp_path / "tokens.npz") as archive:
+        first = archive.read("first.npy")[-len(tokens):]
+    assert list(first) == [row[5] for row in rows]
+    assert sum(first) == sum(map(len, lexer.category_lists))
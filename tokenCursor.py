@@ -0,0 +1,70 @@
+from collections import deque
+from typing import Iterable, Optional, Sequence
+from tokenModel import Token
+
+
+class ListCursor:
+    """Курсор по уже построенному списку токенов: произвольный доступ и откат на любую позицию."""
+
+    def __init__(self, tokens: Sequence[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, k: int = 0) -> Optional[Token]:
+        index = self.pos + k
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def advance(self):
+        if self.pos < len(self.tokens):
+            self.pos += 1
+
+    def seek(self, pos: int):
+        self.pos = pos
+
+
+class StreamCursor:
+    """Курсор по потоку токенов (например, Lexer.iter_tokens()).
+
+    Держит в памяти только заглядывание вперёд и небольшое окно уже прочитанных
+    токенов (history), чтобы парсер мог откатиться на несколько позиций назад.
+    """
+
+    def __init__(self, tokens: Iterable[Token], history: int = 4):
+        self.source = iter(tokens)
+        self.history = history
+        self.buffer = deque()
+        self.base = 0 # Абсолютный индекс первого токена в буфере
+        self.pos = 0
+
+    def _fill(self, index: int) -> bool:
+        while self.base + len(self.buffer) <= index:
+            token = next(self.source, None)
+            if token is None:
+                return False
+            self.buffer.append(token)
+        return True
+
+    def peek(self, k: int = 0) -> Optional[Token]:
+        index = self.pos + k
+        if self._fill(index):
+            return self.buffer[index - self.base]
+        return None
+
+    def advance(self):
+        if self.peek() is None:
+            return
+        self.pos += 1
+        while self.pos - self.base > self.history:
+            self.buffer.popleft()
+            self.base += 1
+
+    def seek(self, pos: int):
+        if pos < self.base:
+            raise ValueError(f"Cannot rewind to token {pos}: only tokens from {self.base} are buffered")
+        self.pos = pos
+
+
+def make_cursor(tokens: Iterable[Token]):
+    if isinstance(tokens, Sequence):
+        return ListCursor(tokens)
+    return StreamCursor(tokens)
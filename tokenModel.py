@@ -1,4 +1,30 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Union
+
+
+# Таблица видов токенов: имя вида <-> небольшое целое число
+KIND_NAMES: List[str] = []
+KIND_IDS: Dict[str, int] = {}
+
+# Категории идентификаторов токенов ("K:0", "N:3", ...)
+CATEGORIES = ("K", "N", "O", "P")
+CATEGORY_IDS = {name: i for i, name in enumerate(CATEGORIES)}
+
+
+def intern_kind(name: str) -> int:
+    kind_id = KIND_IDS.get(name)
+    if kind_id is None:
+        kind_id = len(KIND_NAMES)
+        KIND_NAMES.append(name)
+        KIND_IDS[name] = kind_id
+    return kind_id
+
+
 class Token:
+    __slots__ = ("kind", "text", "line", "column", "id")
+
     def __init__(self, kind: str, text: str, line: int, column: int, id: str):
         self.kind = kind
         self.text = text
@@ -6,9 +32,183 @@ class Token:
         self.column = column
         self.id = id
 
+    @property
+    def kind_id(self) -> int:
+        """Вид токена как малое целое из KIND_IDS (для таблиц разбора).
+
+        Таблицу видов заполняет лексер; вид, которого в ней нет, даёт -1 и в таблицу не заносится.
+        """
+        return KIND_IDS.get(self.kind, -1)
+
 class TokenType:
     def __init__(self, name: str, regex: str, class_:str):
         self.name = name
         self.regex = regex
         self.class_ = class_
-        
\ No newline at end of file
+
+
+class TokenView:
+    """Лёгкое представление токена из TokenBuffer с теми же атрибутами, что и у Token."""
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer: "TokenBuffer", index: int):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def kind(self) -> str:
+        return KIND_NAMES[self.buffer.kinds[self.index]]
+
+    @property
+    def kind_id(self) -> int:
+        return self.buffer.kinds[self.index]
+
+    @property
+    def text(self) -> str:
+        return self.buffer.text(self.index)
+
+    @property
+    def line(self) -> int:
+        return self.buffer.line(self.index)
+
+    @property
+    def column(self) -> int:
+        return self.buffer.columns[self.index]
+
+    @property
+    def id(self) -> str:
+        return f"{CATEGORIES[self.buffer.categories[self.index]]}:{self.buffer.numbers[self.index]}"
+
+    @property
+    def start(self) -> int:
+        return self.buffer.start(self.index)
+
+    @property
+    def length(self) -> int:
+        return self.buffer.lengths[self.index]
+
+    @property
+    def match(self) -> int:
+        """Индекс парной скобки в буфере или -1."""
+        distance = self.buffer.matches[self.index]
+        return self.index + distance if distance else -1
+
+
+class TokenBuffer(Sequence):
+    """Компактное хранилище токенов в виде параллельных массивов (struct-of-arrays).
+
+    Текст токена не хранится: он берётся из исходного текста по смещению и длине
+    (для байтового источника - с декодированием UTF-8 при обращении).
+    Индексация возвращает TokenView, совместимый с Token по атрибутам.
+
+    Правка в середине буфера (replace и shift) не переписывает хвост: смещения и
+    номера строк токенов начиная с _gap хранятся без отложенных сдвигов
+    _offset_shift и _line_shift, поэтому starts и lines читаются через start() и line().
+    Сдвиг переносится в массивы только на участке между прежней и новой правкой.
+    """
+
+    def __init__(self, source: Union[str, bytes]):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('i')
+        self.lengths = array('i')
+        self.lines = array('i')
+        self.columns = array('i')
+        self.categories = array('B')
+        self.numbers = array('i')
+        # Расстояние до парной скобки (индекс пары минус свой), 0 для прочих токенов и скобок
+        # без пары: вставка и удаление токенов между скобками пары не меняют
+        self.matches = array('i')
+        # Глубина стека скобок лексера перед токеном
+        self.depths = array('i')
+        self._gap = 0
+        self._offset_shift = 0
+        self._line_shift = 0
+
+    def add(self, kind_id: int, start: int, length: int, line: int, column: int, category: int, number: int,
+            depth: int = 0) -> TokenView:
+        if self._offset_shift or self._line_shift:
+            self._move_gap(len(self.kinds))
+        self.kinds.append(kind_id)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.categories.append(category)
+        self.numbers.append(number)
+        self.matches.append(0)
+        self.depths.append(depth)
+        return TokenView(self, len(self.kinds) - 1)
+
+    def start(self, index: int) -> int:
+        return self.starts[index] + self._offset_shift if index >= self._gap else self.starts[index]
+
+    def line(self, index: int) -> int:
+        return self.lines[index] + self._line_shift if index >= self._gap else self.lines[index]
+
+    def find_start(self, offset: int) -> int:
+        """Индекс первого токена, который начинается не раньше offset."""
+        gap = self._gap
+        if gap < len(self.starts) and offset > self.starts[gap] + self._offset_shift:
+            return bisect_left(self.starts, offset - self._offset_shift, gap)
+        return bisect_left(self.starts, offset, 0, gap)
+
+    def text(self, index: int) -> str:
+        start = self.start(index)
+        text = self.source[start:start + self.lengths[index]]
+        return text if isinstance(text, str) else text.decode('utf-8', errors='replace')
+
+    def snapshot(self, index: int) -> Token:
+        """Самостоятельная копия токена, не зависящая от дальнейших изменений буфера."""
+        view = TokenView(self, index)
+        return Token(view.kind, view.text, view.line, view.column, view.id)
+
+    def replace(self, first: int, last: int, records):
+        """Заменяет токены [first, last) записями с полями kind, start, length, line, column,
+        category, number, depth.
+
+        Новые токены получают matches = 0; пары скобок связывает владелец буфера.
+        """
+        self._move_gap(last)
+        for column, field in ((self.kinds, "kind"), (self.starts, "start"), (self.lengths, "length"),
+                              (self.lines, "line"), (self.columns, "column"), (self.categories, "category"),
+                              (self.numbers, "number"), (self.depths, "depth")):
+            column[first:last] = array(column.typecode, [getattr(record, field) for record in records])
+        self.matches[first:last] = array('i', [0]) * len(records)
+        self._gap = first + len(records)
+
+    def shift(self, first: int, offset_delta: int, line_delta: int):
+        """Сдвигает смещения и номера строк токенов начиная с first (отложенно, см. класс)."""
+        self._move_gap(first)
+        self._offset_shift += offset_delta
+        self._line_shift += line_delta
+
+    def _move_gap(self, gap: int):
+        """Переносит отложенный сдвиг в массивы на участке между _gap и gap."""
+        if self._offset_shift or self._line_shift:
+            low, high = sorted((self._gap, gap))
+            sign = 1 if self._gap < gap else -1
+            for column, delta in ((self.starts, self._offset_shift), (self.lines, self._line_shift)):
+                if delta:
+                    delta *= sign
+                    column[low:high] = array('i', [value + delta for value in column[low:high]])
+            if gap == len(self.starts):
+                # За разрывом токенов нет: сдвигать нечего
+                self._offset_shift = self._line_shift = 0
+        self._gap = gap
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TokenView(self, i) for i in range(*index.indices(len(self.kinds)))]
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self) -> Iterator[TokenView]:
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
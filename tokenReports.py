@@ -0,0 +1,199 @@
+"""Отчёты по токенам: все форматы за один проход по потоку токенов.
+
+Форматы:
+    txt    - result.txt и по файлу на категорию (keywords, operators, names,
+             punctuations: токены из списков категорий лексера) с колонками
+             фиксированной ширины
+    csv    - tokens.csv (text, kind, line, column, id)
+    tsv    - tokens.tsv, то же с табуляцией
+    jsonl  - tokens.jsonl, объект на токен
+    npz    - tokens.npz: столбцы таблицы токенов для numpy.load; kind и category -
+             коды в таблицы kinds и categories, текст - text_offsets и text_data (UTF-8)
+
+Строка токена - кортеж (text, kind, line, column, id, first) из token_rows;
+first - токен внесён лексером в список своей категории (Lexer.category_lists).
+"""
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+from array import array
+from itertools import islice
+from typing import Iterable, List, Optional, Sequence
+
+from tokenModel import CATEGORIES, CATEGORY_IDS, TokenView
+
+FORMATS = ("txt", "csv", "tsv", "jsonl", "npz")
+DEFAULT_BUFFER_SIZE = 1 << 20
+CHUNK_ROWS = 4096
+
+REPORT_HEADER = (f"{'Lexeme':<25} {'Token type':<15} {'Row':<5} {'Column':<5} {'Id':<5}\n"
+                 "=========================================================\n")
+CATEGORY_REPORTS = ("keywords.txt", "names.txt", "operators.txt", "punctuations.txt") # В порядке CATEGORIES
+TABLE_COLUMNS = ("text", "kind", "line", "column", "id")
+
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def _token_key(token) -> int:
+    # Представления буфера создаются заново при каждом обращении: сравниваются по индексу
+    return token.index if isinstance(token, TokenView) else id(token)
+
+
+def token_rows(tokens: Iterable, category_lists: Iterable[Iterable] = ()) -> List[tuple]:
+    """Строки токенов; first берётся из списков категорий лексера, а не выводится заново.
+
+    Лексер вносит в список первое вхождение лексемы, только если токен попал в
+    поток: лишняя или непарная закрывающая скобка получает номер в таблице, но
+    отбрасывается, и следующая такая же скобка первой уже не считается.
+    """
+    firsts = {_token_key(token) for category_list in category_lists for token in category_list}
+    return [(token.text, token.kind, token.line, token.column, token.id, _token_key(token) in firsts)
+            for token in tokens]
+
+
+def npy_bytes(values: Sequence, descr: str) -> bytes:
+    """Массив в формате .npy (версия 1.0) без зависимости от numpy.
+
+    values - array или bytes с данными в порядке little-endian, descr - dtype numpy
+    ('<i4', '|u1', '<U8', ...).
+    """
+    data = values.tobytes() if isinstance(values, array) else bytes(values)
+    itemsize = int(descr[2:]) * (4 if descr[1] == "U" else 1)
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({len(data) // itemsize},), }}"
+    header += " " * (-(10 + len(header) + 1) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode('latin-1') + data
+
+
+def _strings_npy(values: List[str]) -> bytes:
+    width = max(map(len, values), default=1) or 1
+    return npy_bytes("".join(value.ljust(width, "\0") for value in values).encode('utf-32-le'), f"<U{width}")
+
+
+class TokenReportWriter:
+    """Пишет отчёты в output_dir по мере add(); close() дописывает столбцовые форматы.
+
+    encoding - кодировка result.txt (исторически cp1251; символы вне неё пишутся
+    как \\uXXXX), остальные текстовые файлы - UTF-8.
+    """
+
+    def __init__(self, output_dir: str, formats: Iterable[str] = ("txt",), encoding: str = 'cp1251',
+                 buffer_size: int = DEFAULT_BUFFER_SIZE):
+        formats = tuple(dict.fromkeys(formats))
+        for format in formats:
+            if format not in FORMATS:
+                raise ValueError(f"Unknown token report format: {format!r}")
+        self.output_dir = output_dir
+        self.buffer_size = buffer_size
+        self.files = []
+        self.result = self.categories = self.csv = self.tsv = self.jsonl = None
+        if "txt" in formats:
+            self.result = self._open("result.txt", encoding, errors='backslashreplace')
+            self.categories = [self._open(name) for name in CATEGORY_REPORTS]
+            for file in (self.result, *self.categories):
+                file.write(REPORT_HEADER)
+        if "csv" in formats:
+            self.csv = csv.writer(self._open("tokens.csv", newline=""))
+            self.csv.writerow(TABLE_COLUMNS)
+        if "tsv" in formats:
+            self.tsv = csv.writer(self._open("tokens.tsv", newline=""), dialect="excel-tab")
+            self.tsv.writerow(TABLE_COLUMNS)
+        if "jsonl" in formats:
+            self.jsonl = self._open("tokens.jsonl")
+        self.table = None
+        if "npz" in formats:
+            self.kind_codes = {}
+            self.table = {"kind": array('H'), "line": array('i'), "column": array('i'), "category": array('B'),
+                          "number": array('i'), "first": array('B'), "text_offsets": array('q', [0]),
+                          "text_data": bytearray()}
+
+    def _open(self, name: str, encoding: str = 'utf-8', errors: Optional[str] = None,
+              newline: Optional[str] = None) -> io.TextIOWrapper:
+        file = open(os.path.join(self.output_dir, name), "w", encoding=encoding, errors=errors,
+                    newline=newline, buffering=self.buffer_size)
+        self.files.append(file)
+        return file
+
+    def add(self, row: tuple):
+        self.write_all((row,))
+
+    def write_all(self, rows: Iterable[tuple]):
+        """Один проход по строкам токенов; строки форматируются кусками по CHUNK_ROWS
+        и каждый кусок уходит во все файлы одной записью."""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                break
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, rows: List[tuple]):
+        category_ids = CATEGORY_IDS
+        result, table = self.result, self.table
+        lines, category_lines = [], [[] for _ in CATEGORIES]
+        for text, kind, line, column, id, first in rows:
+            if result is not None:
+                line_text = f"{text:<25} {kind:<15} {line:<5} {column:<5} {id:<5}\n"
+                lines.append(line_text)
+                if first:
+                    category_lines[category_ids[id[0]]].append(line_text)
+            if table is not None:
+                code = self.kind_codes.get(kind)
+                if code is None:
+                    code = self.kind_codes[kind] = len(self.kind_codes)
+                table["kind"].append(code)
+                table["line"].append(line)
+                table["column"].append(column)
+                table["category"].append(category_ids[id[0]])
+                table["number"].append(int(id[2:]))
+                table["first"].append(first)
+                table["text_data"] += text.encode('utf-8')
+                table["text_offsets"].append(len(table["text_data"]))
+        if result is not None:
+            result.write("".join(lines))
+            for file, category_text in zip(self.categories, category_lines):
+                file.write("".join(category_text))
+        if self.csv is not None or self.tsv is not None:
+            table_rows = [row[:5] for row in rows]
+            if self.csv is not None:
+                self.csv.writerows(table_rows)
+            if self.tsv is not None:
+                self.tsv.writerows(table_rows)
+        if self.jsonl is not None:
+            encode = _JSON_ENCODER.encode
+            self.jsonl.write("".join(encode({"text": text, "kind": kind, "line": line, "column": column, "id": id})
+                                     + "\n" for text, kind, line, column, id, _ in rows))
+
+    def close(self):
+        for file in self.files:
+            file.close()
+        self.files = []
+        if self.table is not None:
+            self._write_table()
+            self.table = None
+
+    def _write_table(self):
+        descrs = {"kind": "<u2", "line": "<i4", "column": "<i4", "category": "|u1", "number": "<i4",
+                  "first": "|b1", "text_offsets": "<i8", "text_data": "|u1"}
+        with zipfile.ZipFile(os.path.join(self.output_dir, "tokens.npz"), "w", zipfile.ZIP_STORED) as archive:
+            for name, values in self.table.items():
+                if isinstance(values, array) and values.itemsize > 1 and sys.byteorder == "big":
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                archive.writestr(name + ".npy", npy_bytes(values, descrs[name]))
+            archive.writestr("kinds.npy", _strings_npy(list(self.kind_codes)))
+            archive.writestr("categories.npy", _strings_npy(list(CATEGORIES)))
+
+    def __enter__(self) -> "TokenReportWriter":
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.close()
+
+
+def write_token_reports(rows: Iterable[tuple], output_dir: str, formats: Iterable[str] = ("txt",),
+                        encoding: str = 'cp1251'):
+    with TokenReportWriter(output_dir, formats, encoding) as writer:
+        writer.write_all(rows)